@@ -0,0 +1,234 @@
+"""
+Per-route query and time budgets.
+
+BUDGETS maps every URL name served by this project's apps to the most
+database queries a single request to it may run, and optionally a time
+budget in milliseconds.  bench.runner.QueryBudgetRunner exercises each
+entry against seeded data of several sizes and fails if a view goes over
+budget, answers with a status other than the expected one, or if its
+query count grows with the amount of data (an N+1).  The requests are
+made so they take the route's normal path, not an early error return.
+
+Routes from admin and allauth are exempt; any other route without an
+entry here fails the run, so new views must declare a budget.
+"""
+import hashlib
+import hmac
+import json
+import time
+
+from django.conf import settings
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from joe_django.profiling import save_profile
+
+EXEMPT_PREFIXES = ('admin/', 'accounts/')
+
+
+class Budget:
+    """How to request one route and what it may cost."""
+
+    def __init__(self, queries, ms=None, method='get', client='anonymous',
+                 args=None, data=None, query_string='', htmx=False,
+                 headers=None, content_type=None, expected_status=200):
+        self.queries = queries
+        self.ms = ms
+        self.method = method
+        self.client = client
+        self.args = args
+        self.data = data
+        self.query_string = query_string
+        self.htmx = htmx
+        self.headers = headers
+        self.content_type = content_type
+        self.expected_status = expected_status
+
+    def request(self, env, url):
+        """Issue the request using one of the BenchEnvironment clients."""
+        client = getattr(env, self.client)
+        headers = {'HX-Request': 'true'} if self.htmx else {}
+        if self.headers:
+            headers.update(self.headers(env))
+        if self.query_string:
+            url = f'{url}?{self.query_string(env)}'
+        data = self.data(env) if self.data else None
+        extra = {'content_type': self.content_type} if self.content_type else {}
+        return getattr(client, self.method)(url, data, headers=headers, **extra)
+
+
+def _slug(env):
+    return [env.print_slugs[0]]
+
+
+def _art(env):
+    return [env.art_id]
+
+
+def _cart_line(env):
+    return [env.cart_ids[0]]
+
+
+def _last_cart_line(env):
+    return [env.cart_ids[-1]]
+
+
+def _commission(env):
+    return [env.commission_id]
+
+
+def _stored_profile(env):
+    return [save_profile({
+        'timestamp': time.time(), 'method': 'GET', 'path': '/work/',
+        'view': 'work', 'user': '', 'status': 200, 'trigger': 'staff',
+        'duration_ms': 12.5, 'interval_ms': 2, 'samples': 3,
+        'stacks': {'handler;view': 2, 'handler;view;render': 1},
+    })]
+
+
+def _webhook_payload(env):
+    """checkout.session.completed for an order that is already paid."""
+    return json.dumps({
+        'id': 'evt_bench', 'object': 'event',
+        'type': 'checkout.session.completed',
+        'data': {'object': {
+            'id': env.order_session_id, 'object': 'checkout.session',
+            'payment_status': 'paid',
+        }},
+    })
+
+
+def _webhook_signature(env):
+    timestamp = int(time.time())
+    signature = hmac.new(
+        settings.STRIPE_WEBHOOK_SECRET.encode(),
+        f'{timestamp}.{_webhook_payload(env)}'.encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return {'Stripe-Signature': f't={timestamp},v1={signature}'}
+
+
+# Query counts for logged-in clients include the session and user lookups.
+BUDGETS = {
+    # home
+    'home': Budget(queries=0),
+    'work': Budget(queries=1, ms=250),
+    'about': Budget(queries=0),
+    'contact': Budget(queries=0),
+
+    # gallery
+    'gallery': Budget(
+        queries=2, ms=250,
+        query_string=lambda env: 'size=bench-a4&size=bench-a3&price=50-100',
+    ),
+    'art_detail': Budget(queries=4, ms=250, args=_slug),
+    'print_image': Budget(
+        queries=1,
+        args=lambda env: [env.sample_image_hash, env.sample_display_image],
+    ),
+    'add_to_wishlist': Budget(
+        queries=5, client='customer', args=_slug, expected_status=302,
+    ),
+    'remove_from_wishlist': Budget(
+        queries=5, client='customer', args=_slug, expected_status=302,
+    ),
+
+    # shop
+    'cart_detail': Budget(queries=3, ms=250, client='shopper'),
+    'add_to_cart': Budget(
+        queries=5, method='post', client='shopper', args=_art,
+        expected_status=302,
+    ),
+    'remove_from_cart': Budget(
+        queries=2, client='shopper', args=_last_cart_line, htmx=True,
+    ),
+    'update_cart_item': Budget(
+        queries=5, method='post', client='shopper', args=_cart_line,
+        data=lambda env: {'quantity': 3}, htmx=True,
+    ),
+    'create_checkout_session': Budget(
+        queries=6, method='post', client='shopper',
+    ),
+    # Both look up and try to fulfil an order that is already paid
+    'payment_success': Budget(
+        queries=6, client='customer',
+        query_string=lambda env: f'session_id={env.order_session_id}',
+    ),
+    'payment_cancel': Budget(
+        queries=0, client='shopper', expected_status=302,
+    ),
+    'stripe_webhook': Budget(
+        queries=4, method='post', data=_webhook_payload,
+        content_type='application/json', headers=_webhook_signature,
+    ),
+    'download_print': Budget(
+        queries=5, client='customer', args=lambda env: [env.sample_art_id],
+    ),
+    'download_bundle': Budget(queries=3, client='customer'),
+    'download_order_bundle': Budget(
+        queries=3, client='customer', args=lambda env: [env.order_id],
+    ),
+
+    # commissions
+    'commission_create': Budget(queries=2, client='customer'),
+    'commission_quote': Budget(
+        queries=0, ms=50,
+        query_string=lambda env: 'commission_type=portrait&size=A3'
+                                 '&description_length=320',
+    ),
+    'commission_edit': Budget(queries=3, client='customer', args=_commission),
+    'commission_delete': Budget(queries=3, client='customer', args=_commission),
+    # Direct uploads need object storage; the test run uses the filesystem
+    'commission_upload_url': Budget(
+        queries=2, method='post', client='customer', expected_status=404,
+    ),
+    'commission_final_file': Budget(
+        queries=3, client='customer',
+        args=lambda env: [env.finished_commission_id],
+    ),
+    'commission_board': Budget(queries=10, ms=500, client='staff'),
+    'commission_board_column': Budget(
+        queries=3, client='staff', args=lambda env: ['pending'],
+    ),
+    'commission_bulk_status': Budget(
+        queries=7, method='post', client='staff',
+        data=lambda env: {
+            'status': 'in_progress', 'commission_ids': env.commission_ids,
+        },
+        expected_status=302,
+    ),
+
+    # users
+    'dashboard': Budget(queries=8, ms=500, client='customer'),
+
+    # reports
+    'sales_dashboard': Budget(
+        queries=5, ms=250, client='staff', query_string=lambda env: 'days=90',
+    ),
+    'export_orders': Budget(queries=4, ms=500, client='staff'),
+    'export_commissions': Budget(
+        queries=3, ms=500, client='staff',
+        query_string=lambda env: 'format=jsonl',
+    ),
+
+    # project
+    'metrics': Budget(queries=0),
+    # each_context() loads the staff user's permissions for the admin nav
+    'profile_list': Budget(queries=4, client='staff'),
+    'profile_detail': Budget(queries=4, client='staff', args=_stored_profile),
+}
+
+
+def _named_patterns(patterns, prefix=''):
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            if not route.startswith(EXEMPT_PREFIXES):
+                yield from _named_patterns(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+def unbudgeted_routes():
+    """Names of non-exempt routes that have no entry in BUDGETS."""
+    names = set(_named_patterns(get_resolver().url_patterns))
+    return sorted(names - set(BUDGETS))
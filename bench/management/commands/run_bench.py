@@ -0,0 +1,154 @@
+"""
+Management command to seed synthetic data and benchmark the key views.
+
+Usage:
+    python manage.py run_bench --prints 5000 --users 500 --output run.json
+    python manage.py run_bench --no-seed --baseline run.json
+
+Latency percentiles, median template render time and query counts for
+each scenario are printed as a table and optionally written to --output
+as JSON.  Passing --baseline with an earlier JSON file prints the change
+in p95 latency, render time and queries.
+"""
+
+import json
+import platform
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from bench.scenarios import SCENARIOS, run_scenarios
+from bench.seed import clear_bench_data, seed_bench_data
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic data and benchmark the key views'
+
+    def add_arguments(self, parser):
+        seed = parser.add_argument_group('seeding')
+        seed.add_argument('--prints', type=int, default=1000,
+                          help='Number of prints (default: 1000)')
+        seed.add_argument('--categories', type=int, default=10,
+                          help='Number of categories (default: 10)')
+        seed.add_argument('--users', type=int, default=100,
+                          help='Number of users (default: 100)')
+        seed.add_argument('--wishlist', type=int, default=8,
+                          help='Wishlisted prints per user (default: 8)')
+        seed.add_argument('--orders', type=int, default=3,
+                          help='Orders per user (default: 3)')
+        seed.add_argument('--commissions', type=int, default=2,
+                          help='Commissions per user (default: 2)')
+        seed.add_argument('--seed', type=int, default=0,
+                          help='Random seed for reproducible data (default: 0)')
+        seed.add_argument('--no-seed', action='store_true',
+                          help='Reuse previously seeded data')
+        seed.add_argument('--cleanup', action='store_true',
+                          help='Delete the benchmark data afterwards')
+
+        run = parser.add_argument_group('running')
+        run.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                         help='Only run the given scenario (repeatable)')
+        run.add_argument('--iterations', type=int, default=50,
+                         help='Timed requests per scenario (default: 50)')
+        run.add_argument('--warmup', type=int, default=5,
+                         help='Untimed requests per scenario (default: 5)')
+        run.add_argument('--cart-size', type=int, default=5,
+                         help='Lines in the benchmark cart (default: 5)')
+        run.add_argument('--output', type=str,
+                         help='Write results to this JSON file')
+        run.add_argument('--baseline', type=str,
+                         help='Compare against an earlier JSON results file')
+
+    def handle(self, *args, **options):
+        counts = None
+        if not options['no_seed']:
+            clear_bench_data()
+            counts = seed_bench_data(
+                prints=options['prints'],
+                categories=options['categories'],
+                users=options['users'],
+                wishlist=options['wishlist'],
+                orders=options['orders'],
+                commissions=options['commissions'],
+                seed=options['seed'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                'Seeded ' + ', '.join(f'{v} {k}' for k, v in counts.items())
+            ))
+
+        names = options['scenario'] or list(SCENARIOS)
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                results = run_scenarios(
+                    names,
+                    iterations=options['iterations'],
+                    warmup=options['warmup'],
+                    cart_size=options['cart_size'],
+                )
+        except ValueError as e:
+            self.stderr.write(self.style.ERROR(str(e)))
+            return
+        finally:
+            if options['cleanup']:
+                clear_bench_data()
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'session_strategy': settings.SESSION_STRATEGY,
+                'db_profile': settings.DB_PROFILE,
+                'template_profile': settings.TEMPLATE_PROFILE,
+                'seeded': counts,
+                'iterations': options['iterations'],
+            },
+            'scenarios': results,
+        }
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['scenarios']
+
+        self._print_table(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'\nResults written to {options["output"]}')
+
+    def _print_table(self, results, baseline):
+        header = (
+            f'{"scenario":<24}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+            f'{"tpl ms":>9}{"queries":>9}{"errors":>8}'
+        )
+        if baseline:
+            header += f'{"Δp95":>9}{"Δtpl ms":>9}{"Δqueries":>10}'
+        self.stdout.write(header)
+
+        for name, result in results.items():
+            line = (
+                f'{name:<24}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}'
+                f'{result["p99_ms"]:>9.2f}{result["render_p50_ms"]:>9.2f}'
+                f'{result["queries_max"]:>9}{result["errors"]:>8}'
+            )
+            previous = (baseline or {}).get(name)
+            if previous:
+                change = (
+                    (result['p95_ms'] - previous['p95_ms'])
+                    / previous['p95_ms'] * 100 if previous['p95_ms'] else 0
+                )
+                # Results saved before render times were recorded lack them
+                render = result['render_p50_ms'] - previous.get(
+                    'render_p50_ms', result['render_p50_ms']
+                )
+                line += (
+                    f'{change:>+8.1f}%{render:>+9.2f}'
+                    f'{result["queries_max"] - previous["queries_max"]:>+10}'
+                )
+            style = self.style.ERROR if result['errors'] else str
+            self.stdout.write(style(line))
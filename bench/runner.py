@@ -0,0 +1,132 @@
+"""
+Test runner that enforces the route budgets in bench.budgets.
+
+QueryBudgetRunner is the project's TEST_RUNNER.  On a full run (or when
+'bench' is one of the labels) it appends QueryBudgetTests to the suite:
+
+    python manage.py test                      # app tests + budgets
+    python manage.py test --no-query-budgets   # app tests only
+    python manage.py test bench --time-budgets # also check ms budgets
+"""
+import tempfile
+import time
+import unittest
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .budgets import BUDGETS, unbudgeted_routes
+from .scenarios import BenchEnvironment, mock_stripe
+from .seed import clear_bench_data, seed_bench_data
+
+
+class QueryBudgetTests(TestCase):
+    """Request every budgeted route against small, medium and large data."""
+
+    # Each size is used for the wishlist, order history, commission list
+    # and cart length, so a per-row query shows up as a growing count.
+    sizes = (5, 10, 25)
+    enforce_time = False
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Seeded files and stored profiles go to a throwaway directory;
+        # metrics and the webhook secret are on so those routes do their
+        # real work rather than answer 404 or return early
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT=directory, PROFILE_DIR=directory,
+            METRICS_ENABLED=True, STRIPE_WEBHOOK_SECRET='whsec_bench',
+        ))
+
+    def measure(self, size):
+        """Return {route: (queries, ms, status)} with `size` rows of data."""
+        clear_bench_data()
+        seed_bench_data(
+            prints=max(20, size * 2), categories=3, users=2, wishlist=size,
+            orders=size, items=3, commissions=size,
+        )
+        env = BenchEnvironment(cart_size=size)
+        results = {}
+        for name, budget in BUDGETS.items():
+            url = reverse(name, args=budget.args(env) if budget.args else None)
+            if budget.method == 'get':
+                budget.request(env, url)  # warm per-process caches
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = budget.request(env, url)
+                if response.streaming:
+                    # Streaming views run their queries while sending
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - start) * 1000
+            results[name] = (len(queries), elapsed, response.status_code)
+        return results
+
+    def test_every_route_has_a_budget(self):
+        missing = unbudgeted_routes()
+        self.assertEqual(missing, [], f'Routes without a budget: {missing}')
+
+    def test_route_budgets(self):
+        with mock_stripe():
+            runs = {size: self.measure(size) for size in self.sizes}
+
+        for name, budget in BUDGETS.items():
+            with self.subTest(route=name):
+                counts = {size: runs[size][name][0] for size in self.sizes}
+                for size in self.sizes:
+                    queries, ms, status = runs[size][name]
+                    self.assertEqual(
+                        status, budget.expected_status,
+                        f'{name} returned {status} with {size} rows '
+                        f'(expected {budget.expected_status})',
+                    )
+                    self.assertLessEqual(
+                        queries, budget.queries,
+                        f'{name} ran {queries} queries with {size} rows '
+                        f'(budget {budget.queries})',
+                    )
+                    if self.enforce_time and budget.ms:
+                        self.assertLessEqual(
+                            ms, budget.ms,
+                            f'{name} took {ms:.0f}ms with {size} rows '
+                            f'(budget {budget.ms}ms)',
+                        )
+                self.assertEqual(
+                    len(set(counts.values())), 1,
+                    f'{name} query count grows with data size: {counts}',
+                )
+
+
+class QueryBudgetRunner(DiscoverRunner):
+    """DiscoverRunner that also runs QueryBudgetTests."""
+
+    def __init__(self, query_budgets=True, time_budgets=False, **kwargs):
+        super().__init__(**kwargs)
+        self.query_budgets = query_budgets
+        QueryBudgetTests.enforce_time = time_budgets
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--no-query-budgets', action='store_false', dest='query_budgets',
+            help='Skip the per-route query budget checks.',
+        )
+        parser.add_argument(
+            '--time-budgets', action='store_true',
+            help='Also fail routes that exceed their millisecond budget.',
+        )
+
+    def build_suite(self, test_labels=None, **kwargs):
+        suite = super().build_suite(test_labels, **kwargs)
+        if self.query_budgets and (not test_labels or 'bench' in test_labels):
+            suite.addTests(
+                unittest.defaultTestLoader.loadTestsFromTestCase(
+                    QueryBudgetTests
+                )
+            )
+        return suite
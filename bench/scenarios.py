@@ -0,0 +1,243 @@
+"""
+Benchmark scenarios driven through the Django test client.
+
+Each scenario function receives a BenchEnvironment and returns a zero-
+argument callable that performs one request.  run_scenarios() times every
+call, counts its queries and records its template render time, with the
+Stripe API replaced by an in-process fake so results measure only this
+application.
+"""
+import itertools
+import time
+import uuid
+from unittest import mock
+
+import stripe
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from commissions.models import CommissionRequest
+from gallery.models import ArtPrint, Category
+from joe_django import instrumentation
+from shop.models import Order
+
+from .seed import PREFIX, SAMPLE_IMAGE
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+class BenchEnvironment:
+    """Clients and fixtures shared by all scenarios in a run."""
+
+    def __init__(self, cart_size=5):
+        prints = ArtPrint.objects.filter(
+            slug__startswith=f'{PREFIX}-', is_available=True
+        )
+        self.print_slugs = list(prints.values_list('slug', flat=True)[:200])
+        self.cart_ids = list(prints.values_list('id', flat=True)[:cart_size])
+        self.category_slug = (
+            Category.objects.filter(slug__startswith=f'{PREFIX}-')
+            .values_list('slug', flat=True).first()
+        )
+        users = User.objects.filter(username__startswith=f'{PREFIX}_')
+        if not self.print_slugs or users.count() < 2:
+            raise ValueError('No benchmark data found; seed it first.')
+
+        self.customer_user, self.shopper_user = users.order_by('id')[:2]
+        self.art_id = (
+            prints.exclude(purchased_by__user=self.customer_user)
+            .values_list('id', flat=True).first()
+        )
+        self.commission_ids = list(
+            CommissionRequest.objects.filter(user=self.customer_user)
+            .values_list('id', flat=True)
+        )
+        self.commission_id = (
+            CommissionRequest.objects.filter(
+                user=self.customer_user, status='pending'
+            ).values_list('id', flat=True).first()
+        )
+        self.finished_commission_id = (
+            CommissionRequest.objects.filter(user=self.customer_user)
+            .exclude(final_file='').exclude(final_file__isnull=True)
+            .values_list('id', flat=True).first()
+        )
+        self.order_id, self.order_session_id = (
+            Order.objects.filter(user=self.customer_user, is_completed=True)
+            .values_list('id', 'stripe_session_id').first()
+        ) or (None, None)
+        # Stored in media storage, owned by every user and content-hashed
+        (self.sample_art_id, self.sample_image_hash,
+         self.sample_display_image) = (
+            ArtPrint.objects.filter(image=SAMPLE_IMAGE)
+            .values_list('id', 'image_hash', 'display_image').get()
+        )
+
+        self.anonymous = Client()
+        self.customer = Client()
+        self.customer.force_login(self.customer_user)
+        self.shopper = Client()
+        self.shopper.force_login(self.shopper_user)
+        self.staff = Client()
+        self.staff.force_login(User.objects.get_or_create(
+            username=f'{PREFIX}_staff', defaults={'is_staff': True},
+        )[0])
+        for art_id in self.cart_ids:
+            self.shopper.post(reverse('add_to_cart', args=[art_id]))
+
+
+def gallery_list(env):
+    url = reverse('gallery')
+    return lambda: env.anonymous.get(url)
+
+
+def gallery_list_category(env):
+    url = f'{reverse("gallery")}?category={env.category_slug}'
+    return lambda: env.anonymous.get(url)
+
+
+def art_detail(env):
+    slugs = itertools.cycle(env.print_slugs)
+    return lambda: env.anonymous.get(reverse('art_detail', args=[next(slugs)]))
+
+
+def art_detail_logged_in(env):
+    slugs = itertools.cycle(env.print_slugs)
+    return lambda: env.customer.get(reverse('art_detail', args=[next(slugs)]))
+
+
+def work(env):
+    url = reverse('work')
+    return lambda: env.anonymous.get(url)
+
+
+def cart_detail(env):
+    url = reverse('cart_detail')
+    return lambda: env.shopper.get(url)
+
+
+def cart_update_htmx(env):
+    url = reverse('update_cart_item', args=[env.cart_ids[0]])
+    quantities = itertools.cycle([2, 1])
+    return lambda: env.shopper.post(
+        url, {'quantity': next(quantities)}, HTTP_HX_REQUEST='true'
+    )
+
+
+def checkout(env):
+    url = reverse('create_checkout_session')
+    return lambda: env.shopper.post(url)
+
+
+def commission_quote(env):
+    url = f'{reverse("commission_quote")}?commission_type=portrait&size=A3'
+    lengths = itertools.cycle([40, 320, 900])
+    return lambda: env.anonymous.get(
+        f'{url}&description_length={next(lengths)}', HTTP_HX_REQUEST='true'
+    )
+
+
+def dashboard(env):
+    url = reverse('dashboard')
+    return lambda: env.customer.get(url)
+
+
+def sales_dashboard(env):
+    url = f'{reverse("sales_dashboard")}?days=90'
+    return lambda: env.staff.get(url)
+
+
+SCENARIOS = {
+    'gallery_list': gallery_list,
+    'gallery_list_category': gallery_list_category,
+    'art_detail': art_detail,
+    'art_detail_logged_in': art_detail_logged_in,
+    'work': work,
+    'cart_detail': cart_detail,
+    'cart_update_htmx': cart_update_htmx,
+    'checkout': checkout,
+    'commission_quote': commission_quote,
+    'dashboard': dashboard,
+    'sales_dashboard': sales_dashboard,
+}
+
+
+def _fake_stripe_session(*args, **kwargs):
+    return stripe.checkout.Session.construct_from({
+        'id': f'cs_{PREFIX}_{uuid.uuid4().hex}',
+        'object': 'checkout.session',
+        'payment_status': 'paid',
+    }, 'sk_test_bench')
+
+
+def mock_stripe():
+    """Patch the Stripe calls made by shop.views with instant fakes."""
+    fake = mock.AsyncMock(side_effect=_fake_stripe_session)
+    return mock.patch.multiple(
+        stripe.checkout.Session, create_async=fake, retrieve_async=fake,
+    )
+
+
+def run_scenario(make_request, iterations, warmup):
+    """Time `iterations` calls after `warmup` untimed ones."""
+    for _ in range(warmup):
+        make_request()
+
+    timings = []
+    render_times = []
+    query_counts = []
+    errors = 0
+    for _ in range(iterations):
+        stats, token = instrumentation.start_request()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = make_request()
+                timings.append(time.perf_counter() - start)
+        finally:
+            instrumentation.end_request(token)
+        render_times.append(stats.template_time)
+        query_counts.append(len(queries))
+        errors += response.status_code >= 400
+
+    timings.sort()
+    render_times.sort()
+    return {
+        'iterations': iterations,
+        'errors': errors,
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p90_ms': round(percentile(timings, 90) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+        'render_p50_ms': round(percentile(render_times, 50) * 1000, 3),
+        'render_mean_ms': round(
+            sum(render_times) / len(render_times) * 1000, 3
+        ),
+        'queries_min': min(query_counts),
+        'queries_max': max(query_counts),
+        'queries_mean': round(sum(query_counts) / len(query_counts), 2),
+    }
+
+
+def run_scenarios(names, iterations=50, warmup=5, cart_size=5):
+    """Run the named scenarios and return {name: result dict}."""
+    results = {}
+    instrumentation.install()  # times template rendering
+    with mock_stripe():
+        env = BenchEnvironment(cart_size=cart_size)
+        for name in names:
+            results[name] = run_scenario(
+                SCENARIOS[name](env), iterations, warmup
+            )
+    return results
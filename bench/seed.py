@@ -0,0 +1,250 @@
+"""
+Synthetic data generator for the benchmark harness.
+
+Everything created here is tagged with the 'bench' prefix (category and
+print slugs, usernames, Stripe session ids) so clear_bench_data() can
+remove it again without touching real catalogue or customer data.
+
+Print 0 and each user's second commission point at small files written
+to media storage, so the download and image routes can serve something;
+every user owns print 0.  Each user's first commission is still pending,
+so it can be edited.
+"""
+import random
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from PIL import Image
+
+from commissions.models import CommissionRequest
+from gallery.catalogue import bump_catalogue_version
+from gallery.images import store_display_image
+from gallery.models import (
+    ArtPrint, Category, PrintSize, recount_available_prints,
+)
+from gallery.utils import file_digest
+from reports.rollups import rebuild_rollups
+from shop.models import Order, OrderItem
+from users.models import Profile
+
+PREFIX = 'bench'
+PASSWORD = 'bench-password'
+BATCH_SIZE = 1000
+SAMPLE_IMAGE = f'prints/{PREFIX}/print-0.jpg'
+SAMPLE_FINAL_FILE = f'commissions/final/{PREFIX}/final.jpg'
+FIXED_COMMISSION_STATUSES = {0: 'pending', 1: 'completed'}
+
+
+def _store_sample(name):
+    """Write a small JPEG to media storage under exactly `name`."""
+    buffer = BytesIO()
+    Image.new('RGB', (64, 48), '#1a1a2e').save(buffer, 'JPEG')
+    default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def _order_days(orders):
+    """First and last local day the given orders were placed on, or None."""
+    span = orders.aggregate(first=Min('created_at'), last=Max('created_at'))
+    if span['first'] is None:
+        return None
+    return timezone.localdate(span['first']), timezone.localdate(span['last'])
+
+
+def clear_bench_data():
+    """Delete everything previously created by seed_bench_data()."""
+    orders = Order.objects.filter(stripe_session_id__startswith=f'cs_{PREFIX}_')
+    days = _order_days(orders)
+    orders.delete()
+    User.objects.filter(username__startswith=f'{PREFIX}_').delete()
+    prints = ArtPrint.objects.filter(slug__startswith=f'{PREFIX}-')
+    for name in prints.exclude(display_image='').values_list(
+        'display_image', flat=True
+    ):
+        default_storage.delete(name)
+    prints.delete()
+    Category.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+    PrintSize.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+    default_storage.delete(SAMPLE_IMAGE)
+    default_storage.delete(SAMPLE_FINAL_FILE)
+    if days:
+        rebuild_rollups(*days)
+
+
+@transaction.atomic
+def seed_bench_data(prints=1000, categories=10, users=100, wishlist=8,
+                    orders=3, items=3, commissions=2, seed=0):
+    """
+    Bulk-create a synthetic catalogue and customer base.
+
+    Each user gets `wishlist` wishlisted prints, `orders` orders of up to
+    `items` lines (roughly two thirds paid, granting downloads) and
+    `commissions` commission requests.  Returns the created row counts.
+    """
+    rng = random.Random(seed)
+
+    Category.objects.bulk_create([
+        Category(
+            name=f'Bench Category {i}',
+            slug=f'{PREFIX}-category-{i}',
+            description='Synthetic benchmark category.',
+        )
+        for i in range(categories)
+    ])
+    category_ids = list(
+        Category.objects.filter(slug__startswith=f'{PREFIX}-')
+        .values_list('id', flat=True)
+    )
+
+    ArtPrint.objects.bulk_create([
+        ArtPrint(
+            title=f'Bench Print {i}',
+            slug=f'{PREFIX}-print-{i}',
+            description=f'Synthetic benchmark print number {i}. ' * 4,
+            image=f'prints/{PREFIX}/print-{i}.jpg',
+            category_id=rng.choice(category_ids),
+            price=Decimal(rng.randint(20, 300)),
+            is_available=rng.random() > 0.1,
+            limited_edition=rng.choice([None, None, rng.randint(1, 50)]),
+        )
+        for i in range(prints)
+    ], batch_size=BATCH_SIZE)
+    art = dict(
+        ArtPrint.objects.filter(slug__startswith=f'{PREFIX}-')
+        .values_list('id', 'price')
+    )
+    art_ids = list(art)
+
+    _store_sample(SAMPLE_IMAGE)
+    sample = ArtPrint.objects.get(image=SAMPLE_IMAGE)
+    ArtPrint.objects.filter(pk=sample.pk).update(
+        image_hash=file_digest(sample.image),
+        display_image=store_display_image(sample.image),
+    )
+
+    PrintSize.objects.bulk_create([
+        PrintSize(name=f'Bench {name}', slug=f'{PREFIX}-{name.lower()}')
+        for name in ('A4', 'A3', '50x70cm')
+    ])
+    size_ids = list(
+        PrintSize.objects.filter(slug__startswith=f'{PREFIX}-')
+        .values_list('id', flat=True)
+    )
+    PrintSizes = ArtPrint.sizes.through
+    PrintSizes.objects.bulk_create([
+        PrintSizes(artprint_id=art_id, printsize_id=size_id)
+        for art_id in art_ids
+        for size_id in rng.sample(size_ids, rng.randint(1, len(size_ids)))
+    ], batch_size=BATCH_SIZE)
+    # bulk_create skips the signals that keep category counts current and
+    # retire cached catalogue fragments
+    recount_available_prints(category_ids)
+    bump_catalogue_version()
+
+    password = make_password(PASSWORD)
+    User.objects.bulk_create([
+        User(
+            username=f'{PREFIX}_user_{i}',
+            email=f'{PREFIX}_user_{i}@example.com',
+            password=password,
+        )
+        for i in range(users)
+    ], batch_size=BATCH_SIZE)
+    user_ids = list(
+        User.objects.filter(username__startswith=f'{PREFIX}_')
+        .values_list('id', flat=True)
+    )
+    # bulk_create skips the post_save signal that normally adds profiles
+    Profile.objects.bulk_create(
+        [Profile(user_id=user_id) for user_id in user_ids],
+        batch_size=BATCH_SIZE,
+    )
+    profiles = dict(
+        Profile.objects.filter(user_id__in=user_ids)
+        .values_list('user_id', 'id')
+    )
+
+    Wishlist = Profile.wishlist.through
+    Wishlist.objects.bulk_create([
+        Wishlist(profile_id=profiles[user_id], artprint_id=art_id)
+        for user_id in user_ids
+        for art_id in rng.sample(art_ids, min(wishlist, len(art_ids)))
+    ], batch_size=BATCH_SIZE)
+
+    order_lines = {}
+    new_orders = []
+    for user_id in user_ids:
+        for n in range(orders):
+            session_id = f'cs_{PREFIX}_{user_id}_{n}'
+            lines = rng.sample(art_ids, min(rng.randint(1, items), len(art_ids)))
+            paid = rng.random() < 0.66
+            order_lines[session_id] = lines
+            new_orders.append(Order(
+                user_id=user_id,
+                stripe_session_id=session_id,
+                total_amount=sum(art[art_id] for art_id in lines),
+                is_completed=paid,
+                status='paid' if paid else 'pending',
+            ))
+    Order.objects.bulk_create(new_orders, batch_size=BATCH_SIZE)
+
+    order_rows = Order.objects.filter(
+        stripe_session_id__startswith=f'cs_{PREFIX}_'
+    ).values_list('id', 'stripe_session_id', 'user_id', 'is_completed')
+    new_items = []
+    purchases = {(profile_id, sample.pk) for profile_id in profiles.values()}
+    for order_id, session_id, user_id, paid in order_rows:
+        for art_id in order_lines.get(session_id, []):
+            new_items.append(OrderItem(
+                order_id=order_id, art_print_id=art_id,
+                quantity=1, price=art[art_id],
+            ))
+            if paid:
+                purchases.add((profiles[user_id], art_id))
+    OrderItem.objects.bulk_create(new_items, batch_size=BATCH_SIZE)
+    # Orders inserted directly were never counted by fulfilment
+    days = _order_days(
+        Order.objects.filter(stripe_session_id__startswith=f'cs_{PREFIX}_')
+    )
+    if days:
+        rebuild_rollups(*days)
+
+    Purchased = Profile.purchased_prints.through
+    Purchased.objects.bulk_create([
+        Purchased(profile_id=profile_id, artprint_id=art_id)
+        for profile_id, art_id in purchases
+    ], batch_size=BATCH_SIZE)
+
+    _store_sample(SAMPLE_FINAL_FILE)
+    statuses = [choice for choice, _ in CommissionRequest.STATUS_CHOICES]
+    types = [choice for choice, _ in CommissionRequest.TYPE_CHOICES]
+    CommissionRequest.objects.bulk_create([
+        CommissionRequest(
+            user_id=user_id,
+            title=f'Bench commission {n}',
+            commission_type=rng.choice(types),
+            size=rng.choice(['A4', 'A3', '1080x1080px', 'large poster']),
+            description='Synthetic benchmark commission. ' * rng.randint(1, 20),
+            estimated_price=Decimal(rng.randint(80, 360)),
+            status=FIXED_COMMISSION_STATUSES.get(n) or rng.choice(statuses),
+            final_file=SAMPLE_FINAL_FILE if n == 1 else None,
+        )
+        for user_id in user_ids
+        for n in range(commissions)
+    ], batch_size=BATCH_SIZE)
+
+    return {
+        'categories': len(category_ids),
+        'prints': len(art_ids),
+        'users': len(user_ids),
+        'orders': len(new_orders),
+        'order_items': len(new_items),
+        'commissions': len(user_ids) * commissions,
+    }
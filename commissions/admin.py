@@ -1,11 +1,60 @@
 from django.contrib import admin
-from .models import CommissionRequest
+from django.utils.html import format_html
+
+from joe_django.admin import ScalableModelAdmin
+from notifications.outbox import enqueue
+
+from .models import CommissionRequest, ComplexityTier, PricingRule, SizeTier
 
 
 @admin.register(CommissionRequest)
-class CommissionRequestAdmin(admin.ModelAdmin):
+class CommissionRequestAdmin(ScalableModelAdmin):
     list_display = ('title', 'user', 'commission_type', 'status', 'estimated_price', 'deposit_paid', 'created_at')
-    list_filter = ('status', 'commission_type', 'deposit_paid')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    list_filter = ('status', 'commission_type', 'deposit_paid', 'reference_status')
     search_fields = ('title', 'description', 'user__username')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('reference_preview_tag', 'reference_status', 'created_at', 'updated_at')
     list_editable = ('status',)
+
+    def get_queryset(self, request):
+        # save_model() emails the owner, including for list_editable rows
+        return super().get_queryset(request).select_related('user')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data and obj.user.email:
+            enqueue(
+                'commission_status', obj.user.email,
+                commission_id=obj.pk, title=obj.title,
+                status=obj.get_status_display(),
+            )
+
+    @admin.display(description='Reference preview')
+    def reference_preview_tag(self, obj):
+        """Show the generated preview, linking to the normalized copy."""
+        if not obj.reference_preview:
+            return obj.get_reference_status_display() or '-'
+        return format_html(
+            '<a href="{}"><img src="{}" alt="" loading="lazy" '
+            'style="max-width: 240px; max-height: 240px;"></a>',
+            obj.reference_normalized.url, obj.reference_preview.url,
+        )
+
+
+@admin.register(PricingRule)
+class PricingRuleAdmin(ScalableModelAdmin):
+    list_display = ('commission_type', 'base_price')
+    list_editable = ('base_price',)
+
+
+@admin.register(SizeTier)
+class SizeTierAdmin(ScalableModelAdmin):
+    list_display = ('name', 'keywords', 'multiplier')
+    list_editable = ('keywords', 'multiplier')
+
+
+@admin.register(ComplexityTier)
+class ComplexityTierAdmin(ScalableModelAdmin):
+    list_display = ('min_length', 'multiplier')
+    list_editable = ('multiplier',)
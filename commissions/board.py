@@ -0,0 +1,97 @@
+"""
+Staff commission board: keyset-paginated status columns and bulk status
+transitions.
+
+Columns are ordered newest first on (created_at, id) and paged with a
+cursor holding the last row's values, so every page is a short range scan
+of the (status, created_at, id) index however deep the column is.
+"""
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from notifications.outbox import enqueue_many
+
+from .models import CommissionRequest
+
+BOARD_PAGE_SIZE = 20
+CARD_FIELDS = (
+    'id', 'title', 'commission_type', 'size', 'status', 'estimated_price',
+    'deposit_paid', 'reference_preview', 'created_at', 'user__username',
+)
+
+
+def encode_cursor(commission):
+    return f'{commission.created_at.isoformat()}_{commission.id}'
+
+
+def decode_cursor(cursor):
+    """Parse a cursor from encode_cursor(); raises ValueError if invalid."""
+    created_at, _, pk = cursor.rpartition('_')
+    return datetime.fromisoformat(created_at), int(pk)
+
+
+def column_page(status, cursor=None, page_size=BOARD_PAGE_SIZE):
+    """
+    One page of a status column and the cursor for the next page (None
+    on the last page).
+    """
+    commissions = (
+        CommissionRequest.objects.filter(status=status)
+        .select_related('user').only(*CARD_FIELDS)
+        .order_by('-created_at', '-id')
+    )
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        commissions = commissions.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    # Fetch one extra row to find out whether there is another page
+    rows = list(commissions[:page_size + 1])
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def board_columns():
+    """First page of every status column, with per-status totals."""
+    totals = dict(
+        CommissionRequest.objects.values_list('status')
+        .annotate(total=Count('id')).order_by()
+    )
+    columns = []
+    for status, label in CommissionRequest.STATUS_CHOICES:
+        commissions, next_cursor = column_page(status)
+        columns.append({
+            'status': status,
+            'label': label,
+            'total': totals.get(status, 0),
+            'commissions': commissions,
+            'next_cursor': next_cursor,
+        })
+    return columns
+
+
+def bulk_transition(ids, status):
+    """
+    Move the given commissions to `status` with a single UPDATE and queue
+    a notification for each owner in the same transaction.  Returns the
+    number moved.
+    """
+    with transaction.atomic():
+        moving = CommissionRequest.objects.filter(id__in=ids).exclude(status=status)
+        rows = list(moving.values_list('id', 'title', 'user__email'))
+        if not rows:
+            return 0
+        CommissionRequest.objects.filter(id__in=[row[0] for row in rows]).update(
+            status=status, updated_at=timezone.now()
+        )
+        label = dict(CommissionRequest.STATUS_CHOICES)[status]
+        enqueue_many('commission_status', [
+            (email, {'commission_id': pk, 'title': title, 'status': label})
+            for pk, title, email in rows if email
+        ])
+    return len(rows)
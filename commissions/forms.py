@@ -1,9 +1,15 @@
 from django import forms
+from .images import validate_reference_header, validate_reference_key
 from .models import CommissionRequest
 
 
 class CommissionForm(forms.ModelForm):
     """Form for creating/editing commission requests."""
+    # Set by the page script after a direct-to-storage upload
+    reference_key = forms.CharField(
+        required=False, max_length=255, widget=forms.HiddenInput
+    )
+
     class Meta:
         model = CommissionRequest
         fields = [
@@ -34,3 +40,34 @@ class CommissionForm(forms.ModelForm):
                 'class': 'form-control',
             }),
         }
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+
+    def clean_reference_key(self):
+        key = self.cleaned_data.get('reference_key')
+        if key:
+            validate_reference_key(key, self.user)
+        return key
+
+    @property
+    def reference_changed(self):
+        return bool(
+            {'reference_images', 'reference_key'} & set(self.changed_data)
+        )
+
+    def save(self, commit=True):
+        key = self.cleaned_data.get('reference_key')
+        if key:
+            # The file is already in storage; just point the field at it
+            self.instance.reference_images.name = key
+        return super().save(commit)
+
+    def clean_reference_images(self):
+        upload = self.cleaned_data.get('reference_images')
+        # Only new uploads carry a parsed header; an unchanged field holds
+        # the stored FieldFile and a cleared one is False.
+        if upload and hasattr(upload, 'image'):
+            validate_reference_header(upload)
+        return upload
@@ -0,0 +1,232 @@
+"""
+Reference image pipeline for commission requests.
+
+Uploads are streamed to a temporary file and checked in the form using
+only the image header (format and dimensions).  With MEDIA_STORAGE=s3
+the browser instead uploads straight to the bucket with a presigned POST
+(reference_upload()) and the form receives only the object key, whose
+header is checked with a ranged read.  The original is then stored
+untouched and the commission is marked pending; the
+process_reference_images worker later writes two derived files:
+    - reference_normalized: upright, EXIF-stripped copy capped at
+      COMMISSION_REFERENCE_MAX_EDGE pixels
+    - reference_preview: small WebP thumbnail used by the dashboard and admin
+"""
+import logging
+import os
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from joe_django.storage import presigned_upload, read_head
+
+from .models import CommissionRequest
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+# Direct uploads land under <prefix>/<user id>/ so a key can only be
+# attached by the user it was issued to
+DIRECT_UPLOAD_PREFIX = 'commissions/references/direct'
+# Enough of the file to reach the dimensions behind large EXIF blocks
+HEADER_BYTES = 256 * 1024
+
+
+def _check_reference(size, image):
+    if size > settings.COMMISSION_UPLOAD_MAX_BYTES:
+        limit = settings.COMMISSION_UPLOAD_MAX_BYTES // (1024 * 1024)
+        raise ValidationError(f'Reference images must be under {limit} MB.')
+    if image.format not in ALLOWED_FORMATS:
+        raise ValidationError(
+            'Please upload a JPEG, PNG, WebP or GIF reference image.'
+        )
+    width, height = image.size
+    if width * height > settings.COMMISSION_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            f'This image is {width}x{height}; please upload a smaller version.'
+        )
+
+
+def validate_reference_header(upload):
+    """
+    Check an uploaded reference image without decoding its pixels.
+    forms.ImageField has already parsed the header into `upload.image`.
+    """
+    _check_reference(upload.size, upload.image)
+
+
+def reference_storage():
+    return CommissionRequest._meta.get_field('reference_images').storage
+
+
+def reference_upload(user, filename):
+    """Presigned POST for a browser upload of one reference image."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ValidationError(
+            'Please upload a JPEG, PNG, WebP or GIF reference image.'
+        )
+    key = f'{DIRECT_UPLOAD_PREFIX}/{user.pk}/{uuid.uuid4().hex}{ext}'
+    upload = presigned_upload(
+        reference_storage(), key,
+        max_bytes=settings.COMMISSION_UPLOAD_MAX_BYTES,
+        content_type_prefix='image/',
+    )
+    return {'key': key, 'url': upload['url'], 'fields': upload['fields']}
+
+
+def validate_reference_key(key, user):
+    """Check a reference image the browser uploaded straight to storage."""
+    storage = reference_storage()
+    if (
+        not key.startswith(f'{DIRECT_UPLOAD_PREFIX}/{user.pk}/')
+        or '..' in key or not storage.exists(key)
+    ):
+        raise ValidationError('The reference image upload was not found.')
+    try:
+        with Image.open(BytesIO(read_head(storage, key, HEADER_BYTES))) as image:
+            _check_reference(storage.size(key), image)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('The reference image could not be read.')
+
+
+def queue_reference_processing(commission):
+    """
+    Drop derived files for a new or cleared upload and mark the
+    commission for the worker.  Call before saving the commission.
+    """
+    commission.reference_preview.delete(save=False)
+    commission.reference_normalized.delete(save=False)
+    commission.reference_status = (
+        CommissionRequest.REFERENCE_PENDING
+        if commission.reference_images else ''
+    )
+
+
+def _encode(image, format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def process_reference(commission):
+    """Write the normalized copy and preview for one commission."""
+    source = commission.reference_images
+    stem = os.path.splitext(os.path.basename(source.name))[0]
+    max_edge = settings.COMMISSION_REFERENCE_MAX_EDGE
+
+    with source.open('rb'), Image.open(source) as original:
+        # Let JPEGs decode at a reduced scale when they are far too large
+        original.draft('RGB', (max_edge, max_edge))
+        # exif_transpose applies the orientation tag; saving without
+        # exif= then drops the metadata (GPS, camera details)
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((max_edge, max_edge))
+
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    if has_alpha:
+        normalized = _encode(image.convert('RGBA'), 'PNG', optimize=True)
+        normalized_name = f'{stem}.png'
+    else:
+        normalized = _encode(
+            image.convert('RGB'), 'JPEG', quality=90, optimize=True
+        )
+        normalized_name = f'{stem}.jpg'
+
+    preview = image.convert('RGBA' if has_alpha else 'RGB')
+    preview.thumbnail(settings.COMMISSION_PREVIEW_SIZE)
+
+    commission.reference_normalized.save(
+        normalized_name, normalized, save=False
+    )
+    commission.reference_preview.save(
+        f'{stem}-preview.webp', _encode(preview, 'WEBP', quality=80),
+        save=False,
+    )
+
+
+def _claim_next_reference():
+    """
+    Mark the oldest pending commission as processing and return it.  A
+    row left processing by a worker that died is claimed again once its
+    COMMISSION_REFERENCE_LEASE_SECONDS have passed.
+    """
+    now = timezone.now()
+    lease_expired = now - timedelta(
+        seconds=settings.COMMISSION_REFERENCE_LEASE_SECONDS
+    )
+    claimable = CommissionRequest.objects.filter(
+        Q(reference_status=CommissionRequest.REFERENCE_PENDING)
+        | Q(
+            reference_status=CommissionRequest.REFERENCE_PROCESSING,
+            updated_at__lt=lease_expired,
+        )
+    ).order_by('updated_at')
+    while True:
+        with transaction.atomic():
+            candidates = claimable
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            commission = candidates.first()
+            if commission is None:
+                return None
+            # Conditional, so of two workers without SKIP LOCKED only one wins
+            claimed = claimable.filter(
+                pk=commission.pk, updated_at=commission.updated_at
+            ).update(
+                reference_status=CommissionRequest.REFERENCE_PROCESSING,
+                updated_at=now,
+            )
+        if claimed:
+            commission.reference_status = CommissionRequest.REFERENCE_PROCESSING
+            commission.updated_at = now
+            return commission
+
+
+def process_next_reference():
+    """
+    Claim and process one pending commission.  Returns it, or None when
+    the queue is empty.  The row is claimed in a short transaction and
+    the image is decoded and stored without holding a lock, so several
+    workers can run side by side.  Any error marks the reference failed
+    rather than stopping the worker.
+    """
+    commission = _claim_next_reference()
+    if commission is None:
+        return None
+
+    try:
+        process_reference(commission)
+        status = CommissionRequest.REFERENCE_READY
+    except Exception as e:
+        logger.exception(
+            f'Could not process reference image for commission '
+            f'#{commission.pk}: {e}'
+        )
+        status = CommissionRequest.REFERENCE_FAILED
+
+    # Only if the customer hasn't replaced the image meanwhile
+    updated = CommissionRequest.objects.filter(
+        pk=commission.pk,
+        reference_status=CommissionRequest.REFERENCE_PROCESSING,
+        reference_images=commission.reference_images.name,
+    ).update(
+        reference_normalized=commission.reference_normalized.name or '',
+        reference_preview=commission.reference_preview.name or '',
+        reference_status=status,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        commission.reference_preview.delete(save=False)
+        commission.reference_normalized.delete(save=False)
+    commission.reference_status = status
+    return commission
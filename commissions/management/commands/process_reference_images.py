@@ -0,0 +1,53 @@
+"""
+Management command that generates previews and normalized copies of
+commission reference images.
+
+Usage:
+    python manage.py process_reference_images            # drain and exit
+    python manage.py process_reference_images --loop     # run as a worker
+
+Runs as the `worker` process in the Procfile.  Uploads are marked pending
+by the commission views; see commissions/images.py.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from commissions.images import process_next_reference
+from commissions.models import CommissionRequest
+
+
+class Command(BaseCommand):
+    help = 'Create previews and EXIF-stripped copies of reference images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new uploads instead of exiting.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to wait between polls when idle (default 5).',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = self.drain()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Processed {processed} reference image(s)'
+                ))
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def drain(self):
+        processed = 0
+        while (commission := process_next_reference()) is not None:
+            processed += 1
+            if commission.reference_status == CommissionRequest.REFERENCE_FAILED:
+                self.stderr.write(f'Commission #{commission.pk}: failed')
+        return processed
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:01
+
+from django.db import migrations, models
+
+
+def queue_existing_references(apps, schema_editor):
+    CommissionRequest = apps.get_model('commissions', 'CommissionRequest')
+    CommissionRequest.objects.exclude(reference_images='').exclude(
+        reference_images__isnull=True
+    ).update(reference_status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commissionrequest',
+            name='reference_normalized',
+            field=models.ImageField(blank=True, editable=False, upload_to='commissions/normalized/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='commissionrequest',
+            name='reference_preview',
+            field=models.ImageField(blank=True, editable=False, upload_to='commissions/previews/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='commissionrequest',
+            name='reference_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, editable=False, max_length=10),
+        ),
+        migrations.RunPython(queue_existing_references, migrations.RunPython.noop),
+    ]
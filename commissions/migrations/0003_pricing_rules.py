@@ -0,0 +1,64 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:03
+
+from django.db import migrations, models
+
+
+def create_default_rules(apps, schema_editor):
+    """The prices previously hard-coded in views._calculate_price()."""
+    PricingRule = apps.get_model('commissions', 'PricingRule')
+    SizeTier = apps.get_model('commissions', 'SizeTier')
+    ComplexityTier = apps.get_model('commissions', 'ComplexityTier')
+    PricingRule.objects.bulk_create([
+        PricingRule(commission_type=commission_type, base_price=price)
+        for commission_type, price in [
+            ('icon', 80), ('logo', 80), ('poster', 80),
+            ('portrait', 120), ('other', 80),
+        ]
+    ])
+    SizeTier.objects.create(name='Large', keywords='large, a3', multiplier=2)
+    ComplexityTier.objects.create(min_length=301, multiplier='1.5')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0002_reference_image_pipeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplexityTier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_length', models.PositiveIntegerField(unique=True)),
+                ('multiplier', models.DecimalField(decimal_places=2, max_digits=4)),
+            ],
+            options={
+                'ordering': ['-min_length'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PricingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commission_type', models.CharField(choices=[('icon', 'Icon'), ('logo', 'Logo'), ('poster', 'Poster'), ('portrait', 'Character Portrait'), ('other', 'Other')], max_length=100, unique=True)),
+                ('base_price', models.DecimalField(decimal_places=2, max_digits=9)),
+            ],
+            options={
+                'ordering': ['commission_type'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SizeTier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('keywords', models.CharField(help_text='Comma-separated, case-insensitive', max_length=200)),
+                ('multiplier', models.DecimalField(decimal_places=2, max_digits=4)),
+            ],
+            options={
+                'ordering': ['-multiplier'],
+            },
+        ),
+        migrations.RunPython(create_default_rules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0003_pricing_rules'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commissionrequest',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='commission_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commissionrequest',
+            index=models.Index(fields=['user', '-created_at'], name='commission_user_created_idx'),
+        ),
+    ]
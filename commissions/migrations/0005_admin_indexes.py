@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0004_commission_board_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commissionrequest',
+            index=models.Index(fields=['-created_at'], name='commission_created_idx'),
+        ),
+    ]
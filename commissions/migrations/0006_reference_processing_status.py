@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0005_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='commissionrequest',
+            name='reference_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Queued'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, editable=False, max_length=10),
+        ),
+    ]
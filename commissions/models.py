@@ -1,6 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 
+from joe_django.signals import post_bulk_update
+
+from .pricing import invalidate_pricing_table
+
 
 class CommissionRequest(models.Model):
     """
@@ -16,6 +22,17 @@ class CommissionRequest(models.Model):
         ('cancelled', 'Cancelled'),
     )
 
+    REFERENCE_PENDING = 'pending'
+    REFERENCE_PROCESSING = 'processing'
+    REFERENCE_READY = 'ready'
+    REFERENCE_FAILED = 'failed'
+    REFERENCE_STATUS_CHOICES = (
+        (REFERENCE_PENDING, 'Queued'),
+        (REFERENCE_PROCESSING, 'Processing'),
+        (REFERENCE_READY, 'Ready'),
+        (REFERENCE_FAILED, 'Failed'),
+    )
+
     TYPE_CHOICES = [
         ('icon', 'Icon'),
         ('logo', 'Logo'),
@@ -40,6 +57,17 @@ class CommissionRequest(models.Model):
     reference_images = models.ImageField(
         upload_to='commissions/references/%Y/%m/', blank=True, null=True
     )
+    # Derived by the process_reference_images worker (see images.py)
+    reference_normalized = models.ImageField(
+        upload_to='commissions/normalized/%Y/%m/', blank=True, editable=False
+    )
+    reference_preview = models.ImageField(
+        upload_to='commissions/previews/%Y/%m/', blank=True, editable=False
+    )
+    reference_status = models.CharField(
+        max_length=10, choices=REFERENCE_STATUS_CHOICES, blank=True,
+        db_index=True, editable=False,
+    )
     estimated_price = models.DecimalField(
         max_digits=9, decimal_places=2, null=True, blank=True
     )
@@ -58,6 +86,19 @@ class CommissionRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='commission_created_idx'),
+            # Staff board columns (keyset-paginated on created_at, id)
+            models.Index(
+                fields=['status', '-created_at', '-id'],
+                name='commission_status_created_idx',
+            ),
+            # A customer's own commissions on the dashboard
+            models.Index(
+                fields=['user', '-created_at'],
+                name='commission_user_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} by {self.user.username}"
@@ -77,3 +118,66 @@ class CommissionRequest(models.Model):
             'cancelled': 'dark',
         }
         return badges.get(self.status, 'secondary')
+
+
+class PricingRule(models.Model):
+    """Base price for one commission type."""
+    commission_type = models.CharField(
+        max_length=100, choices=CommissionRequest.TYPE_CHOICES, unique=True
+    )
+    base_price = models.DecimalField(max_digits=9, decimal_places=2)
+
+    class Meta:
+        ordering = ['commission_type']
+
+    def __str__(self):
+        return f"{self.get_commission_type_display()}: \u20ac{self.base_price}"
+
+
+class SizeTier(models.Model):
+    """
+    Price multiplier for sizes whose description contains any of the
+    keywords, e.g. "large, a3".  The largest matching multiplier wins.
+    """
+    name = models.CharField(max_length=50)
+    keywords = models.CharField(
+        max_length=200, help_text="Comma-separated, case-insensitive"
+    )
+    multiplier = models.DecimalField(max_digits=4, decimal_places=2)
+
+    class Meta:
+        ordering = ['-multiplier']
+
+    def __str__(self):
+        return f"{self.name} (\u00d7{self.multiplier})"
+
+    def keyword_list(self):
+        return [k.strip().lower() for k in self.keywords.split(',') if k.strip()]
+
+
+class ComplexityTier(models.Model):
+    """Price multiplier for descriptions of at least `min_length` characters."""
+    min_length = models.PositiveIntegerField(unique=True)
+    multiplier = models.DecimalField(max_digits=4, decimal_places=2)
+
+    class Meta:
+        ordering = ['-min_length']
+
+    def __str__(self):
+        return f"{self.min_length}+ chars (\u00d7{self.multiplier})"
+
+
+@receiver(post_save, sender=PricingRule)
+@receiver(post_delete, sender=PricingRule)
+@receiver(post_save, sender=SizeTier)
+@receiver(post_delete, sender=SizeTier)
+@receiver(post_save, sender=ComplexityTier)
+@receiver(post_delete, sender=ComplexityTier)
+@receiver(post_bulk_update, sender=PricingRule)
+@receiver(post_bulk_update, sender=SizeTier)
+@receiver(post_bulk_update, sender=ComplexityTier)
+def pricing_changed(sender, **kwargs):
+    """Rebuild the memoized pricing table after any rule changes."""
+    # Only once the change is committed, or another process could reload
+    # the old rules under the new version and keep them
+    transaction.on_commit(invalidate_pricing_table)
@@ -0,0 +1,120 @@
+"""
+Commission pricing engine.
+
+Prices come from the PricingRule, SizeTier and ComplexityTier tables:
+    base price (by type) x size multiplier x complexity multiplier
+
+The rules are loaded once into an in-process PricingTable, so quoting
+never touches the database.  When a transaction that saves or deletes a
+rule (admin, shell, migrations) commits, this process's table is dropped
+and a version number in the cache is bumped; other processes compare
+against that version at most every PRICING_RECHECK_SECONDS.  That needs a
+shared CACHE_URL, so tables are also reloaded after
+PRICING_MAX_AGE_SECONDS.  Bulk QuerySet.update()
+skips the signals, so call invalidate_pricing_table() yourself after one.
+"""
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'commissions:pricing-version'
+ONE = Decimal('1')
+CENTS = Decimal('0.01')
+
+_table = None
+
+
+class PricingTable:
+    """An immutable snapshot of the pricing rules."""
+
+    def __init__(self, base_prices, size_tiers, complexity_tiers, version):
+        self.base_prices = base_prices
+        # [(keywords, multiplier)] with the largest multiplier first
+        self.size_tiers = size_tiers
+        # [(min_length, multiplier)] with the longest min_length first
+        self.complexity_tiers = complexity_tiers
+        self.version = version
+        self.loaded_at = self.checked_at = time.monotonic()
+
+    def size_multiplier(self, size):
+        size = size.lower()
+        for keywords, multiplier in self.size_tiers:
+            if any(keyword in size for keyword in keywords):
+                return multiplier
+        return ONE
+
+    def complexity_multiplier(self, description_length):
+        for min_length, multiplier in self.complexity_tiers:
+            if description_length >= min_length:
+                return multiplier
+        return ONE
+
+    def quote(self, commission_type, size, description_length):
+        """Price in euro, or None if there is no rule for the type."""
+        base = self.base_prices.get(commission_type)
+        if base is None:
+            return None
+        price = (
+            base
+            * self.size_multiplier(size)
+            * self.complexity_multiplier(description_length)
+        )
+        return price.quantize(CENTS)
+
+
+def _load(version):
+    from .models import ComplexityTier, PricingRule, SizeTier
+
+    return PricingTable(
+        base_prices=dict(
+            PricingRule.objects.values_list('commission_type', 'base_price')
+        ),
+        size_tiers=[
+            (tier.keyword_list(), tier.multiplier)
+            for tier in SizeTier.objects.all()
+        ],
+        complexity_tiers=list(
+            ComplexityTier.objects.values_list('min_length', 'multiplier')
+        ),
+        version=version,
+    )
+
+
+def get_pricing_table():
+    """Return the current PricingTable, loading it if needed."""
+    global _table
+    table = _table
+    now = time.monotonic()
+    if table is not None and (
+        now - table.checked_at < settings.PRICING_RECHECK_SECONDS
+    ):
+        return table
+
+    version = cache.get(VERSION_KEY, 0)
+    if table is not None and table.version == version and (
+        now - table.loaded_at < settings.PRICING_MAX_AGE_SECONDS
+    ):
+        table.checked_at = now
+        return table
+
+    _table = table = _load(version)
+    return table
+
+
+def invalidate_pricing_table():
+    """Forget the loaded rules here and tell other processes to reload."""
+    global _table
+    _table = None
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def quote(commission_type, size, description_length):
+    """Price a commission from the memoized rules (no database query)."""
+    return get_pricing_table().quote(
+        commission_type, size or '', description_length
+    )
@@ -1,3 +1,108 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from joe_django.signals import post_bulk_update
+
+from . import pricing
+from .models import ComplexityTier, PricingRule, SizeTier
+
+
+@override_settings(PRICING_RECHECK_SECONDS=60, PRICING_MAX_AGE_SECONDS=300)
+class PricingTests(TestCase):
+
+    def setUp(self):
+        # Replace the rules seeded by the migration with known ones
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingRule.objects.all().delete()
+            SizeTier.objects.all().delete()
+            ComplexityTier.objects.all().delete()
+            self.portrait = PricingRule.objects.create(
+                commission_type='portrait', base_price=120,
+            )
+            SizeTier.objects.create(
+                name='Large', keywords='large, A3', multiplier=Decimal('1.5'),
+            )
+            ComplexityTier.objects.create(
+                min_length=200, multiplier=Decimal('1.2'),
+            )
+        cache.clear()
+        pricing._table = None
+        self.addCleanup(setattr, pricing, '_table', None)
+
+    def test_quote_multiplies_base_size_and_complexity(self):
+        for size, length, price in [
+            ('small', 10, '120.00'),
+            ('Large canvas', 250, '216.00'),
+            ('a3', 199, '180.00'),
+        ]:
+            self.assertEqual(
+                pricing.quote('portrait', size, length), Decimal(price)
+            )
+
+    def test_unpriced_type_has_no_quote(self):
+        self.assertIsNone(pricing.quote('logo', 'large', 300))
+        response = self.client.get(
+            reverse('commission_quote'), {'commission_type': 'logo'}
+        )
+        self.assertEqual(response.json(), {'price': None, 'currency': 'EUR'})
+
+    def test_quotes_run_no_queries_once_loaded(self):
+        pricing.get_pricing_table()
+        with self.assertNumQueries(0):
+            for length in (0, 250):
+                pricing.quote('portrait', 'large', length)
+            response = self.client.get(reverse('commission_quote'), {
+                'commission_type': 'portrait', 'size': 'A3',
+                'description_length': 250,
+            })
+        self.assertEqual(response.json()['price'], '216.00')
+
+    def test_rule_change_applies_once_committed(self):
+        self.assertEqual(pricing.quote('portrait', '', 0), Decimal('120.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.portrait.base_price = 150
+                self.portrait.save()
+            # Not yet committed: still the old rules
+            self.assertEqual(
+                pricing.quote('portrait', '', 0), Decimal('120.00')
+            )
+        self.assertEqual(pricing.quote('portrait', '', 0), Decimal('150.00'))
+
+    def test_deleting_a_rule_unprices_its_type(self):
+        pricing.get_pricing_table()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.portrait.delete()
+        self.assertIsNone(pricing.quote('portrait', '', 0))
+
+    def test_bulk_update_invalidates(self):
+        pricing.get_pricing_table()
+        self.portrait.base_price = 90
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingRule.objects.bulk_update([self.portrait], ['base_price'])
+            post_bulk_update.send(
+                sender=PricingRule, instances=[self.portrait],
+                fields=['base_price'],
+            )
+        self.assertEqual(pricing.quote('portrait', '', 0), Decimal('90.00'))
+
+    def test_other_processes_reload_on_version_change(self):
+        table = pricing.get_pricing_table()
+        # Another process committed a change and bumped the version
+        cache.set(pricing.VERSION_KEY, table.version + 1, timeout=None)
+        self.assertIs(pricing.get_pricing_table(), table)
+
+        with override_settings(PRICING_RECHECK_SECONDS=0):
+            reloaded = pricing.get_pricing_table()
+        self.assertIsNot(reloaded, table)
+        self.assertEqual(reloaded.version, table.version + 1)
+
+    def test_unchanged_version_keeps_the_table(self):
+        table = pricing.get_pricing_table()
+        with override_settings(PRICING_RECHECK_SECONDS=0), \
+                self.assertNumQueries(0):
+            self.assertIs(pricing.get_pricing_table(), table)
@@ -3,6 +3,12 @@ from . import views
 
 urlpatterns = [
     path('new/', views.commission_create, name='commission_create'),
+    path('quote/', views.commission_quote, name='commission_quote'),
+    path('upload-url/', views.commission_upload_url, name='commission_upload_url'),
     path('<int:pk>/edit/', views.commission_edit, name='commission_edit'),
     path('<int:pk>/delete/', views.commission_delete, name='commission_delete'),
+    path('<int:pk>/final/', views.commission_final_file, name='commission_final_file'),
+    path('board/', views.commission_board, name='commission_board'),
+    path('board/bulk-status/', views.commission_bulk_status, name='commission_bulk_status'),
+    path('board/<str:status>/', views.commission_board_column, name='commission_board_column'),
 ]
@@ -1,43 +1,105 @@
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, JsonResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_GET, require_POST
 
+from joe_django.storage import direct_media, serve_file
+
+from .board import board_columns, bulk_transition, column_page
 from .forms import CommissionForm
+from .images import queue_reference_processing, reference_upload
 from .models import CommissionRequest
+from .pricing import get_pricing_table, quote
 
 
-def _calculate_price(commission_type, size, desc_length):
+def _calculate_price(commission):
     """Server-side price calculation (never trust client-side values)."""
-    base = 120 if commission_type == 'portrait' else 80
-    size_mult = 2.0 if ('large' in size.lower() or 'a3' in size.upper()) else 1.0
-    complexity = 1.5 if desc_length > 300 else 1.0
-    return round(base * size_mult * complexity, 2)
+    return quote(
+        commission.commission_type,
+        commission.size,
+        len(commission.description),
+    )
+
+
+def _pricing_summary():
+    """The current pricing rules, for the form's "How pricing works" box."""
+    table = get_pricing_table()
+    labels = dict(CommissionRequest.TYPE_CHOICES)
+    return {
+        'base_prices': [
+            (labels.get(commission_type, commission_type), price)
+            for commission_type, price in table.base_prices.items()
+        ],
+        'size_tiers': [
+            (', '.join(keywords), multiplier)
+            for keywords, multiplier in table.size_tiers
+        ],
+        'complexity_tiers': table.complexity_tiers,
+    }
+
+
+@require_GET
+def commission_quote(request):
+    """
+    Live price estimate for the commission form.  Returns an HTML fragment
+    for HTMX requests and JSON otherwise; served from the memoized pricing
+    table so it never queries the database.
+    """
+    try:
+        description_length = int(request.GET.get('description_length', 0))
+    except ValueError:
+        description_length = 0
+    price = quote(
+        request.GET.get('commission_type', ''),
+        request.GET.get('size', ''),
+        max(description_length, 0),
+    )
+
+    if request.headers.get('HX-Request'):
+        return HttpResponse(render_to_string(
+            'commissions/includes/quote.html', {'price': price}
+        ))
+    return JsonResponse({
+        'price': str(price) if price is not None else None,
+        'currency': 'EUR',
+    })
 
 
 @login_required
 def commission_create(request):
     """Create a new commission request with live JS price preview."""
     if request.method == 'POST':
-        form = CommissionForm(request.POST, request.FILES)
+        form = CommissionForm(request.POST, request.FILES, user=request.user)
         if form.is_valid():
             commission = form.save(commit=False)
             commission.user = request.user
-            commission.estimated_price = _calculate_price(
-                commission.commission_type,
-                commission.size,
-                len(commission.description),
-            )
+            commission.estimated_price = _calculate_price(commission)
+            queue_reference_processing(commission)
             commission.save()
+            if commission.estimated_price is None:
+                # No PricingRule for the type yet; staff will quote it
+                estimate = "We'll send you a quote."
+            else:
+                estimate = f'Estimated \u20ac{commission.estimated_price}'
             messages.success(
                 request,
-                f'Commission request #{commission.id} submitted! '
-                f'Estimated \u20ac{commission.estimated_price}'
+                f'Commission request #{commission.id} submitted! {estimate}'
             )
             return redirect('dashboard')
     else:
-        form = CommissionForm()
+        form = CommissionForm(user=request.user)
 
-    return render(request, 'commissions/commission_form.html', {'form': form})
+    return render(request, 'commissions/commission_form.html', {
+        'form': form,
+        'pricing': _pricing_summary(),
+        'direct_uploads': direct_media(),
+    })
 
 
 @login_required
@@ -51,27 +113,53 @@ def commission_edit(request, pk):
         return redirect('dashboard')
 
     if request.method == 'POST':
-        form = CommissionForm(request.POST, request.FILES, instance=commission)
+        form = CommissionForm(
+            request.POST, request.FILES, instance=commission, user=request.user
+        )
         if form.is_valid():
             commission = form.save(commit=False)
-            commission.estimated_price = _calculate_price(
-                commission.commission_type,
-                commission.size,
-                len(commission.description),
-            )
+            commission.estimated_price = _calculate_price(commission)
+            if form.reference_changed:
+                queue_reference_processing(commission)
             commission.save()
             messages.success(request, 'Commission updated successfully.')
             return redirect('dashboard')
     else:
-        form = CommissionForm(instance=commission)
+        form = CommissionForm(instance=commission, user=request.user)
 
     return render(request, 'commissions/commission_form.html', {
         'form': form,
         'editing': True,
         'commission': commission,
+        'pricing': _pricing_summary(),
+        'direct_uploads': direct_media(),
     })
 
 
+@login_required
+@require_POST
+def commission_upload_url(request):
+    """Presigned POST for uploading a reference image straight to storage."""
+    if not direct_media():
+        raise Http404('Direct uploads are not enabled.')
+    try:
+        upload = reference_upload(request.user, request.POST.get('filename', ''))
+    except ValidationError as e:
+        return JsonResponse({'error': e.messages[0]}, status=400)
+    return JsonResponse(upload)
+
+
+@login_required
+def commission_final_file(request, pk):
+    """Download the finished artwork for one of the user's commissions."""
+    commission = get_object_or_404(CommissionRequest, pk=pk)
+    if commission.user_id != request.user.id and not request.user.is_staff:
+        raise Http404('Commission not found')
+    if not commission.final_file:
+        raise Http404('No final file yet')
+    return serve_file(commission.final_file, attachment=True)
+
+
 @login_required
 def commission_delete(request, pk):
     """Delete a commission request (only if editable)."""
@@ -90,3 +178,47 @@ def commission_delete(request, pk):
     return render(request, 'commissions/commission_confirm_delete.html', {
         'commission': commission,
     })
+
+
+@staff_member_required
+def commission_board(request):
+    """Staff board with one column per commission status."""
+    return render(request, 'commissions/board.html', {
+        'columns': board_columns(),
+        'status_choices': CommissionRequest.STATUS_CHOICES,
+    })
+
+
+@staff_member_required
+def commission_board_column(request, status):
+    """Next page of one board column (HTMX "load more")."""
+    if status not in dict(CommissionRequest.STATUS_CHOICES):
+        return HttpResponseBadRequest('Unknown status.')
+    try:
+        commissions, next_cursor = column_page(status, request.GET.get('cursor'))
+    except ValueError:
+        return HttpResponseBadRequest('Invalid cursor.')
+    return render(request, 'commissions/includes/board_cards.html', {
+        'column': {'status': status},
+        'commissions': commissions,
+        'next_cursor': next_cursor,
+    })
+
+
+@staff_member_required
+@require_POST
+def commission_bulk_status(request):
+    """Move the selected commissions to a new status in one UPDATE."""
+    status = request.POST.get('status')
+    if status not in dict(CommissionRequest.STATUS_CHOICES):
+        messages.error(request, 'Please choose a status.')
+        return redirect('commission_board')
+    try:
+        ids = [int(pk) for pk in request.POST.getlist('commission_ids')]
+    except ValueError:
+        return HttpResponseBadRequest('Invalid commission id.')
+
+    moved = bulk_transition(ids, status)
+    label = dict(CommissionRequest.STATUS_CHOICES)[status]
+    messages.success(request, f'{moved} commission(s) moved to {label}.')
+    return redirect('commission_board')
@@ -1,17 +1,31 @@
 from django.contrib import admin
-from .models import Category, ArtPrint
+
+from joe_django.admin import ScalableModelAdmin
+
+from .models import ArtPrint, Category, PrintSize
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'available_print_count')
+    prepopulated_fields = {'slug': ('name',)}
+
+
+@admin.register(PrintSize)
+class PrintSizeAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug')
     prepopulated_fields = {'slug': ('name',)}
 
 
 @admin.register(ArtPrint)
-class ArtPrintAdmin(admin.ModelAdmin):
+class ArtPrintAdmin(ScalableModelAdmin):
     list_display = ('title', 'category', 'price', 'is_available', 'limited_edition', 'created_at')
-    list_filter = ('is_available', 'category')
+    list_select_related = ('category',)
+    list_filter = ('is_available', 'category', 'sizes')
     search_fields = ('title', 'description')
     prepopulated_fields = {'slug': ('title',)}
     list_editable = ('price', 'is_available')
+    # save() only derives the slug and image data, and the category
+    # recount and catalogue_changed also listen for post_bulk_update
+    bulk_edit_fields = ('price', 'is_available')
+    filter_horizontal = ('sizes',)
@@ -0,0 +1,28 @@
+"""
+Catalogue version for cache keys.
+
+Fragments rendered from categories or prints, and the gallery facet
+counts, are cached under a key that includes catalogue_version().  Saving
+or deleting a Category, ArtPrint or PrintSize, changing a print's sizes,
+or bulk-updating prints from the admin bumps the version, so old entries
+are never read again and simply expire.  Code that changes the
+catalogue with bulk_create() or QuerySet.update() skips the signals and
+should call bump_catalogue_version() itself.
+
+The version lives in the default cache, so only a shared CACHE_URL
+carries a bump to every process; otherwise the entries are kept for just
+CATALOGUE_CACHE_TIMEOUT seconds (see settings.py).
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'gallery:catalogue-version'
+
+
+def catalogue_version():
+    return cache.get_or_set(VERSION_KEY, time.time_ns, timeout=None)
+
+
+def bump_catalogue_version():
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
@@ -0,0 +1,201 @@
+"""
+Faceted filtering for the gallery.
+
+Besides the category tabs, the gallery list can be narrowed from the
+query string by:
+
+    size          ?size=a4&size=a3    offered in any of the chosen sizes
+    price         ?price=50-100       one of PRICE_RANGES
+    availability  ?availability=...   one of AVAILABILITY (default in stock)
+
+Every option shows how many prints choosing it would list, given the
+category and the other facets' choices; choosing A4 therefore doesn't
+zero the count of A3.  All counts come from a single aggregate query, one
+filtered COUNT per option, and are cached per catalogue version and
+selection, so a repeat visit to the same filters costs no queries.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.http import urlencode
+
+from .catalogue import catalogue_version
+from .models import ArtPrint, PrintSize
+
+MAX_SIZES = 10
+SLUG = re.compile(r'^[-\w]+$')
+
+# key -> (label, lowest price, price ceiling); either bound may be None
+PRICE_RANGES = {
+    'under-50': ('Under €50', None, 50),
+    '50-100': ('€50 – €100', 50, 100),
+    '100-200': ('€100 – €200', 100, 200),
+    '200-plus': ('€200 and up', 200, None),
+}
+AVAILABILITY = {
+    'in-stock': ('In stock', Q(is_available=True)),
+    'limited': (
+        'Limited editions',
+        Q(is_available=True, limited_edition__isnull=False),
+    ),
+    'sold-out': ('Sold out', Q(is_available=False)),
+}
+DEFAULT_AVAILABILITY = 'in-stock'
+
+
+def read_selection(params):
+    """The facet choices in a QueryDict, with invalid values dropped."""
+    sizes = sorted({
+        slug for slug in params.getlist('size') if SLUG.match(slug)
+    })[:MAX_SIZES]
+    price = params.get('price')
+    availability = params.get('availability')
+    return {
+        'size': sizes,
+        'price': price if price in PRICE_RANGES else None,
+        'availability': (
+            availability if availability in AVAILABILITY
+            else DEFAULT_AVAILABILITY
+        ),
+    }
+
+
+def _price_condition(key):
+    if key is None:
+        return Q()
+    _, low, high = PRICE_RANGES[key]
+    condition = Q()
+    if low is not None:
+        condition &= Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def _conditions(selection):
+    """One Q per facet for the current selection."""
+    size = Q()
+    if selection['size']:
+        # A subquery rather than a join, so no print is listed twice
+        size = Q(pk__in=ArtPrint.sizes.through.objects.filter(
+            printsize__slug__in=selection['size']
+        ).values('artprint_id'))
+    return {
+        'size': size,
+        'price': _price_condition(selection['price']),
+        'availability': AVAILABILITY[selection['availability']][1],
+    }
+
+
+def filter_prints(prints, selection):
+    for condition in _conditions(selection).values():
+        prints = prints.filter(condition)
+    return prints
+
+
+def _count_options(category, selection):
+    conditions = _conditions(selection)
+
+    def others(facet):
+        combined = Q()
+        for name, condition in conditions.items():
+            if name != facet:
+                combined &= condition
+        return combined
+
+    def count(condition):
+        # Rows are repeated once per size by the join for the size counts
+        return Count('pk', filter=condition, distinct=True)
+
+    sizes = list(PrintSize.objects.values_list('id', 'slug', 'name'))
+    aggregates = {}
+    for size_id, slug, _ in sizes:
+        aggregates[f'size:{slug}'] = count(others('size') & Q(sizes=size_id))
+    for key in PRICE_RANGES:
+        aggregates[f'price:{key}'] = count(
+            others('price') & _price_condition(key)
+        )
+    for key, (_, condition) in AVAILABILITY.items():
+        aggregates[f'availability:{key}'] = count(
+            others('availability') & condition
+        )
+
+    prints = ArtPrint.objects.all()
+    if category is not None:
+        prints = prints.filter(category=category)
+    counts = prints.aggregate(**aggregates)
+    return [(slug, name) for _, slug, name in sizes], counts
+
+
+def facet_counts(category, selection):
+    """
+    ([(size slug, size name)], {'facet:option': count}) for the category
+    (None for all) and selection, from the cache when possible.
+    """
+    state = repr((
+        category.pk if category else None, selection['size'],
+        selection['price'], selection['availability'],
+    ))
+    digest = hashlib.md5(state.encode()).hexdigest()
+    key = f'gallery:facets:{catalogue_version()}:{digest}'
+    return cache.get_or_set(
+        key, lambda: _count_options(category, selection),
+        settings.CATALOGUE_CACHE_TIMEOUT,
+    )
+
+
+def _query(category_slug, selection):
+    params = [('category', category_slug)] if category_slug else []
+    params += [('size', slug) for slug in selection['size']]
+    if selection['price']:
+        params.append(('price', selection['price']))
+    if selection['availability'] != DEFAULT_AVAILABILITY:
+        params.append(('availability', selection['availability']))
+    return f'?{urlencode(params)}' if params else ''
+
+
+def facet_groups(category, category_slug, selection):
+    """Facet groups for the template, each option with its count and link."""
+    sizes, counts = facet_counts(category, selection)
+
+    def option(facet, value, label, selected, toggled):
+        return {
+            'label': label,
+            'count': counts.get(f'{facet}:{value}', 0),
+            'selected': selected,
+            'query': _query(category_slug, {**selection, facet: toggled}),
+        }
+
+    size_options = []
+    for slug, name in sizes:
+        selected = slug in selection['size']
+        toggled = sorted(set(selection['size']) ^ {slug})
+        size_options.append(option('size', slug, name, selected, toggled))
+    price_options = [
+        option(
+            'price', key, label, selection['price'] == key,
+            None if selection['price'] == key else key,
+        )
+        for key, (label, _, _) in PRICE_RANGES.items()
+    ]
+    availability_options = [
+        option(
+            'availability', key, label, selection['availability'] == key, key,
+        )
+        for key, (label, _) in AVAILABILITY.items()
+    ]
+    return [
+        {'name': 'Size', 'options': size_options},
+        {'name': 'Price', 'options': price_options},
+        {'name': 'Availability', 'options': availability_options},
+    ]
+
+
+def is_filtered(selection):
+    return bool(
+        selection['size'] or selection['price']
+        or selection['availability'] != DEFAULT_AVAILABILITY
+    )
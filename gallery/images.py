@@ -0,0 +1,123 @@
+"""
+Precomputed image metadata for art prints.
+
+describe_image() opens a print's image once and returns what the grids
+need to lay it out before the file itself loads:
+    - image_width / image_height: displayed size, after EXIF rotation
+    - dominant_color: most common colour as #rrggbb, for the background
+    - image_placeholder: a tiny blurred WebP as a base64 data URI (LQIP)
+
+store_display_image() saves the downscaled JPEG that print_image serves
+publicly; the full-resolution original is only served to buyers.
+
+ArtPrint.save() fills these for new images and backfill_print_images
+fills them for existing prints, so templates never touch the file.
+"""
+import base64
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageFilter, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Longest edge of the placeholder; the browser scales it up blurred
+PLACEHOLDER_EDGE = 16
+PLACEHOLDER_QUALITY = 40
+# Longest edge of the public rendition: enough for the lightbox on a
+# large screen, too small to print from
+DISPLAY_EDGE = 1600
+DISPLAY_QUALITY = 82
+DISPLAY_DIR = 'prints/display'
+METADATA_FIELDS = (
+    'image_width', 'image_height', 'dominant_color', 'image_placeholder',
+)
+# Stored when an image can't be read, so stale values don't linger
+NO_METADATA = {
+    'image_width': None, 'image_height': None,
+    'dominant_color': '', 'image_placeholder': '',
+}
+
+
+def _dominant_color(image):
+    """Most common of a few quantized colours in a small thumbnail."""
+    quantized = image.quantize(colors=4)
+    palette = quantized.getpalette()
+    _, index = max(quantized.getcolors())
+    red, green, blue = palette[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def describe_image(field_file):
+    """
+    Dimensions, dominant colour and placeholder for a stored image, as a
+    dict keyed by METADATA_FIELDS.  Returns None if the file is missing or
+    not an image.
+    """
+    try:
+        field_file.open('rb')
+    except OSError:
+        return None
+    try:
+        with Image.open(field_file) as image:
+            # Browsers apply EXIF orientation, so report the rotated size
+            orientation = image.getexif().get(0x0112, 1)
+            width, height = image.size
+            if orientation in (5, 6, 7, 8):
+                width, height = height, width
+            # Let the JPEG decoder downscale; only a thumbnail is needed
+            image.draft('RGB', (PLACEHOLDER_EDGE * 4, PLACEHOLDER_EDGE * 4))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            image.thumbnail((PLACEHOLDER_EDGE * 4, PLACEHOLDER_EDGE * 4))
+            color = _dominant_color(image)
+            image.thumbnail((PLACEHOLDER_EDGE, PLACEHOLDER_EDGE))
+            image = image.filter(ImageFilter.GaussianBlur(1))
+            buffer = BytesIO()
+            image.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning(f'Could not read print image {field_file.name}: {e}')
+        return None
+    finally:
+        field_file.close()
+
+    encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return {
+        'image_width': width,
+        'image_height': height,
+        'dominant_color': color,
+        'image_placeholder': f'data:image/webp;base64,{encoded}',
+    }
+
+
+def store_display_image(field_file):
+    """
+    Save a JPEG of a stored image scaled to fit DISPLAY_EDGE, next to the
+    other renditions in the same storage, and return its name.  Returns
+    None if the file is missing or not an image.
+    """
+    try:
+        field_file.open('rb')
+    except OSError:
+        return None
+    try:
+        with Image.open(field_file) as image:
+            image.draft('RGB', (DISPLAY_EDGE, DISPLAY_EDGE))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            image.thumbnail((DISPLAY_EDGE, DISPLAY_EDGE))
+            buffer = BytesIO()
+            image.save(
+                buffer, 'JPEG', quality=DISPLAY_QUALITY, optimize=True,
+                progressive=True,
+            )
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning(f'Could not read print image {field_file.name}: {e}')
+        return None
+    finally:
+        field_file.close()
+
+    stem = posixpath.splitext(posixpath.basename(field_file.name))[0]
+    return field_file.storage.save(
+        f'{DISPLAY_DIR}/{stem}.jpg', ContentFile(buffer.getvalue())
+    )
@@ -0,0 +1,118 @@
+"""
+Management command that stores content hashes, image dimensions,
+dominant colour, placeholders and the public display rendition for
+prints saved before they were recorded.  ArtPrint.save() only reads
+an image when it changes, so this is also how prints whose file was
+missing get filled in once it has been restored.
+
+Usage:
+    python manage.py backfill_print_images
+    python manage.py backfill_print_images --workers 8 --batch-size 200
+    python manage.py backfill_print_images --all     # recompute every print
+
+Images are decoded in a thread pool (Pillow releases the GIL while
+decoding and resizing, and remote storage reads wait on the network).
+Only the main thread touches the database, writing each batch back with
+one bulk_update().
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from gallery.images import (
+    METADATA_FIELDS, describe_image, store_display_image,
+)
+from gallery.models import ArtPrint
+from gallery.utils import file_digest
+from joe_django.signals import post_bulk_update
+
+FIELDS = ('image_hash', *METADATA_FIELDS, 'display_image')
+
+
+def _describe(art):
+    """New values of FIELDS for one print, or None if it's unreadable."""
+    metadata = describe_image(art.image)
+    if metadata is None:
+        return None
+    metadata['image_hash'] = file_digest(art.image)
+    metadata['display_image'] = store_display_image(art.image) or ''
+    return metadata
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill in image hashes, dimensions, colours, placeholders and '
+        'display renditions for prints'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 4,
+            help='Images decoded in parallel (default: number of CPUs).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Prints read and written per batch (default 100).',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute prints that already have metadata too.',
+        )
+
+    def handle(self, *args, **options):
+        prints = ArtPrint.objects.exclude(image='').only(
+            'id', 'image', 'display_image'
+        )
+        if not options['all']:
+            prints = prints.filter(
+                Q(image_hash='') | Q(image_width__isnull=True)
+                | Q(display_image='')
+            )
+        prints = prints.order_by('id')
+
+        updated = unreadable = 0
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batch = list(
+                    prints.filter(id__gt=last_id)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                described = pool.map(_describe, batch)
+                changed = []
+                replaced = []
+                for art, metadata in zip(batch, described):
+                    if metadata is None:
+                        unreadable += 1
+                        continue
+                    if art.display_image:
+                        replaced.append(art.display_image)
+                    for field, value in metadata.items():
+                        setattr(art, field, value)
+                    changed.append(art)
+
+                ArtPrint.objects.bulk_update(changed, FIELDS)
+                post_bulk_update.send(
+                    sender=ArtPrint, instances=changed, fields=list(FIELDS),
+                )
+                for old in replaced:
+                    old.storage.delete(old.name)
+                updated += len(changed)
+                self.stdout.write(
+                    f'  {updated} updated, {unreadable} unreadable '
+                    f'(up to id {last_id})'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored image metadata for {updated} print(s)'
+        ))
+        if unreadable:
+            self.stdout.write(self.style.WARNING(
+                f'{unreadable} image(s) were missing or unreadable'
+            ))
@@ -5,7 +5,9 @@ Usage:
     python manage.py import_prints "F:\David Folders\Pictures\Molishi Collection"
 
 Images are copied into MEDIA_ROOT/prints/ and an ArtPrint record is
-created for each one.  A default Category is created if none exists.
+created for each one.  Saving the print also stores its dimensions,
+dominant colour and placeholder.  A default Category is created if none
+exists.
 """
 
 import os
@@ -141,7 +143,7 @@ class Command(BaseCommand):
 
             # Create the ArtPrint record
             relative_path = f'prints/{img.name}'
-            ArtPrint.objects.create(
+            art = ArtPrint.objects.create(
                 title=title,
                 slug=slug,
                 description=f'"{title}" — from the {category_name} collection by Joe Django.',
@@ -150,7 +152,15 @@ class Command(BaseCommand):
                 price=price,
                 is_available=True,
             )
-            self.stdout.write(self.style.SUCCESS(f'  ✓ {img.name}  →  "{title}"'))
+            if art.image_width is None:
+                self.stdout.write(self.style.WARNING(
+                    f'  ✓ {img.name}  →  "{title}"  (image unreadable, no placeholder)'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'  ✓ {img.name}  →  "{title}"  '
+                    f'({art.image_width}×{art.image_height})'
+                ))
             imported += 1
 
         self.stdout.write('')
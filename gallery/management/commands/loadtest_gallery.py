@@ -0,0 +1,158 @@
+"""
+Management command to load-test the gallery page and show the effect of
+the DB_PROFILE connection settings.
+
+Usage:
+    python manage.py loadtest_gallery --requests 1000 --concurrency 8
+
+The run happens twice in-process, each worker thread standing in for a
+gunicorn thread: first with connection persistence disabled (a new
+connection per request, as before DB_PROFILE existed), then with the
+configured profile.  Each phase reports throughput, p50/p95 latency and
+how many database connections were opened.  On PostgreSQL 14+ the server
+side session count from pg_stat_database is shown as well.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import reverse
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def _pg_sessions():
+    """Total sessions ever opened on this database (PostgreSQL 14+)."""
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT sessions FROM pg_stat_database '
+                'WHERE datname = current_database()'
+            )
+            return cursor.fetchone()[0]
+    except Exception:
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Load-test gallery_list and report connection churn and p95 latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Total requests per phase (default: 500)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Number of worker threads (default: 4)',
+        )
+        parser.add_argument(
+            '--path',
+            type=str,
+            default=None,
+            help='URL path to request (default: the gallery page)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path'] or reverse('gallery')
+        db_settings = connections.settings['default']
+        configured = {
+            'CONN_MAX_AGE': db_settings['CONN_MAX_AGE'],
+            'CONN_HEALTH_CHECKS': db_settings['CONN_HEALTH_CHECKS'],
+        }
+        phases = [
+            ('no persistence', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}),
+            (f'{settings.DB_PROFILE} profile', configured),
+        ]
+
+        self.stdout.write(
+            f'GET {path} x {options["requests"]} '
+            f'({options["concurrency"]} threads, {connection.vendor})\n'
+        )
+        self.stdout.write(
+            f'{"phase":<22}{"req/s":>8}{"p50 ms":>9}{"p95 ms":>9}'
+            f'{"max ms":>9}{"opened":>8}{"pg":>6}'
+        )
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, conn_settings in phases:
+                db_settings.update(conn_settings)
+                stats = self._run_phase(
+                    path, options['requests'], options['concurrency']
+                )
+                self.stdout.write(
+                    f'{name:<22}{stats["rps"]:>8.0f}{stats["p50"]:>9.2f}'
+                    f'{stats["p95"]:>9.2f}{stats["max"]:>9.2f}'
+                    f'{stats["opened"]:>8}{stats["pg"]:>6}'
+                )
+        db_settings.update(configured)
+
+    def _run_phase(self, path, total, concurrency):
+        """Fire `total` requests from `concurrency` threads and time them."""
+        lock = threading.Lock()
+        timings = []
+        opened = [0]
+
+        def count_connection(sender, **kwargs):
+            with lock:
+                opened[0] += 1
+
+        def worker(count):
+            client = Client()
+            local = []
+            for _ in range(count):
+                start = time.perf_counter()
+                client.get(path)
+                # The test client skips the request_finished cleanup that
+                # the WSGI handler runs, so apply CONN_MAX_AGE here.
+                close_old_connections()
+                local.append(time.perf_counter() - start)
+            connections.close_all()
+            with lock:
+                timings.extend(local)
+
+        connections.close_all()
+        pg_before = _pg_sessions()
+        connection.close()
+
+        connection_created.connect(count_connection)
+        threads = [
+            threading.Thread(
+                target=worker,
+                args=(total // concurrency + (i < total % concurrency),),
+            )
+            for i in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        connection_created.disconnect(count_connection)
+
+        pg_after = _pg_sessions()
+        connection.close()
+        timings.sort()
+        return {
+            'rps': len(timings) / elapsed,
+            'p50': _percentile(timings, 50) * 1000,
+            'p95': _percentile(timings, 95) * 1000,
+            'max': timings[-1] * 1000,
+            'opened': opened[0],
+            'pg': '-' if pg_before is None else pg_after - pg_before - 1,
+        }
@@ -0,0 +1,41 @@
+"""
+Management command that recomputes Category.available_print_count.
+
+Usage:
+    python manage.py recount_categories
+
+Signals keep the counts current for saves, deletes and admin bulk edits;
+run this after changing prints with QuerySet.update(), bulk_create() or
+raw SQL, or to check that nothing has drifted.  Every category is
+recounted in a single UPDATE.
+"""
+
+from django.core.management.base import BaseCommand
+
+from gallery.catalogue import bump_catalogue_version
+from gallery.models import Category, recount_available_prints
+
+
+class Command(BaseCommand):
+    help = 'Recount the available prints of every category'
+
+    def handle(self, *args, **options):
+        before = dict(
+            Category.objects.values_list('pk', 'available_print_count')
+        )
+        recount_available_prints()
+        corrected = 0
+        for category in Category.objects.only('name', 'available_print_count'):
+            old = before.get(category.pk)
+            if old != category.available_print_count:
+                corrected += 1
+                self.stdout.write(
+                    f'{category.name}: {old} -> {category.available_print_count}'
+                )
+        if corrected:
+            # The category bar is cached per catalogue version
+            bump_catalogue_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {len(before)} categories, {corrected} corrected'
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:47
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def file_digest(field_file, length=12):
+    # Copy of gallery.utils.file_digest() as it was when this migration
+    # was written, so later changes to it don't change what it does
+    hasher = hashlib.sha256()
+    try:
+        field_file.open('rb')
+    except OSError:
+        return ''
+    try:
+        for chunk in field_file.chunks():
+            hasher.update(chunk)
+    finally:
+        field_file.close()
+    return hasher.hexdigest()[:length]
+
+
+def backfill_image_hashes(apps, schema_editor):
+    ArtPrint = apps.get_model('gallery', 'ArtPrint')
+    for art in ArtPrint.objects.exclude(image='').only('image').iterator():
+        digest = file_digest(art.image)
+        if digest:
+            ArtPrint.objects.filter(pk=art.pk).update(image_hash=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artprint',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Content hash of the image, used in cache-busting URLs', max_length=16),
+        ),
+        migrations.RunPython(backfill_image_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0002_artprint_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='artprint',
+            index=models.Index(fields=['-created_at'], name='artprint_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artprint',
+            index=models.Index(fields=['is_available', '-created_at'], name='artprint_available_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0003_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artprint',
+            name='dominant_color',
+            field=models.CharField(blank=True, editable=False, help_text='Most common colour of the image, e.g. #1a1a2e', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='artprint',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='artprint',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='Tiny blurred copy of the image as a data URI'),
+        ),
+        migrations.AddField(
+            model_name='artprint',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:52
+
+import re
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+# Copies of gallery.utils.normalize_size_name() and parse_size_options()
+# as they were when this migration was written, so later changes to them
+# don't change what it does
+
+def normalize_size_name(name):
+    name = ' '.join(name.split())
+    name = re.sub(r'(\d)\s*[x\u00d7]\s*(\d)', r'\1x\2', name, flags=re.I)
+    name = re.sub(
+        r'(\d)\s*(mm|cm|in)\b',
+        lambda m: m[1] + m[2].lower(), name, flags=re.I,
+    )
+    if re.fullmatch(r'[abAB]\d', name):
+        name = name.upper()
+    return name
+
+
+def parse_size_options(text):
+    names = {}
+    for part in re.split(r'[,;\n]', text or ''):
+        name = normalize_size_name(part)
+        if name:
+            names.setdefault(name.lower(), name)
+    return list(names.values())
+
+
+def split_size_options(apps, schema_editor):
+    ArtPrint = apps.get_model('gallery', 'ArtPrint')
+    PrintSize = apps.get_model('gallery', 'PrintSize')
+    Through = ArtPrint.sizes.through
+
+    parsed = {}
+    for art_id, text in ArtPrint.objects.exclude(
+        size_options=''
+    ).values_list('id', 'size_options').iterator():
+        parsed[art_id] = [
+            name[:50] for name in parse_size_options(text) if slugify(name)
+        ]
+
+    sizes = {}
+    for names in parsed.values():
+        for name in names:
+            sizes.setdefault(slugify(name), name)
+    PrintSize.objects.bulk_create(
+        [PrintSize(name=name, slug=slug) for slug, name in sizes.items()],
+        batch_size=1000,
+    )
+    size_ids = dict(PrintSize.objects.values_list('slug', 'id'))
+    Through.objects.bulk_create([
+        Through(artprint_id=art_id, printsize_id=size_ids[slug])
+        for art_id, names in parsed.items()
+        for slug in dict.fromkeys(slugify(name) for name in names)
+    ], batch_size=1000)
+
+
+def join_size_options(apps, schema_editor):
+    ArtPrint = apps.get_model('gallery', 'ArtPrint')
+    Through = ArtPrint.sizes.through
+    names = {}
+    for art_id, name in Through.objects.order_by('printsize__name').values_list(
+        'artprint_id', 'printsize__name'
+    ).iterator():
+        names.setdefault(art_id, []).append(name)
+    for art_id, art_names in names.items():
+        ArtPrint.objects.filter(pk=art_id).update(
+            size_options=', '.join(art_names)[:200]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0004_image_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrintSize',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('slug', models.SlugField(blank=True, max_length=60, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='artprint',
+            name='sizes',
+            field=models.ManyToManyField(blank=True, related_name='prints', to='gallery.printsize'),
+        ),
+        migrations.RunPython(split_size_options, join_size_options),
+        migrations.RemoveField(
+            model_name='artprint',
+            name='size_options',
+        ),
+    ]
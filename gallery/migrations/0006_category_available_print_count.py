@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_available_prints(apps, schema_editor):
+    Category = apps.get_model('gallery', 'Category')
+    ArtPrint = apps.get_model('gallery', 'ArtPrint')
+    available = ArtPrint.objects.filter(
+        category=OuterRef('pk'), is_available=True
+    ).order_by().values('category').annotate(count=Count('pk')).values('count')
+    Category.objects.update(
+        available_print_count=Coalesce(Subquery(available), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0005_print_sizes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='available_print_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_available_prints, migrations.RunPython.noop),
+    ]
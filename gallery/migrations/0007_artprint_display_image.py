@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0006_category_available_print_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artprint',
+            name='display_image',
+            field=models.ImageField(blank=True, editable=False, help_text='Downscaled copy of the image shown on the site', upload_to='prints/display'),
+        ),
+    ]
@@ -1,6 +1,19 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
 from django.utils.text import slugify
 
+from joe_django.signals import post_bulk_update
+
+from .catalogue import bump_catalogue_version
+from .images import (
+    DISPLAY_DIR, NO_METADATA, describe_image, store_display_image,
+)
+from .utils import file_digest
+
 
 class Category(models.Model):
     """
@@ -9,6 +22,11 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     description = models.TextField(blank=True)
+    # Kept current by the ArtPrint signals below, so the category bar
+    # needs no COUNT queries; see recount_available_prints()
+    available_print_count = models.PositiveIntegerField(
+        default=0, editable=False
+    )
 
     class Meta:
         verbose_name_plural = "categories"
@@ -23,6 +41,26 @@ class Category(models.Model):
         super().save(*args, **kwargs)
 
 
+class PrintSize(models.Model):
+    """
+    A size prints are offered in (e.g. A4, 50x70cm).  Shared between
+    prints so the gallery can filter and count by size.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    slug = models.SlugField(max_length=60, unique=True, blank=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify(self.name)
+        super().save(*args, **kwargs)
+
+
 class ArtPrint(models.Model):
     """
     Represents a finished artwork available as a limited-edition print.
@@ -32,6 +70,32 @@ class ArtPrint(models.Model):
     slug = models.SlugField(max_length=250, unique=True, blank=True)
     description = models.TextField()
     image = models.ImageField(upload_to='prints/%Y/%m/')
+    image_hash = models.CharField(
+        max_length=16, blank=True, editable=False, db_index=True,
+        help_text="Content hash of the image, used in cache-busting URLs"
+    )
+    # Filled from the image by gallery.images.describe_image() so templates
+    # can reserve layout space without opening the file
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    dominant_color = models.CharField(
+        max_length=7, blank=True, editable=False,
+        help_text="Most common colour of the image, e.g. #1a1a2e"
+    )
+    image_placeholder = models.TextField(
+        blank=True, editable=False,
+        help_text="Tiny blurred copy of the image as a data URI"
+    )
+    # What print_image serves publicly; the original is only downloadable
+    # once bought (shop.views.download_print)
+    display_image = models.ImageField(
+        upload_to=DISPLAY_DIR, blank=True, editable=False,
+        help_text="Downscaled copy of the image shown on the site"
+    )
     category = models.ForeignKey(
         Category,
         on_delete=models.SET_NULL,
@@ -39,10 +103,8 @@ class ArtPrint(models.Model):
         related_name='prints'
     )
     price = models.DecimalField(max_digits=8, decimal_places=2)
-    size_options = models.CharField(
-        max_length=200,
-        help_text="e.g. A4, A3, 50x70cm – comma separated",
-        blank=True
+    sizes = models.ManyToManyField(
+        PrintSize, blank=True, related_name='prints'
     )
     is_available = models.BooleanField(default=True)
     limited_edition = models.PositiveIntegerField(
@@ -55,11 +117,184 @@ class ArtPrint(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='artprint_created_idx'),
+            # Gallery listing and the admin "available" filter
+            models.Index(
+                fields=['is_available', '-created_at'],
+                name='artprint_available_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the category counts were last computed from, so a save can
+        # recount the category a print left as well as the one it joined
+        instance._counted_as = (
+            instance.__dict__.get('category_id'),
+            instance.__dict__.get('is_available'),
+        )
+        # The stored image, so save() can tell when it is replaced
+        if 'image' in field_names:
+            instance._loaded_image = instance.__dict__['image']
+        return instance
+
+    def _image_changed(self):
+        """True for a new upload, a new print, or a different stored file."""
+        if not self.image:
+            return False
+        if self._state.adding or not self.image._committed:
+            return True
+        loaded = getattr(self, '_loaded_image', None)
+        return loaded is not None and loaded != self.image.name
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        image_changed = self._image_changed()
         super().save(*args, **kwargs)
+        self._loaded_image = self.image.name
+
+        # Read the file after saving so new uploads have been written to
+        # storage, then store what was derived without another save().
+        # Only a changed image is read: one that is missing or unreadable
+        # would otherwise be read again on every save.  Prints from before
+        # these fields existed are filled by backfill_print_images.
+        if not image_changed:
+            return
+        derived = {'image_hash': file_digest(self.image)}
+        derived.update(describe_image(self.image) or NO_METADATA)
+        replaced = self.display_image.name
+        derived['display_image'] = store_display_image(self.image) or ''
+        if replaced:
+            storage = self.display_image.storage
+            transaction.on_commit(lambda: storage.delete(replaced))
+        for field, value in derived.items():
+            setattr(self, field, value)
+        ArtPrint.objects.filter(pk=self.pk).update(**derived)
+
+    def get_placeholder_style(self):
+        """Inline style painting the colour and LQIP until the image loads."""
+        if not self.dominant_color:
+            return ''
+        return (
+            f'background-color: {self.dominant_color}; '
+            f'background-image: url({self.image_placeholder});'
+        )
+
+    def get_image_url(self):
+        """
+        Immutable, content-hashed URL for the display rendition.  Until
+        backfill_print_images has made one, the blurred placeholder.
+        """
+        if self.image_hash and self.display_image:
+            return reverse(
+                'print_image', args=[self.image_hash, self.display_image.name]
+            )
+        return self.image_placeholder
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ArtPrint)
+@receiver(post_delete, sender=ArtPrint)
+@receiver(post_bulk_update, sender=ArtPrint)
+@receiver(post_save, sender=PrintSize)
+@receiver(post_delete, sender=PrintSize)
+def catalogue_changed(sender, **kwargs):
+    """Retire cached category menus, facet counts and other fragments."""
+    bump_catalogue_version()
+
+
+@receiver(m2m_changed, sender=ArtPrint.sizes.through)
+def print_sizes_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_catalogue_version()
+
+
+def recount_available_prints(category_ids=None):
+    """
+    Recompute Category.available_print_count for the given categories (all
+    when None) with one UPDATE.  Counting rather than adding or
+    subtracting one keeps the numbers right under concurrent edits.
+    QuerySet.update() and bulk_create() on prints skip the signals, so
+    code using them calls this itself.
+    """
+    categories = Category.objects.all()
+    if category_ids is not None:
+        category_ids = {pk for pk in category_ids if pk is not None}
+        if not category_ids:
+            return 0
+        categories = categories.filter(pk__in=category_ids)
+    available = ArtPrint.objects.filter(
+        category=OuterRef('pk'), is_available=True
+    ).order_by().values('category').annotate(count=Count('pk')).values('count')
+    return categories.update(
+        available_print_count=Coalesce(Subquery(available), 0)
+    )
+
+
+def _recount_on_commit(category_ids):
+    """
+    Recount once the transaction commits, so the category rows are not
+    locked for the rest of it, then retire the category bar cached with
+    the old counts.
+    """
+    category_ids = {pk for pk in category_ids if pk is not None}
+    if not category_ids:
+        return
+
+    def recount():
+        recount_available_prints(category_ids)
+        bump_catalogue_version()
+
+    transaction.on_commit(recount)
+
+
+def _recount_moved(prints):
+    """Recount the categories whose available prints may have changed."""
+    category_ids = set()
+    moved = []
+    for art in prints:
+        before = getattr(art, '_counted_as', (None, False))
+        # A field left deferred by only() was not saved, so is unchanged
+        after = tuple(
+            art.__dict__.get(attname, value)
+            for attname, value in zip(('category_id', 'is_available'), before)
+        )
+        if before != after:
+            if before[1] is not False:
+                category_ids.add(before[0])
+            if after[1]:
+                category_ids.add(after[0])
+            moved.append((art, after))
+    _recount_on_commit(category_ids)
+
+    # Rolled back, the prints are still counted where they were, and
+    # saving them again must move them again
+    def counted():
+        for art, after in moved:
+            art._counted_as = after
+
+    if moved:
+        transaction.on_commit(counted)
+
+
+@receiver(post_save, sender=ArtPrint)
+def print_saved(sender, instance, **kwargs):
+    _recount_moved([instance])
+
+
+@receiver(post_delete, sender=ArtPrint)
+def print_deleted(sender, instance, **kwargs):
+    _recount_on_commit({instance.category_id})
+
+
+@receiver(post_bulk_update, sender=ArtPrint)
+def prints_bulk_updated(sender, instances, fields, **kwargs):
+    if {'category', 'category_id', 'is_available'} & set(fields):
+        _recount_moved(instances)
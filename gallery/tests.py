@@ -1,3 +1,208 @@
-from django.test import TestCase
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import models
+from .images import DISPLAY_EDGE
+from .models import ArtPrint, Category
+
+
+def _jpeg(width, height, color='#1a1a2e'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class MediaTestCase(TestCase):
+    """Writes uploads to a throwaway MEDIA_ROOT."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(MEDIA_ROOT=directory))
+
+
+class PrintImageTests(MediaTestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Neon')
+        self.art = ArtPrint.objects.create(
+            title='Glow', description='A print.', category=self.category,
+            price=30, image=SimpleUploadedFile('glow.jpg', _jpeg(4000, 3000)),
+        )
+
+    def fetch(self, url):
+        response = self.client.get(url)
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            return response, image.size
+
+    def test_public_url_serves_the_downscaled_rendition(self):
+        self.assertEqual((self.art.image_width, self.art.image_height),
+                         (4000, 3000))
+        url = self.art.get_image_url()
+        self.assertNotIn(self.art.image.name, url)
+
+        response, size = self.fetch(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(size, (DISPLAY_EDGE, DISPLAY_EDGE * 3 // 4))
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_original_is_not_served_publicly(self):
+        url = reverse(
+            'print_image', args=[self.art.image_hash, self.art.image.name]
+        )
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_original_is_downloadable_once_bought(self):
+        user = User.objects.create_user('buyer', password='password')
+        self.client.force_login(user)
+        url = reverse('download_print', args=[self.art.pk])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        user.profile.purchased_prints.add(self.art)
+        response, size = self.fetch(url)
+        self.assertEqual(size, (4000, 3000))
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_replacing_the_image_replaces_the_rendition(self):
+        old_hash = self.art.image_hash
+        old_rendition = self.art.display_image.name
+        storage = self.art.display_image.storage
+
+        art = ArtPrint.objects.get(pk=self.art.pk)
+        art.image = SimpleUploadedFile('glow.jpg', _jpeg(800, 600, '#ff00ff'))
+        with self.captureOnCommitCallbacks(execute=True):
+            art.save()
+
+        self.assertNotEqual(art.image_hash, old_hash)
+        self.assertEqual(art.image_width, 800)
+        self.assertFalse(storage.exists(old_rendition))
+        _, size = self.fetch(art.get_image_url())
+        self.assertEqual(size, (800, 600))
+
+    def test_resaving_leaves_the_rendition_alone(self):
+        art = ArtPrint.objects.get(pk=self.art.pk)
+        art.price = 40
+        art.save()
+        self.assertEqual(art.display_image.name, self.art.display_image.name)
+
+    def test_print_without_a_rendition_shows_its_placeholder(self):
+        ArtPrint.objects.filter(pk=self.art.pk).update(display_image='')
+        art = ArtPrint.objects.get(pk=self.art.pk)
+        self.assertTrue(art.get_image_url().startswith('data:image/webp'))
+
+
+class UnreadableImageTests(MediaTestCase):
+
+    def test_missing_image_is_read_once_then_backfilled(self):
+        with mock.patch.object(
+            models, 'describe_image', wraps=models.describe_image,
+        ) as describe:
+            art = ArtPrint.objects.create(
+                title='Lost', description='A print.', price=30,
+                image='prints/lost.jpg',
+            )
+            for price in (35, 40):
+                art = ArtPrint.objects.get(pk=art.pk)
+                art.price = price
+                art.save()
+        self.assertEqual(describe.call_count, 1)
+        self.assertIsNone(art.image_width)
+        self.assertEqual(art.image_hash, '')
+
+        # Once the file is restored, the backfill fills the print in
+        default_storage.save('prints/lost.jpg', ContentFile(_jpeg(64, 48)))
+        call_command('backfill_print_images', workers=1, stdout=StringIO())
+        art.refresh_from_db()
+        self.assertEqual(art.image_width, 64)
+        self.assertTrue(art.image_hash)
+        self.assertTrue(art.get_image_url().startswith('/gallery/media/'))
+
+
+class CategoryCountTests(TestCase):
+    """Category.available_print_count after saves, deletes and rollbacks."""
+
+    def setUp(self):
+        self.neon = Category.objects.create(name='Neon')
+        self.gothic = Category.objects.create(name='Gothic')
+
+    def counts(self):
+        return dict(
+            Category.objects.values_list('name', 'available_print_count')
+        )
+
+    def create(self, category, **kwargs):
+        title = f'Glow {ArtPrint.objects.count()}'
+        with self.captureOnCommitCallbacks(execute=True):
+            return ArtPrint.objects.create(
+                title=title, description='A print.', price=30,
+                image='prints/glow.jpg', category=category, **kwargs,
+            )
+
+    def save(self, art, **changes):
+        for field, value in changes.items():
+            setattr(art, field, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            art.save()
+
+    def test_create_counts_available_prints_only(self):
+        self.create(self.neon)
+        self.create(self.neon, is_available=False)
+        self.assertEqual(self.counts(), {'Neon': 1, 'Gothic': 0})
+
+    def test_move_recounts_both_categories(self):
+        art = self.create(self.neon)
+        self.save(art, category=self.gothic)
+        self.assertEqual(self.counts(), {'Neon': 0, 'Gothic': 1})
+
+        # A freshly loaded instance knows where it was counted
+        art = ArtPrint.objects.get(pk=art.pk)
+        self.save(art, category=None)
+        self.assertEqual(self.counts(), {'Neon': 0, 'Gothic': 0})
+        self.save(art, category=self.neon)
+        self.assertEqual(self.counts(), {'Neon': 1, 'Gothic': 0})
+
+    def test_availability_change(self):
+        art = self.create(self.neon)
+        self.save(art, is_available=False)
+        self.assertEqual(self.counts()['Neon'], 0)
+        self.save(art, is_available=True)
+        self.assertEqual(self.counts()['Neon'], 1)
+
+    def test_other_edits_do_not_recount(self):
+        art = self.create(self.neon)
+        with mock.patch.object(models, 'recount_available_prints') as recount:
+            self.save(art, price=40)
+        recount.assert_not_called()
+
+    def test_delete(self):
+        art = self.create(self.neon)
+        self.create(self.neon)
+        with self.captureOnCommitCallbacks(execute=True):
+            art.delete()
+        self.assertEqual(self.counts()['Neon'], 1)
+
+    def test_rolled_back_move_changes_nothing(self):
+        art = self.create(self.neon)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                art.category = self.gothic
+                art.save()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.counts(), {'Neon': 1, 'Gothic': 0})
+
+        # Retrying the same save still moves the count
+        self.save(art)
+        self.assertEqual(self.counts(), {'Neon': 0, 'Gothic': 1})
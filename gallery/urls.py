@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.gallery_list, name='gallery'),
+    path('media/<str:digest>/<path:path>', views.print_image, name='print_image'),
     path('wishlist/add/<slug:slug>/', views.add_to_wishlist, name='add_to_wishlist'),
     path('wishlist/remove/<slug:slug>/', views.remove_from_wishlist, name='remove_from_wishlist'),
     path('<slug:slug>/', views.art_detail, name='art_detail'),
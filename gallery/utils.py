@@ -0,0 +1,52 @@
+"""
+Helpers for gallery media files and catalogue data.
+"""
+import hashlib
+import re
+
+
+def file_digest(field_file, length=12):
+    """
+    Short SHA-256 content hash of a stored file, used to build immutable,
+    cache-busting image URLs.  Returns '' when the file is missing.
+    """
+    hasher = hashlib.sha256()
+    try:
+        field_file.open('rb')
+    except OSError:
+        return ''
+    try:
+        for chunk in field_file.chunks():
+            hasher.update(chunk)
+    finally:
+        field_file.close()
+    return hasher.hexdigest()[:length]
+
+
+def normalize_size_name(name):
+    """
+    Canonical spelling of a print size, so "a4" and "A4", or "50 x 70 cm"
+    and "50x70cm", end up as the same PrintSize.
+    """
+    name = ' '.join(name.split())
+    name = re.sub(r'(\d)\s*[x\u00d7]\s*(\d)', r'\1x\2', name, flags=re.I)
+    name = re.sub(
+        r'(\d)\s*(mm|cm|in)\b',
+        lambda m: m[1] + m[2].lower(), name, flags=re.I,
+    )
+    if re.fullmatch(r'[abAB]\d', name):
+        name = name.upper()
+    return name
+
+
+def parse_size_options(text):
+    """
+    Split a free-text size list ("A4, A3, 50x70cm") into normalized
+    names, in order and without duplicates.
+    """
+    names = {}
+    for part in re.split(r'[,;\n]', text or ''):
+        name = normalize_size_name(part)
+        if name:
+            names.setdefault(name.lower(), name)
+    return list(names.values())
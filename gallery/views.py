@@ -2,31 +2,52 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+from django.views.decorators.http import etag
 
+from joe_django.storage import direct_media, serve_file
+
+from .catalogue import catalogue_version
+from .facets import facet_groups, filter_prints, is_filtered, read_selection
 from .models import ArtPrint, Category
 
 
 def gallery_list(request):
-    """Display all available prints, optionally filtered by category."""
+    """
+    Display the prints, optionally filtered by category and by the size,
+    price and availability facets (see gallery/facets.py).
+    """
     category_slug = request.GET.get('category')
-    prints = ArtPrint.objects.filter(is_available=True).select_related('category')
-
+    category = None
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
+
+    selection = read_selection(request.GET)
+    prints = filter_prints(ArtPrint.objects.select_related('category'), selection)
+    if category is not None:
         prints = prints.filter(category=category)
 
-    categories = Category.objects.all()
+    # Only queried when the cached category tabs need re-rendering.  Empty
+    # categories are hidden unless selected; see recount_available_prints()
+    categories = Category.objects.filter(
+        Q(available_print_count__gt=0) | Q(slug=category_slug)
+    )
     context = {
         'prints': prints,
         'categories': categories,
         'active_category': category_slug,
+        'catalogue_version': catalogue_version(),
+        'facet_groups': facet_groups(category, category_slug, selection),
+        'filtered': is_filtered(selection),
     }
     return render(request, 'gallery/gallery_list.html', context)
 
 
 def art_detail(request, slug):
     """Display a single art print with related prints."""
-    art = get_object_or_404(ArtPrint, slug=slug)
+    art = get_object_or_404(ArtPrint.objects.prefetch_related('sizes'), slug=slug)
     related = ArtPrint.objects.filter(
         category=art.category, is_available=True
     ).exclude(id=art.id)[:4]
@@ -60,3 +81,35 @@ def remove_from_wishlist(request, slug):
     messages.info(request, f'"{art.title}" removed from your wishlist.')
     next_url = request.GET.get('next', 'gallery')
     return redirect(next_url)
+
+
+def _print_image_etag(request, digest, path):
+    # A redirect to a presigned URL must not be revalidated: a 304 would
+    # have the client reuse a redirect whose signature has expired
+    return None if direct_media() else digest
+
+
+@etag(_print_image_etag)
+def print_image(request, digest, path):
+    """
+    Serve a print's downscaled display rendition under its content-hashed
+    URL; the full-resolution original is only served by download_print.
+    The hash changes whenever the image does, so browsers and CDNs may
+    cache the response forever.  With object storage the image itself is
+    fetched from a presigned URL carrying the same caching headers.
+    """
+    art = ArtPrint.objects.only('display_image').filter(
+        display_image=path, image_hash=digest
+    ).first()
+    if art is None:
+        raise Http404('Image not found')
+
+    immutable = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable'
+    response = serve_file(art.display_image, cache_control=immutable)
+    if response.status_code == 302:
+        # A presigned URL stops working after MEDIA_URL_EXPIRE seconds, so
+        # the redirect to it may only be cached for part of that time
+        response['Cache-Control'] = (
+            f'public, max-age={settings.MEDIA_URL_EXPIRE // 2}'
+        )
+    return response
@@ -0,0 +1,54 @@
+"""
+Gunicorn configuration, loaded by the Procfile.
+
+SERVER_MODE selects how the app is served:
+    wsgi - sync workers running joe_django.wsgi (default)
+    asgi - uvicorn workers running joe_django.asgi, so the async checkout
+           views can serve other requests while waiting on Stripe
+
+With METRICS_ENABLED, workers share Prometheus metrics through files in
+PROMETHEUS_MULTIPROC_DIR (see joe_django/metrics.py).  It has to be set
+before the workers import prometheus_client, so it is set here.
+
+Settings come from the environment and .env, read the same way as in
+joe_django/settings.py.
+"""
+import os
+import shutil
+import tempfile
+
+import environ
+
+env = environ.Env()
+environ.Env.read_env(os.path.join(os.path.dirname(__file__), '.env'))
+
+server_mode = env('SERVER_MODE', default='wsgi')
+
+if server_mode == 'asgi':
+    wsgi_app = 'joe_django.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'joe_django.wsgi:application'
+
+workers = env.int('WEB_CONCURRENCY', default=2)
+
+
+metrics_dir = None
+if env.bool('METRICS_ENABLED', default=False):
+    metrics_dir = os.environ.setdefault(
+        'PROMETHEUS_MULTIPROC_DIR',
+        os.path.join(tempfile.gettempdir(), 'joe_django_metrics'),
+    )
+
+
+def on_starting(server):
+    # Files left by a previous run would be counted again
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    if metrics_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
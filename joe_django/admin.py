@@ -0,0 +1,163 @@
+"""
+Admin base class for tables expected to grow to 100k+ rows.
+
+ScalableModelAdmin changes three things about the changelist:
+    - unfiltered lists on PostgreSQL take their row count from the
+      planner's estimate instead of COUNT(*) over the whole table
+    - filtered lists skip the second "(N total)" COUNT(*)
+    - list_editable saves are written with one bulk_update() per request
+      instead of one save() per row, followed by post_bulk_update so
+      cache invalidation still happens; the formset also stops looking
+      up each row's primary key with its own query
+
+bulk_update() skips save() and the save signals, so only fields in
+bulk_edit_fields take that path; rows changing anything else are saved
+one by one as usual.
+"""
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.core.paginator import Paginator
+from django.db import connections, models, router, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .signals import post_bulk_update
+
+# Below this many rows an exact COUNT(*) is cheap and more useful
+ESTIMATE_THRESHOLD = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using pg_class.reltuples for unfiltered querysets."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 until the table has been analysed
+            if row and row[0] >= ESTIMATE_THRESHOLD:
+                return row[0]
+        return super().count
+
+
+class _LoadedInstanceField(forms.ModelChoiceField):
+    """Primary key field that resolves to the row the formset already loaded."""
+
+    def __init__(self, instance, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instance = instance
+
+    def to_python(self, value):
+        if self.instance is not None and str(value) == str(self.instance.pk):
+            return self.instance
+        return super().to_python(value)
+
+
+class BulkEditFormSet(forms.BaseModelFormSet):
+    """
+    Changelist formset without the per-row SELECT Django's hidden primary
+    key field otherwise runs when validating.
+    """
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        name = self._pk_field.name
+        field = form.fields[name]
+        instance = None if form.instance._state.adding else form.instance
+        form.fields[name] = _LoadedInstanceField(
+            instance, field.queryset, initial=field.initial,
+            required=False, widget=field.widget,
+        )
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # list_editable fields that may be written with bulk_update(): changing
+    # them must need nothing from save() or post_save that post_bulk_update
+    # receivers don't also do.  None means all of list_editable, unless the
+    # model overrides save() or only listens for post_save.
+    bulk_edit_fields = None
+
+    def get_bulk_edit_fields(self):
+        if self.bulk_edit_fields is not None:
+            return set(self.bulk_edit_fields)
+        if self.model.save is not models.Model.save or (
+            post_save.has_listeners(self.model)
+            and not post_bulk_update.has_listeners(self.model)
+        ):
+            return set()
+        return set(self.list_editable)
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault('formset', BulkEditFormSet)
+        return super().get_changelist_formset(request, **kwargs)
+
+    def changelist_view(self, request, extra_context=None):
+        if not (
+            request.method == 'POST' and self.list_editable
+            and '_save' in request.POST
+        ):
+            return super().changelist_view(request, extra_context)
+
+        # save_model() and log_change() collect into these while the
+        # stock changelist view walks the formset; write them afterwards
+        request._bulk_edits = {}
+        request._bulk_log = []
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            response = super().changelist_view(request, extra_context)
+            self._write_bulk_edits(request)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        edits = getattr(request, '_bulk_edits', None)
+        if (
+            edits is None or not change
+            or not set(form.changed_data) <= self.get_bulk_edit_fields()
+        ):
+            return super().save_model(request, obj, form, change)
+        edits[obj.pk] = (obj, form.changed_data)
+
+    def log_change(self, request, obj, message):
+        log = getattr(request, '_bulk_log', None)
+        if log is None:
+            return super().log_change(request, obj, message)
+        log.append((obj, message))
+
+    def _write_bulk_edits(self, request):
+        edits = request._bulk_edits
+        if not edits:
+            return
+        objs = [obj for obj, _ in edits.values()]
+        fields = {field for _, changed in edits.values() for field in changed}
+        # bulk_update() does not apply auto_now, so set it here
+        now = timezone.now()
+        for field in self.model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                for obj in objs:
+                    setattr(obj, field.attname, now)
+                fields.add(field.name)
+
+        self.model._default_manager.bulk_update(objs, sorted(fields), batch_size=500)
+        post_bulk_update.send(
+            sender=self.model, instances=objs, fields=sorted(fields)
+        )
+
+        by_message = {}
+        for obj, message in request._bulk_log:
+            by_message.setdefault(repr(message), (message, []))[1].append(obj)
+        for message, logged in by_message.values():
+            LogEntry.objects.log_actions(
+                user_id=request.user.pk, queryset=logged,
+                action_flag=CHANGE, change_message=message,
+            )
@@ -0,0 +1,9 @@
+from django.conf import settings
+
+
+def fragment_cache(request):
+    """
+    Timeout for {% cache %} fragments keyed by the catalogue version, so
+    templates need no literal.
+    """
+    return {'catalogue_timeout': settings.CATALOGUE_CACHE_TIMEOUT}
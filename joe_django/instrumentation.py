@@ -0,0 +1,159 @@
+"""
+Per-request performance instrumentation.
+
+RequestTimingMiddleware starts a RequestStats for each sampled request and
+the hooks below add to it while it is active:
+    - a database execute wrapper counting queries and repeated SQL
+    - a wrapper around Template.render timing top-level renders
+    - external_call(), used around Stripe and SMTP calls
+Outside a sampled request every hook is a single ContextVar lookup, apart
+from external_call(), which always records metrics.  MetricsMiddleware
+also starts a RequestStats for every request when METRICS_ENABLED is on.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+from . import metrics
+
+_current = ContextVar('request_stats', default=None)
+_original_render = Template.render
+_installed = False
+
+
+class RequestStats:
+    """Timings collected for a single request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = []
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.external = {}
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    @property
+    def duplicate_count(self):
+        """Queries whose SQL (ignoring parameters) already ran, e.g. N+1s."""
+        return len(self.queries) - len({sql for sql, _ in self.queries})
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.elapsed * 1000, 2),
+            'db_ms': round(self.db_time * 1000, 2),
+            'queries': self.query_count,
+            'duplicates': self.duplicate_count,
+            'template_ms': round(self.template_time * 1000, 2),
+            'external_ms': {
+                name: round(duration * 1000, 2)
+                for name, duration in self.external.items()
+            },
+        }
+
+    def server_timing(self):
+        """Value for the Server-Timing response header."""
+        metrics = [
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.query_count} queries, '
+            f'{self.duplicate_count} duplicate"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+        ]
+        metrics += [
+            f'{name};dur={duration * 1000:.1f}'
+            for name, duration in self.external.items()
+        ]
+        metrics.append(f'total;dur={self.elapsed * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+def start_request():
+    """Begin collecting stats for the current request."""
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_stats():
+    """The RequestStats being collected, or None outside a sampled request."""
+    return _current.get()
+
+
+@contextmanager
+def external_call(name):
+    """
+    Time an outbound call (e.g. 'stripe', 'smtp').  Every call is
+    recorded in the metrics; sampled requests also add it to their stats.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metrics.EXTERNAL_ERRORS.labels(name).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        metrics.EXTERNAL_LATENCY.labels(name).observe(duration)
+        stats = _current.get()
+        if stats is not None:
+            stats.external[name] = stats.external.get(name, 0.0) + duration
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries.append((sql, time.perf_counter() - start))
+
+
+def _timed_render(self, context=None):
+    stats = _current.get()
+    if stats is None:
+        return _original_render(self, context)
+    # {% include %} renders nested templates; only time the outermost one
+    stats.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        stats.template_depth -= 1
+        if not stats.template_depth:
+            stats.template_time += time.perf_counter() - start
+
+
+def _add_query_wrapper(sender=None, connection=None, **kwargs):
+    if _query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_query_wrapper)
+
+
+def install():
+    """Attach the database and template hooks (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    connection_created.connect(_add_query_wrapper)
+    for connection in connections.all(initialized_only=True):
+        _add_query_wrapper(connection=connection)
+    Template.render = _timed_render
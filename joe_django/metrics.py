@@ -0,0 +1,126 @@
+"""
+Prometheus metrics, served in the text exposition format at /metrics.
+
+Gunicorn runs several worker processes, each with its own counters.  With
+PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py sets it when
+METRICS_ENABLED is on) prometheus_client keeps every value in mmap'd files
+in that directory, and metrics_view() merges the files of all workers, so
+any worker can answer a scrape with totals for the whole server.  Without
+it (runserver, shell) the current process's values are served.
+
+Recorded:
+    - every request: count, latency and query count per view
+      (MetricsMiddleware)
+    - outbound Stripe/SMTP calls: latency and errors (external_call())
+    - the shop: cart changes, checkout sessions, webhook events, orders
+      fulfilled and how long after checkout, confirmation emails
+
+A checkout conversion rate is then e.g.
+    rate(shop_orders_fulfilled_total[1h]) /
+    rate(shop_checkout_sessions_total{outcome="created"}[1h])
+"""
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess,
+)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+FULFILMENT_BUCKETS = (5, 15, 30, 60, 120, 300, 900, 1800, 3600, 4 * 3600, 86400)
+
+REQUESTS = Counter(
+    'django_http_requests_total',
+    'HTTP requests by view, method and status code.',
+    ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'django_http_request_duration_seconds',
+    'Time to produce a response, by view.',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'django_http_request_queries',
+    'Database queries run per request, by view.',
+    ['view'], buckets=QUERY_BUCKETS,
+)
+
+EXTERNAL_LATENCY = Histogram(
+    'external_call_duration_seconds',
+    'Latency of outbound calls, by service (stripe, smtp).',
+    ['service'], buckets=LATENCY_BUCKETS,
+)
+EXTERNAL_ERRORS = Counter(
+    'external_call_errors_total',
+    'Outbound calls that raised an error, by service.',
+    ['service'],
+)
+
+CART_CHANGES = Counter(
+    'shop_cart_changes_total',
+    'Cart changes by action (add, remove, update).',
+    ['action'],
+)
+CHECKOUT_SESSIONS = Counter(
+    'shop_checkout_sessions_total',
+    'Checkout session requests by outcome '
+    '(created, empty_cart, stale_cart, error).',
+    ['outcome'],
+)
+WEBHOOK_EVENTS = Counter(
+    'shop_stripe_webhook_events_total',
+    'Stripe webhook events by event type and outcome.',
+    ['type', 'outcome'],
+)
+ORDERS_FULFILLED = Counter(
+    'shop_orders_fulfilled_total',
+    'Orders marked paid, by what fulfilled them '
+    '(redirect, webhook, reconcile).',
+    ['source'],
+)
+FULFILMENT_LAG = Histogram(
+    'shop_fulfilment_lag_seconds',
+    'Time from creating the checkout session to the order being paid.',
+    buckets=FULFILMENT_BUCKETS,
+)
+ORDER_CONFIRMATIONS = Counter(
+    'shop_order_confirmations_total',
+    'Order confirmation emails by outcome (queued, no_recipient).',
+    ['outcome'],
+)
+ORDER_CONFIRMATION_LATENCY = Histogram(
+    'shop_order_confirmation_duration_seconds',
+    'Time to build and queue an order confirmation email.',
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def _registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Metrics for a Prometheus scraper.  With METRICS_TOKEN set the scraper
+    must send it as `Authorization: Bearer <token>`.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404('Metrics are disabled')
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.headers.get('Authorization', ''),
+        f'Bearer {settings.METRICS_TOKEN}',
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST
+    )
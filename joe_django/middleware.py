@@ -0,0 +1,323 @@
+"""
+Project-wide middleware.
+"""
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import instrumentation, metrics, profiling, routers
+
+perf_logger = logging.getLogger('joe_django.perf')
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise middleware that also runs natively under ASGI.
+
+    The stock middleware is sync-only, which makes Django funnel every
+    request through a single thread when served by uvicorn and cancels
+    out the benefit of the async checkout views.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Route a request's replicated reads to the primary when it writes or
+    follows a recent write by the same client (see joe_django/routers.py).
+
+    Requests that write set a cookie for REPLICA_PIN_SECONDS, long enough
+    for the replicas to catch up.  Without DATABASE_REPLICA_URLS the
+    middleware removes itself from the stack at startup.
+    """
+    async_capable = True
+    sync_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = routers.start_request(self._pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request(tokens)
+        return self._finish(request, response, wrote)
+
+    async def __acall__(self, request):
+        tokens = routers.start_request(self._pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.end_request(tokens)
+        return self._finish(request, response, wrote)
+
+    def _pinned(self, request):
+        return (
+            request.method not in self.safe_methods
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+
+    def _finish(self, request, response, wrote):
+        if wrote or request.method not in self.safe_methods:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class RequestTimingMiddleware:
+    """
+    Record wall time, query and duplicate-query counts, template render
+    time and external call time for a sample of requests.
+
+    Sampled responses get a Server-Timing header and one JSON log line on
+    the 'joe_django.perf' logger; requests slower than PERF_SLOW_REQUEST_MS
+    also log every query they ran.  With PERF_SAMPLE_RATE at 0 the
+    middleware removes itself from the stack at startup.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.PERF_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.slow_ms = settings.PERF_SLOW_REQUEST_MS
+        self.get_response = get_response
+        instrumentation.install()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        stats, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        self._report(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        stats, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        self._report(request, response, stats)
+        return response
+
+    def _report(self, request, response, stats):
+        response['Server-Timing'] = stats.server_timing()
+
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            **stats.as_dict(),
+        }
+        perf_logger.info(json.dumps(record))
+
+        if self.slow_ms and record['total_ms'] >= self.slow_ms:
+            queries = [
+                {'sql': sql, 'ms': round(duration * 1000, 2)}
+                for sql, duration in stats.queries
+            ]
+            perf_logger.warning(json.dumps({
+                'slow_request': request.path,
+                'total_ms': record['total_ms'],
+                'queries': queries,
+            }))
+
+
+class MetricsMiddleware:
+    """
+    Count every request and record its latency and query count by view
+    (see joe_django/metrics.py).  Removed at startup unless
+    METRICS_ENABLED is on.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrumentation.install()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        # Share the stats of a request RequestTimingMiddleware is sampling
+        stats, token = instrumentation.current_stats(), None
+        if stats is None:
+            stats, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                instrumentation.end_request(token)
+        self._record(request, response, stats, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        stats, token = instrumentation.current_stats(), None
+        if stats is None:
+            stats, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                instrumentation.end_request(token)
+        self._record(request, response, stats, start)
+        return response
+
+    def _record(self, request, response, stats, start):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.REQUESTS.labels(
+            view, request.method, response.status_code
+        ).inc()
+        metrics.REQUEST_LATENCY.labels(view).observe(
+            time.perf_counter() - start
+        )
+        metrics.REQUEST_QUERIES.labels(view).observe(stats.query_count)
+
+
+class ProfilingMiddleware:
+    """
+    Run a request under the sampling profiler (see joe_django/profiling.py)
+    when a staff user asks for it with an X-Profile header or _profile
+    query parameter, or at random for PROFILE_SAMPLE_RATE of requests.
+    Must come after AuthenticationMiddleware.  Unprofiled requests only
+    pay for the header/parameter check.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self._trigger(request)
+        user = request.user if trigger == 'staff' else None
+        if trigger == 'staff' and not user.is_staff:
+            trigger = None
+        if trigger is None:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        sampler, token = profiling.start_sampler()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = profiling.stop_sampler(sampler, token)
+        profiling.save_profile(self._record(
+            request, response, user, trigger, start, stacks
+        ))
+        return response
+
+    async def __acall__(self, request):
+        trigger = self._trigger(request)
+        user = await request.auser() if trigger == 'staff' else None
+        if trigger == 'staff' and not user.is_staff:
+            trigger = None
+        if trigger is None:
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        sampler, token = profiling.start_sampler()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stacks = profiling.stop_sampler(sampler, token)
+        await sync_to_async(profiling.save_profile)(self._record(
+            request, response, user, trigger, start, stacks
+        ))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profiling.follow_view_thread(view_func)
+
+    def _trigger(self, request):
+        if 'X-Profile' in request.headers or '_profile' in request.GET:
+            return 'staff'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def _record(self, request, response, user, trigger, start, stacks):
+        match = request.resolver_match
+        if user is None:
+            # Sampled request: name the user only if the view loaded it,
+            # rather than spend queries on it
+            user = getattr(request, '_cached_user', None)
+        return {
+            'timestamp': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'user': user.get_username() if user else '',
+            'status': response.status_code,
+            'trigger': trigger,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+            'interval_ms': settings.PROFILE_INTERVAL_MS,
+            'samples': sum(stacks.values()),
+            'stacks': stacks,
+        }
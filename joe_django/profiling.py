@@ -0,0 +1,288 @@
+"""
+On-demand sampling profiler.
+
+ProfilingMiddleware profiles a request when a staff user sends an
+`X-Profile: 1` header or a `_profile` query parameter, or at random for a
+PROFILE_SAMPLE_RATE fraction of all requests.  While the request runs, a
+Sampler thread reads the request thread's Python stack every
+PROFILE_INTERVAL_MS milliseconds and counts identical stacks, so the cost
+is a few percent of the profiled request and nothing for the others.
+
+Profiles are stored as collapsed stacks ("outer;inner;leaf" -> samples,
+the format flamegraph.pl and speedscope read) in a ring buffer of JSON
+files under PROFILE_DIR holding the newest PROFILE_BUFFER_SIZE profiles.
+Every worker on the host writes to the same directory.  Staff browse them
+at /admin/profiles/ as a flamegraph and a top-functions table.
+
+Sync views are sampled in the thread that runs them, also under ASGI.
+For async views it is the event loop thread, so samples from other
+requests on the same loop can show up.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import admin
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+
+PROFILE_ID = re.compile(r'^\d+-\d+$')
+TOP_FUNCTIONS = 30
+# Flamegraph boxes narrower than this fraction of the samples are hidden
+MIN_BOX_FRACTION = 0.002
+
+_active = ContextVar('profiler_sampler', default=None)
+
+# The sampler thread only gets the GIL every sys.getswitchinterval()
+# (5ms by default), so the interval is lowered while any profile runs
+_switch_lock = threading.Lock()
+_running = 0
+_default_switch_interval = sys.getswitchinterval()
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename):
+    """Path relative to the longest sys.path entry that contains it."""
+    for prefix in sorted(filter(None, sys.path), key=len, reverse=True):
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})'
+
+
+class Sampler(threading.Thread):
+    """Counts the stacks of one thread until stop() is called."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profiler-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            # A sample taken while stop() runs belongs to the profiler
+            if stack and not self._stopped.is_set():
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        global _running
+        with _switch_lock:
+            _running += 1
+            sys.setswitchinterval(min(_default_switch_interval, self.interval / 2))
+        super().start()
+
+    def stop(self):
+        global _running
+        self._stopped.set()
+        self.join()
+        with _switch_lock:
+            _running -= 1
+            if not _running:
+                sys.setswitchinterval(_default_switch_interval)
+        return self.stacks
+
+
+def start_sampler():
+    sampler = Sampler(
+        threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000
+    )
+    sampler.start()
+    return sampler, _active.set(sampler)
+
+
+def stop_sampler(sampler, token):
+    _active.reset(token)
+    return sampler.stop()
+
+
+def follow_view_thread(view_func):
+    """
+    Under ASGI a sync view runs in a worker thread, not the thread the
+    profile started in; switch the active sampler to the current thread.
+    """
+    sampler = _active.get()
+    if sampler is not None and not iscoroutinefunction(view_func):
+        sampler.thread_id = threading.get_ident()
+
+
+# Ring buffer
+
+def _profile_path(profile_id):
+    return os.path.join(settings.PROFILE_DIR, f'{profile_id}.json')
+
+
+def save_profile(record):
+    """Write a profile and drop the oldest beyond PROFILE_BUFFER_SIZE."""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profile_id = f'{time.time_ns()}-{os.getpid()}'
+    record['id'] = profile_id
+    path = _profile_path(profile_id)
+    # Write under a temporary name so readers never see half a file
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(record, f)
+    os.replace(f'{path}.tmp', path)
+
+    for old in _profile_ids()[settings.PROFILE_BUFFER_SIZE:]:
+        try:
+            os.remove(_profile_path(old))
+        except FileNotFoundError:
+            pass  # pruned by another worker
+    return profile_id
+
+
+def _profile_ids():
+    """Stored profile ids, newest first."""
+    try:
+        names = os.listdir(settings.PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    ids = [name[:-5] for name in names if name.endswith('.json')]
+    return sorted(
+        (pid for pid in ids if PROFILE_ID.match(pid)),
+        key=lambda pid: int(pid.split('-')[0]), reverse=True,
+    )
+
+
+def load_profile(profile_id):
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(_profile_path(profile_id)) as f:
+            record = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    record['recorded_at'] = datetime.fromtimestamp(
+        record['timestamp'], tz=timezone.utc
+    )
+    return record
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first."""
+    profiles = []
+    for profile_id in _profile_ids():
+        record = load_profile(profile_id)
+        if record is not None:
+            record.pop('stacks')
+            profiles.append(record)
+    return profiles
+
+
+# Analysis
+
+def top_functions(stacks, limit=TOP_FUNCTIONS):
+    """
+    The functions with the most samples, as dicts with their self samples
+    (the function itself was running) and total samples (it was anywhere
+    on the stack).
+    """
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    samples = sum(stacks.values()) or 1
+    rows = [
+        {
+            'function': function,
+            'self': own[function],
+            'self_pct': 100 * own[function] / samples,
+            'total': count,
+            'total_pct': 100 * count / samples,
+        }
+        for function, count in total.items()
+    ]
+    rows.sort(key=lambda row: (row['self'], row['total']), reverse=True)
+    return rows[:limit]
+
+
+def flame_boxes(stacks):
+    """
+    Boxes for an icicle flamegraph (callers above callees): depth plus
+    left offset and width as percentages of all samples.
+    """
+    tree = {}
+    for stack, count in stacks.items():
+        node = tree
+        for frame in stack.split(';'):
+            child = node.setdefault(frame, [0, {}])
+            child[0] += count
+            node = child[1]
+
+    samples = sum(stacks.values())
+    boxes = []
+
+    def walk(children, depth, left):
+        for name, (count, grandchildren) in sorted(children.items()):
+            if count / samples >= MIN_BOX_FRACTION:
+                boxes.append({
+                    'name': name,
+                    'samples': count,
+                    'depth': depth,
+                    'left': 100 * left / samples,
+                    'width': 100 * count / samples,
+                    'hue': zlib.crc32(name.split(' ')[0].encode()) % 60,
+                })
+                walk(grandchildren, depth + 1, left)
+            left += count
+
+    if samples:
+        walk(tree, 0, 0)
+    return boxes
+
+
+# Admin pages
+
+def profile_list(request):
+    return render(request, 'admin/profiles/profile_list.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': list_profiles(),
+        'buffer_size': settings.PROFILE_BUFFER_SIZE,
+        'sample_percent': settings.PROFILE_SAMPLE_RATE * 100,
+    })
+
+
+def profile_detail(request, profile_id):
+    record = load_profile(profile_id)
+    if record is None:
+        raise Http404('Profile not found')
+    stacks = record['stacks']
+    if request.GET.get('format') == 'collapsed':
+        lines = [f'{stack} {count}\n' for stack, count in stacks.items()]
+        response = HttpResponse(''.join(lines), content_type='text/plain')
+        response['Content-Disposition'] = (
+            f'attachment; filename="profile-{profile_id}.txt"'
+        )
+        return response
+
+    boxes = flame_boxes(stacks)
+    return render(request, 'admin/profiles/profile_detail.html', {
+        **admin.site.each_context(request),
+        'title': f'{record["method"]} {record["path"]}',
+        'profile': record,
+        'boxes': boxes,
+        'flame_depth': max((box['depth'] for box in boxes), default=0) + 1,
+        'functions': top_functions(stacks),
+    })
@@ -0,0 +1,133 @@
+"""
+Read-replica database routing.
+
+DATABASE_REPLICA_URLS (see settings.py) adds one 'replica_N' alias per
+read replica.  Reads of models in REPLICA_APPS (the catalogue and the
+sales reports) go to a random usable replica; every other read follows
+the instance it came from, and every write goes to 'default'.
+
+The primary also serves REPLICA_APPS reads, so a client sees its own
+writes, while:
+    - the request is not GET/HEAD/OPTIONS (cart, checkout, webhooks)
+    - the request has written anything, or is in a transaction
+    - the client wrote in the last REPLICA_PIN_SECONDS (a cookie set by
+      ReplicaPinningMiddleware), e.g. the redirect after an admin save
+
+Each process checks a replica at most every REPLICA_CHECK_SECONDS and
+skips it while it is more than REPLICA_MAX_LAG_SECONDS behind or cannot
+be reached; with no usable replica, reads fall back to the primary.  Lag
+is measured on PostgreSQL streaming replicas; for other backends only
+reachability is checked.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# 0 when all received WAL has been replayed, so an idle primary doesn't
+# look like lag; NULL (treated as 0) when run against a primary
+LAG_SQL = {
+    'postgresql': (
+        'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+        'THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+        'END'
+    ),
+}
+
+_pinned = ContextVar('replica_pinned', default=False)
+_wrote = ContextVar('replica_wrote', default=False)
+
+# alias -> (monotonic time of the last check, usable)
+_health = {}
+
+
+def start_request(pinned):
+    """Reset the pin for a new request; pass the tokens to end_request()."""
+    return _pinned.set(pinned), _wrote.set(False)
+
+
+def end_request(tokens):
+    """Whether the request wrote to the database."""
+    wrote = _wrote.get()
+    _pinned.reset(tokens[0])
+    _wrote.reset(tokens[1])
+    return wrote
+
+
+def is_pinned():
+    return (
+        _pinned.get() or _wrote.get()
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+def replica_lag(alias):
+    """
+    Seconds the replica is behind the primary (0 when it can't tell).
+    Raises DatabaseError if the replica is unreachable.
+    """
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL.get(connection.vendor, 'SELECT 0'))
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+def replica_usable(alias):
+    now = time.monotonic()
+    checked_at, usable = _health.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < settings.REPLICA_CHECK_SECONDS:
+        return usable
+
+    try:
+        lag = replica_lag(alias)
+    except DatabaseError as e:
+        usable = False
+        logger.warning(f'Replica {alias} is unavailable: {e}')
+    else:
+        usable = lag <= settings.REPLICA_MAX_LAG_SECONDS
+        if not usable:
+            logger.warning(
+                f'Replica {alias} is {lag:.1f}s behind; reading from the primary'
+            )
+    _health[alias] = (now, usable)
+    return usable
+
+
+def read_alias():
+    """
+    Database to read replicated data from: a usable replica, or
+    'default' when pinned or when none is usable.  Also usable with
+    QuerySet.using() for heavy reads outside REPLICA_APPS, e.g. exports.
+    """
+    if not settings.DATABASE_REPLICAS or is_pinned():
+        return DEFAULT_DB_ALIAS
+    usable = [
+        alias for alias in settings.DATABASE_REPLICAS if replica_usable(alias)
+    ]
+    return random.choice(usable) if usable else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in settings.REPLICA_APPS:
+            return read_alias()
+        # None lets related lookups follow the instance's database
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema from the primary
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,12 @@
+"""
+Project-wide signals.
+"""
+from django.dispatch import Signal
+
+# Sent after rows are changed with QuerySet.bulk_update() (e.g. admin
+# list_editable saves), which skips post_save.  Receivers that invalidate
+# caches on post_save should listen to this too.
+#   sender:    the model class
+#   instances: the changed objects
+#   fields:    names of the updated fields
+post_bulk_update = Signal()
@@ -0,0 +1,105 @@
+"""
+Media storage helpers.
+
+MEDIA_STORAGE selects where uploaded files (print images, commission
+references and final files) live; see settings.py.  With 's3' the bucket
+stays private and file bytes bypass the web process in both directions:
+
+    serve_file()         redirects to a short-lived presigned GET URL
+    presigned_upload()   lets the browser POST a file straight to the bucket
+    read_head()          fetches only the first bytes of an object, for
+                         checking an uploaded image's header
+    stream_file()        reads an object in chunks without spooling it
+                         to memory or a temporary file first
+
+With 'filesystem' the same calls stream from MEDIA_ROOT instead, so views
+don't need to know which backend is active.
+"""
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.utils.http import content_disposition_header
+
+
+def direct_media():
+    """True when browsers fetch and upload media from the storage itself."""
+    return settings.MEDIA_STORAGE == 's3'
+
+
+def serve_file(field_file, filename=None, attachment=False, cache_control=None):
+    """
+    Response delivering a stored file.  `cache_control` is applied to
+    the file itself; for a redirect, set headers on the redirect as well.
+    """
+    if direct_media():
+        parameters = {}
+        if attachment or filename:
+            parameters['ResponseContentDisposition'] = content_disposition_header(
+                attachment, filename or field_file.name.rsplit('/', 1)[-1]
+            )
+        if cache_control:
+            parameters['ResponseCacheControl'] = cache_control
+        return HttpResponseRedirect(
+            field_file.storage.url(field_file.name, parameters=parameters)
+        )
+    try:
+        response = FileResponse(
+            field_file.open('rb'), as_attachment=attachment, filename=filename
+        )
+    except FileNotFoundError:
+        raise Http404('File not found')
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def presigned_upload(storage, key, max_bytes, content_type_prefix=''):
+    """
+    URL and form fields for a browser POST of one file to `key`.  The
+    browser must also send a Content-Type field starting with
+    `content_type_prefix`; the bucket rejects larger files.
+    """
+    client = storage.connection.meta.client
+    return client.generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=key,
+        Conditions=[
+            ['content-length-range', 1, max_bytes],
+            ['starts-with', '$Content-Type', content_type_prefix],
+        ],
+        ExpiresIn=settings.MEDIA_UPLOAD_EXPIRE,
+    )
+
+
+def read_head(storage, name, length):
+    """The first `length` bytes of a stored file, without reading the rest."""
+    if direct_media():
+        client = storage.connection.meta.client
+        obj = client.get_object(
+            Bucket=storage.bucket_name, Key=name, Range=f'bytes=0-{length - 1}'
+        )
+        return obj['Body'].read()
+    with storage.open(name, 'rb') as f:
+        return f.read(length)
+
+
+def stream_file(storage, name, chunk_size):
+    """
+    (size, iterator of chunks) for reading a stored file front to back.
+    Raises FileNotFoundError if it doesn't exist.
+    """
+    if direct_media():
+        # S3File would download the whole object into a spooled temp file
+        client = storage.connection.meta.client
+        try:
+            obj = client.get_object(Bucket=storage.bucket_name, Key=name)
+        except client.exceptions.NoSuchKey:
+            raise FileNotFoundError(name)
+        return obj['ContentLength'], obj['Body'].iter_chunks(chunk_size)
+
+    size = storage.size(name)
+
+    def chunks():
+        with storage.open(name, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+    return size, chunks()
@@ -0,0 +1,24 @@
+"""
+Helpers for streaming responses.
+
+Under ASGI, StreamingHttpResponse reads a sync iterator fully into a list
+before sending anything, which defeats streaming.  Views that stream from
+a sync generator (CSV exports, ZIP bundles) wrap it with aiterate() when
+they are served by ASGI.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+
+async def aiterate(items, batch):
+    """
+    Serve a sync iterator to an async response `batch` items at a time.
+
+    Each batch is pulled on the request's sync thread, so a database
+    cursor the iterator holds stays with the connection that opened it.
+    """
+    items = iter(items)
+    while chunk := await sync_to_async(list)(islice(items, batch)):
+        for item in chunk:
+            yield item
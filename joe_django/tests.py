@@ -0,0 +1,367 @@
+import base64
+import json
+import unittest
+from io import BytesIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from gallery.admin import ArtPrintAdmin
+from gallery.models import ArtPrint, Category
+from shop.models import Order
+
+from . import routers
+from .admin import ScalableModelAdmin
+from .middleware import ReplicaPinningMiddleware
+from .storage import presigned_upload, read_head, serve_file, stream_file
+
+try:
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+REPLICA = 'replica_0'
+HAS_REPLICA = REPLICA in settings.DATABASES
+# The runner checks every test's databases exist, skipped or not
+DATABASES = {'default', REPLICA} if HAS_REPLICA else {'default'}
+
+
+@unittest.skipUnless(
+    HAS_REPLICA,
+    'Set DATABASE_REPLICA_URLS (e.g. sqlite:////tmp/replica.sqlite3) to '
+    'test replica routing',
+)
+@override_settings(
+    REPLICA_CHECK_SECONDS=60, REPLICA_MAX_LAG_SECONDS=5,
+    REPLICA_APPS=['gallery', 'reports'],
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    TransactionTestCase, since a TestCase transaction would pin every read
+    to the primary.  The replica mirrors the test database.
+    """
+    databases = DATABASES
+
+    def setUp(self):
+        routers._health.clear()
+        self.tokens = routers.start_request(False)
+        self.addCleanup(routers.end_request, self.tokens)
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(Category.objects.all().db, REPLICA)
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            list(Category.objects.all())
+        self.assertEqual(len(queries), 1)
+
+    def test_other_apps_read_from_the_primary(self):
+        self.assertEqual(Order.objects.all().db, 'default')
+
+    def test_writes_go_to_the_primary_and_pin(self):
+        with CaptureQueriesContext(connections['default']) as queries:
+            Category.objects.create(name='Neon')
+        self.assertTrue(
+            any('INSERT' in query['sql'] for query in queries.captured_queries)
+        )
+        # The rest of the request reads its own write
+        self.assertEqual(Category.objects.all().db, 'default')
+
+    def test_atomic_block_pins(self):
+        with transaction.atomic():
+            self.assertEqual(Category.objects.all().db, 'default')
+        self.assertEqual(Category.objects.all().db, REPLICA)
+
+    def test_lagging_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(routers, 'replica_lag', return_value=30.0), \
+                self.assertLogs('joe_django.routers', 'WARNING'):
+            self.assertEqual(routers.read_alias(), 'default')
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(
+            routers, 'replica_lag', side_effect=DatabaseError('refused'),
+        ), self.assertLogs('joe_django.routers', 'WARNING'):
+            self.assertEqual(routers.read_alias(), 'default')
+
+    def test_replica_health_is_checked_once_per_interval(self):
+        with mock.patch.object(routers, 'replica_lag', return_value=0.0) as lag:
+            for _ in range(3):
+                self.assertEqual(routers.read_alias(), REPLICA)
+        self.assertEqual(lag.call_count, 1)
+
+
+@unittest.skipUnless(
+    HAS_REPLICA,
+    'Set DATABASE_REPLICA_URLS to test replica pinning',
+)
+class ReplicaPinningMiddlewareTests(TransactionTestCase):
+    databases = DATABASES
+
+    def setUp(self):
+        routers._health.clear()
+        self.factory = RequestFactory()
+
+    def respond(self, request, write=False):
+        """Run the middleware; returns (alias read from, response)."""
+        seen = {}
+
+        def view(request):
+            if write:
+                Category.objects.create(name='Written')
+            seen['alias'] = Category.objects.all().db
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(request)
+        return seen['alias'], response
+
+    def test_plain_get_reads_from_the_replica(self):
+        alias, response = self.respond(self.factory.get('/'))
+        self.assertEqual(alias, REPLICA)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_post_reads_from_the_primary_and_sets_the_pin(self):
+        alias, response = self.respond(self.factory.post('/'))
+        self.assertEqual(alias, 'default')
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+
+    def test_get_that_writes_sets_the_pin(self):
+        alias, response = self.respond(self.factory.get('/'), write=True)
+        self.assertEqual(alias, 'default')
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_pin_cookie_keeps_the_next_request_on_the_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = '1'
+        alias, _ = self.respond(request)
+        self.assertEqual(alias, 'default')
+
+    def test_pin_does_not_leak_into_the_next_request(self):
+        self.respond(self.factory.post('/'))
+        alias, _ = self.respond(self.factory.get('/'))
+        self.assertEqual(alias, REPLICA)
+
+
+class BulkEditTests(TestCase):
+    """list_editable saves on the print changelist."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.neon = Category.objects.create(name='Neon')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.prints = [
+                ArtPrint.objects.create(
+                    title=f'Glow {n}', description='A print.',
+                    category=cls.neon, price=30, image=f'prints/glow-{n}.jpg',
+                )
+                for n in range(3)
+            ]
+        # As if the images had been read
+        ArtPrint.objects.update(
+            image_hash='abc123', image_width=640, image_height=480,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def post_changelist(self, changes):
+        """POST the changelist form with {print: {field: value}} edits."""
+        data = {
+            'form-TOTAL_FORMS': len(self.prints),
+            'form-INITIAL_FORMS': len(self.prints),
+            '_save': 'Save',
+        }
+        for n, art in enumerate(self.prints):
+            values = {'price': art.price, 'is_available': art.is_available}
+            values.update(changes.get(art, {}))
+            data[f'form-{n}-id'] = art.pk
+            data[f'form-{n}-price'] = values['price']
+            if values['is_available']:
+                data[f'form-{n}-is_available'] = 'on'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:gallery_artprint_changelist'), data
+            )
+        self.assertEqual(response.status_code, 302)
+
+    def test_bulk_edit_keeps_counts_and_derived_fields(self):
+        self.neon.refresh_from_db()
+        self.assertEqual(self.neon.available_print_count, 3)
+        first, second, _ = self.prints
+        before = ArtPrint.objects.get(pk=first.pk)
+
+        with mock.patch.object(ArtPrint, 'save') as save:
+            self.post_changelist({
+                first: {'is_available': False, 'price': 45},
+                second: {'is_available': False},
+            })
+        save.assert_not_called()
+
+        self.neon.refresh_from_db()
+        self.assertEqual(self.neon.available_print_count, 1)
+        after = ArtPrint.objects.get(pk=first.pk)
+        self.assertEqual(after.price, 45)
+        self.assertFalse(after.is_available)
+        self.assertGreater(after.updated_at, before.updated_at)
+        for field in ('slug', 'image_hash', 'image_width', 'image_height'):
+            self.assertEqual(getattr(after, field), getattr(before, field))
+
+    def test_other_fields_are_saved_row_by_row(self):
+        first = self.prints[0]
+        with mock.patch.object(ArtPrintAdmin, 'bulk_edit_fields', ('price',)), \
+                mock.patch.object(
+                    ArtPrint, 'save', autospec=True, side_effect=ArtPrint.save,
+                ) as save:
+            self.post_changelist({first: {'is_available': False}})
+        self.assertEqual(save.call_count, 1)
+        self.neon.refresh_from_db()
+        self.assertEqual(self.neon.available_print_count, 2)
+
+    def test_models_overriding_save_default_to_row_by_row(self):
+        self.assertEqual(
+            ScalableModelAdmin(ArtPrint, site).get_bulk_edit_fields(), set()
+        )
+
+
+BUCKET = 'media'
+S3_STORAGES = {
+    **settings.STORAGES,
+    'default': {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': BUCKET,
+            'region_name': 'us-east-1',
+            'access_key': 'testing',
+            'secret_key': 'testing',
+            'signature_version': 's3v4',
+            'default_acl': None,
+            'querystring_auth': True,
+            'querystring_expire': 3600,
+            'file_overwrite': False,
+        },
+    },
+}
+
+
+@unittest.skipIf(mock_aws is None, 'pip install moto to test S3 media')
+@override_settings(
+    MEDIA_STORAGE='s3', STORAGES=S3_STORAGES, MEDIA_URL_EXPIRE=3600,
+    MEDIA_UPLOAD_EXPIRE=600,
+)
+class S3StorageTests(TestCase):
+    """The object storage paths of joe_django.storage, against moto."""
+
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.client_s3 = default_storage.connection.meta.client
+        self.client_s3.create_bucket(Bucket=BUCKET)
+
+    def put(self, name, data):
+        return default_storage.save(name, ContentFile(data))
+
+    def query(self, url):
+        return {
+            key: values[0]
+            for key, values in parse_qs(urlsplit(url).query).items()
+        }
+
+    def test_serve_file_redirects_to_a_presigned_url(self):
+        name = self.put('commissions/final/art.png', b'final art')
+        art = ArtPrint(image=name)
+        response = serve_file(
+            art.image, filename='Commission.png', attachment=True,
+            cache_control='private, no-store',
+        )
+        self.assertEqual(response.status_code, 302)
+        location = response['Location']
+        self.assertEqual(urlsplit(location).path, f'/{name}')
+        query = self.query(location)
+        self.assertIn('X-Amz-Signature', query)
+        self.assertEqual(query['X-Amz-Expires'], '3600')
+        self.assertEqual(
+            query['response-content-disposition'],
+            'attachment; filename="Commission.png"',
+        )
+        self.assertEqual(
+            query['response-cache-control'], 'private, no-store'
+        )
+
+    def test_print_image_redirect_has_no_etag(self):
+        category = Category.objects.create(name='Neon')
+        buffer = BytesIO()
+        Image.new('RGB', (64, 48), '#1a1a2e').save(buffer, 'JPEG')
+        name = self.put('prints/glow.jpg', buffer.getvalue())
+        art = ArtPrint.objects.create(
+            title='Glow', description='A print.', image=name,
+            category=category, price=30,
+        )
+        self.assertTrue(art.image_hash)
+        self.assertTrue(art.display_image)
+
+        url = art.get_image_url()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=1800')
+        query = self.query(response['Location'])
+        self.assertIn('immutable', query['response-cache-control'])
+        self.assertNotIn('response-content-disposition', query)
+
+        # Revalidating must not turn into a 304 for an expired redirect
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=f'"{art.image_hash}"'
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_presigned_upload_fields_and_conditions(self):
+        upload = presigned_upload(
+            default_storage, 'commissions/uploads/abc.jpg', 1024, 'image/',
+        )
+        self.assertIn(BUCKET, upload['url'])
+        fields = upload['fields']
+        self.assertEqual(fields['key'], 'commissions/uploads/abc.jpg')
+        self.assertIn('x-amz-signature', fields)
+        policy = json.loads(base64.b64decode(fields['policy']))
+        self.assertIn(['content-length-range', 1, 1024], policy['conditions'])
+        self.assertIn(
+            ['starts-with', '$Content-Type', 'image/'], policy['conditions']
+        )
+        self.assertIn({'key': 'commissions/uploads/abc.jpg'}, policy['conditions'])
+
+    def test_read_head_reads_only_the_requested_bytes(self):
+        name = self.put('commissions/uploads/big.bin', bytes(range(256)) * 8)
+        with mock.patch.object(
+            self.client_s3, 'get_object', wraps=self.client_s3.get_object,
+        ) as get_object:
+            head = read_head(default_storage, name, 16)
+        self.assertEqual(head, bytes(range(16)))
+        self.assertEqual(get_object.call_args.kwargs['Range'], 'bytes=0-15')
+
+    def test_stream_file_yields_the_object_in_chunks(self):
+        data = b'0123456789' * 10
+        name = self.put('commissions/final/stream.bin', data)
+        size, chunks = stream_file(default_storage, name, 32)
+        self.assertEqual(size, len(data))
+        chunks = list(chunks)
+        self.assertEqual(b''.join(chunks), data)
+        self.assertEqual([len(chunk) for chunk in chunks], [32, 32, 32, 4])
+
+    def test_stream_file_missing_object(self):
+        with self.assertRaises(FileNotFoundError):
+            stream_file(default_storage, 'commissions/final/gone.bin', 32)
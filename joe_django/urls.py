@@ -6,13 +6,26 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+from .profiling import profile_detail, profile_list
+
 urlpatterns = [
+    path(
+        'admin/profiles/', admin.site.admin_view(profile_list),
+        name='profile_list',
+    ),
+    path(
+        'admin/profiles/<str:profile_id>/',
+        admin.site.admin_view(profile_detail), name='profile_detail',
+    ),
     path('admin/', admin.site.urls),
     path('accounts/', include('allauth.urls')),
     path('gallery/', include('gallery.urls')),
     path('shop/', include('shop.urls')),
     path('commissions/', include('commissions.urls')),
     path('account/', include('users.urls')),
+    path('reports/', include('reports.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('home.urls')),
 ]
 
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Notification
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('template', 'recipient', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'template')
+    search_fields = ('recipient',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    actions = ['retry']
+
+    @admin.action(description='Retry selected notifications now')
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status=Notification.SENT).update(
+            status=Notification.PENDING, attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{updated} notification(s) queued.')
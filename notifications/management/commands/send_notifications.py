@@ -0,0 +1,59 @@
+"""
+Management command that drains the notification outbox.
+
+Usage:
+    python manage.py send_notifications            # send what is due, exit
+    python manage.py send_notifications --loop     # run as a worker
+
+Runs as the `notifier` process in the Procfile.  Batch size, retries and
+the rate limit come from the NOTIFICATION_* settings.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.outbox import RateLimiter, send_batch
+
+
+class Command(BaseCommand):
+    help = 'Send queued notification emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new notifications instead of exiting.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to wait between polls when idle (default 5).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.NOTIFICATION_BATCH_SIZE,
+            help='Notifications sent per connection (default %(default)s).',
+        )
+
+    def handle(self, *args, **options):
+        limiter = RateLimiter(settings.NOTIFICATION_RATE_LIMIT)
+        while True:
+            sent = failed = 0
+            while True:
+                batch_sent, batch_failed = send_batch(
+                    options['batch_size'], limiter
+                )
+                sent += batch_sent
+                failed += batch_failed
+                if batch_sent + batch_failed < options['batch_size']:
+                    break
+
+            if sent or failed:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Sent {sent} notification(s), {failed} failed'
+                ))
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,45 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Notification(models.Model):
+    """
+    An email waiting in (or sent from) the outbox.
+    The body is rendered from `template` and `context` when it is sent;
+    see notifications/outbox.py.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    template = models.CharField(
+        max_length=100, help_text="e.g. order_confirmation"
+    )
+    recipient = models.EmailField()
+    context = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker's "pending and due" scan
+            models.Index(
+                fields=['status', 'next_attempt_at'],
+                name='notification_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.template} to {self.recipient} ({self.status})"
@@ -0,0 +1,163 @@
+"""
+Notification outbox.
+
+Code that wants to email someone calls enqueue() or enqueue_many(). These
+only insert Notification rows, so they can run inside the same transaction
+as the change being reported.  The send_notifications worker then drains
+due rows in batches over one reused mail connection, rendering:
+
+    notifications/email/<template>_subject.txt   (a single line)
+    notifications/email/<template>.txt           (plain-text body)
+
+A failed send is retried with exponential backoff starting at
+NOTIFICATION_RETRY_DELAY seconds, up to NOTIFICATION_MAX_ATTEMPTS tries.
+NOTIFICATION_RATE_LIMIT caps messages per second (0 means no limit).
+Each notification is marked sent as soon as it goes out, and a batch is
+leased for long enough to send it at that rate, so a slow batch is never
+claimed and sent a second time by another worker.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(template, recipient, **context):
+    """Queue one email.  `context` must be JSON-serialisable."""
+    return Notification.objects.create(
+        template=template, recipient=recipient, context=context
+    )
+
+
+def enqueue_many(template, messages):
+    """Queue one email per (recipient, context) pair with a single INSERT."""
+    return Notification.objects.bulk_create([
+        Notification(template=template, recipient=recipient, context=context)
+        for recipient, context in messages
+    ])
+
+
+def render_notification(notification):
+    """Build the EmailMessage for a queued notification."""
+    prefix = f'notifications/email/{notification.template}'
+    subject = render_to_string(f'{prefix}_subject.txt', notification.context)
+    body = render_to_string(f'{prefix}.txt', notification.context)
+    return EmailMessage(
+        subject=' '.join(subject.split()),
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[notification.recipient],
+    )
+
+
+def claim_batch(batch_size, lease_seconds=None):
+    """
+    Take up to `batch_size` due notifications.  Their next attempt is
+    pushed back by `lease_seconds` (NOTIFICATION_LEASE_SECONDS by default)
+    so no other worker picks them up meanwhile; if this worker dies they
+    become due again after that.
+    """
+    if lease_seconds is None:
+        lease_seconds = settings.NOTIFICATION_LEASE_SECONDS
+    now = timezone.now()
+    with transaction.atomic():
+        due = Notification.objects.filter(
+            status=Notification.PENDING, next_attempt_at__lte=now
+        ).order_by('next_attempt_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        Notification.objects.filter(id__in=[n.id for n in batch]).update(
+            next_attempt_at=now + timedelta(seconds=lease_seconds)
+        )
+    return batch
+
+
+def _record_sent(notification):
+    Notification.objects.filter(pk=notification.pk).update(
+        status=Notification.SENT, sent_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+
+
+def _record_failure(notification, error):
+    notification.attempts += 1
+    notification.last_error = str(error)
+    if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+        notification.status = Notification.FAILED
+    else:
+        backoff = 2 ** (notification.attempts - 1)
+        notification.next_attempt_at = timezone.now() + timedelta(
+            seconds=settings.NOTIFICATION_RETRY_DELAY * backoff
+        )
+    notification.save(update_fields=[
+        'attempts', 'last_error', 'status', 'next_attempt_at',
+    ])
+
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1/rate seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self.next_slot:
+            time.sleep(self.next_slot - now)
+        self.next_slot = max(now, self.next_slot) + self.interval
+
+
+def send_batch(batch_size=None, limiter=None):
+    """
+    Send one batch of due notifications over a single connection.
+    Returns (sent, failed) counts; (0, 0) means the outbox is empty.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    limiter = limiter or RateLimiter(settings.NOTIFICATION_RATE_LIMIT)
+    # The rate limit alone can stretch a batch past the plain lease
+    batch = claim_batch(
+        batch_size,
+        settings.NOTIFICATION_LEASE_SECONDS + batch_size * limiter.interval,
+    )
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    mail = get_connection(fail_silently=False)
+    try:
+        mail.open()
+    except Exception as e:
+        logger.error(f'Could not open mail connection: {e}')
+        for notification in batch:
+            _record_failure(notification, e)
+        return 0, len(batch)
+
+    try:
+        for notification in batch:
+            limiter.wait()
+            try:
+                mail.send_messages([render_notification(notification)])
+            except Exception as e:
+                logger.error(f'Notification #{notification.id} failed: {e}')
+                _record_failure(notification, e)
+                failed += 1
+            else:
+                _record_sent(notification)
+                sent += 1
+    finally:
+        mail.close()
+    return sent, failed
@@ -0,0 +1,129 @@
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Notification
+from .outbox import RateLimiter, claim_batch, enqueue, enqueue_many, send_batch
+
+
+def _confirmation(order_id=1):
+    return {'order_id': order_id, 'total': '25.00', 'items': []}
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    NOTIFICATION_BATCH_SIZE=10, NOTIFICATION_MAX_ATTEMPTS=3,
+    NOTIFICATION_RETRY_DELAY=60, NOTIFICATION_RATE_LIMIT=0,
+    NOTIFICATION_LEASE_SECONDS=300,
+)
+class OutboxTests(TestCase):
+
+    def make_due(self):
+        Notification.objects.update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_enqueue_only_inserts_rows(self):
+        enqueue('order_confirmation', 'a@example.com', **_confirmation())
+        self.assertEqual(len(mail.outbox), 0)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, Notification.PENDING)
+        self.assertEqual(notification.context['order_id'], 1)
+
+    def test_batch_is_sent_over_one_connection(self):
+        enqueue_many('order_confirmation', [
+            (f'user{i}@example.com', _confirmation(i)) for i in range(4)
+        ])
+        with mock.patch(
+            'notifications.outbox.get_connection', wraps=get_connection,
+        ) as connect:
+            self.assertEqual(send_batch(), (4, 0))
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertIn('Order #2', mail.outbox[2].body)
+        self.assertEqual(
+            Notification.objects.filter(status=Notification.SENT).count(), 4
+        )
+        self.assertEqual(send_batch(), (0, 0))
+
+    def test_failures_back_off_until_failed(self):
+        notification = enqueue(
+            'order_confirmation', 'a@example.com', **_confirmation()
+        )
+        with mock.patch.object(
+            EmailBackend, 'send_messages', side_effect=SMTPException('down'),
+        ), self.assertLogs('notifications.outbox', 'ERROR'):
+            delays = []
+            for _ in range(3):
+                start = timezone.now()
+                self.assertEqual(send_batch(), (0, 1))
+                notification.refresh_from_db()
+                delays.append(
+                    (notification.next_attempt_at - start).total_seconds()
+                )
+                self.make_due()
+
+        self.assertEqual(notification.status, Notification.FAILED)
+        self.assertEqual(notification.attempts, 3)
+        self.assertEqual(notification.last_error, 'down')
+        self.assertAlmostEqual(delays[0], 60, delta=5)
+        self.assertAlmostEqual(delays[1], 120, delta=5)
+        self.assertEqual(send_batch(), (0, 0))
+
+    def test_rows_are_marked_sent_as_they_go(self):
+        enqueue_many('order_confirmation', [
+            (f'user{i}@example.com', _confirmation(i)) for i in range(3)
+        ])
+        limiter = RateLimiter(0)
+        with mock.patch.object(
+            limiter, 'wait', side_effect=[None, None, KeyboardInterrupt],
+        ), self.assertRaises(KeyboardInterrupt):
+            send_batch(limiter=limiter)
+        self.assertEqual(
+            Notification.objects.filter(status=Notification.SENT).count(), 2
+        )
+
+    def test_lease_covers_a_rate_limited_batch(self):
+        enqueue('order_confirmation', 'a@example.com', **_confirmation())
+        limiter = RateLimiter(0.5)
+        with mock.patch.object(limiter, 'wait'), mock.patch(
+            'notifications.outbox.claim_batch', wraps=claim_batch,
+        ) as claim:
+            send_batch(batch_size=10, limiter=limiter)
+        # 10 messages at one per two seconds, on top of the plain lease
+        self.assertEqual(claim.call_args.args, (10, 300 + 20))
+
+    def test_rate_limiter_spaces_sends(self):
+        sleeps = []
+        with mock.patch('notifications.outbox.time') as fake_time:
+            # The clock stands still, so every wait sleeps its full share
+            fake_time.monotonic.return_value = 100.0
+            fake_time.sleep.side_effect = sleeps.append
+            limiter = RateLimiter(4)
+            for _ in range(3):
+                limiter.wait()
+        self.assertEqual(sleeps, [0.25, 0.5])
+
+    def test_unlimited_rate_never_sleeps(self):
+        with mock.patch('notifications.outbox.time') as fake_time:
+            limiter = RateLimiter(0)
+            for _ in range(3):
+                limiter.wait()
+        fake_time.sleep.assert_not_called()
+
+    def test_expired_lease_is_reclaimed(self):
+        enqueue('order_confirmation', 'a@example.com', **_confirmation())
+        self.assertEqual(len(claim_batch(10)), 1)
+        # Leased: another worker finds nothing
+        self.assertEqual(claim_batch(10), [])
+
+        # The first worker died; once the lease runs out the row is due
+        self.make_due()
+        self.assertEqual(send_batch(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
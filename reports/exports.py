@@ -0,0 +1,131 @@
+"""
+Streaming exports of orders and commissions for accounting.
+
+Rows are read in id order with QuerySet.iterator(chunk_size=...), which
+uses a server-side cursor on PostgreSQL, and each row is encoded as it is
+produced.  Memory therefore stays flat however many rows match.  Every row
+starts with the id of its order or commission, so an interrupted export
+can be resumed with after=<last complete id>.  Exports read from a read
+replica when one is configured (see joe_django/routers.py).
+
+Formats:
+    csv    header line, then one line per row
+    jsonl  one JSON object per line (JSON Lines)
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from commissions.models import CommissionRequest
+from joe_django.routers import read_alias
+from shop.models import Order, OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+ORDER_COLUMNS = (
+    'order_id', 'created_at', 'status', 'is_completed', 'total_amount',
+    'username', 'email', 'stripe_session_id',
+    'item_id', 'art_print_id', 'art_print', 'quantity', 'unit_price',
+)
+COMMISSION_COLUMNS = (
+    'commission_id', 'created_at', 'updated_at', 'status', 'commission_type',
+    'size', 'title', 'estimated_price', 'deposit_paid', 'username', 'email',
+)
+
+
+def _created_between(queryset, start, end, after):
+    """Filter on local days start..end (either may be None) and id > after."""
+    if start:
+        queryset = queryset.filter(
+            created_at__gte=timezone.make_aware(datetime.combine(start, time.min))
+        )
+    if end:
+        queryset = queryset.filter(created_at__lt=timezone.make_aware(
+            datetime.combine(end + timedelta(days=1), time.min)
+        ))
+    if after:
+        queryset = queryset.filter(id__gt=after)
+    return queryset.order_by('id')
+
+
+def order_rows(start=None, end=None, after=0, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    One row per order line; an order without lines gives one row with
+    empty item columns.  Lines are prefetched one chunk of orders at a time.
+    """
+    orders = _created_between(
+        Order.objects.using(read_alias()), start, end, after
+    )
+    orders = orders.select_related('user').only(
+        'id', 'created_at', 'status', 'is_completed', 'total_amount',
+        'stripe_session_id', 'user__username', 'user__email',
+    ).prefetch_related(Prefetch(
+        'items',
+        queryset=OrderItem.objects.select_related('art_print')
+        .only('id', 'order_id', 'quantity', 'price', 'art_print__title')
+        .order_by('id'),
+    ))
+    for order in orders.iterator(chunk_size=chunk_size):
+        head = (
+            order.id, order.created_at, order.status, order.is_completed,
+            order.total_amount,
+            order.user.username if order.user else '',
+            order.user.email if order.user else '',
+            order.stripe_session_id,
+        )
+        items = order.items.all()
+        if not items:
+            yield head + ('', '', '', '', '')
+        for item in items:
+            yield head + (
+                item.id, item.art_print_id or '',
+                item.art_print.title if item.art_print else '',
+                item.quantity, item.price,
+            )
+
+
+def commission_rows(start=None, end=None, after=0, chunk_size=EXPORT_CHUNK_SIZE):
+    commissions = _created_between(
+        CommissionRequest.objects.using(read_alias()), start, end, after
+    ).select_related('user')
+    rows = commissions.values_list(
+        'id', 'created_at', 'updated_at', 'status', 'commission_type', 'size',
+        'title', 'estimated_price', 'deposit_paid', 'user__username',
+        'user__email',
+    )
+    yield from rows.iterator(chunk_size=chunk_size)
+
+
+EXPORTS = {
+    'orders': (ORDER_COLUMNS, order_rows),
+    'commissions': (COMMISSION_COLUMNS, commission_rows),
+}
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def encode(columns, rows, fmt, header=True):
+    """Yield the export as text lines in the given format."""
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        if header:
+            yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
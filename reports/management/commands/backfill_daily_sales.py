@@ -0,0 +1,69 @@
+"""
+Management command that rebuilds the daily sales rollups from orders.
+
+Usage:
+    python manage.py backfill_daily_sales                      # all history
+    python manage.py backfill_daily_sales --start 2025-01-01 --end 2025-03-31
+    python manage.py backfill_daily_sales --chunk-days 7
+
+Each chunk of days is aggregated and replaced in its own transaction, so
+the command can be stopped and rerun safely.  Orders placed on a day while
+it is being rebuilt may be missed; rerun that day afterwards.
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reports.rollups import rebuild_rollups
+from shop.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DailySales and DailyOrderStats from historical orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start', type=date.fromisoformat,
+            help='First day to rebuild, YYYY-MM-DD (default: first order).',
+        )
+        parser.add_argument(
+            '--end', type=date.fromisoformat,
+            help='Last day to rebuild, YYYY-MM-DD (default: today).',
+        )
+        parser.add_argument(
+            '--chunk-days', type=int, default=30,
+            help='Days aggregated per transaction (default 30).',
+        )
+
+    def handle(self, *args, **options):
+        start = options['start']
+        if start is None:
+            first = Order.objects.order_by('created_at').values_list(
+                'created_at', flat=True
+            ).first()
+            if first is None:
+                self.stdout.write('No orders to aggregate.')
+                return
+            start = timezone.localdate(first)
+        end = options['end'] or timezone.localdate()
+        if end < start:
+            raise CommandError('--end is before --start.')
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1.')
+
+        total = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(
+                end, chunk_start + timedelta(days=options['chunk_days'] - 1)
+            )
+            rows = rebuild_rollups(chunk_start, chunk_end)
+            total += rows
+            self.stdout.write(f'{chunk_start} to {chunk_end}: {rows} row(s)')
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt rollups for {start} to {end} ({total} print row(s))'
+        ))
@@ -0,0 +1,155 @@
+"""
+Management command that streams orders or commissions to a file.
+
+Usage:
+    python manage.py export_accounting orders --output orders.csv
+    python manage.py export_accounting commissions --format jsonl \
+        --start 2025-01-01 --end 2025-12-31 > commissions.jsonl
+    python manage.py export_accounting orders --output orders.csv --after 48213
+
+Rows are written in id order as they are read, so memory stays flat.
+All the rows of one order are written and flushed together, and the
+command always reports the last complete order (or commission) id, also
+when it is interrupted.  Rerun it with --after set to that id; with
+--output, anything in the file past that id (the part of an order that
+was being written) is cut off first, and the new rows are appended
+without another header.
+"""
+import codecs
+import csv
+import json
+from datetime import date
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.exports import EXPORT_CHUNK_SIZE, EXPORTS, FORMATS, encode
+
+
+def _records(path, fmt):
+    """
+    Yield (id, end offset) for each record in an export file; the CSV
+    header has id None.  A CSV record spans lines when a field contains
+    a newline.
+    """
+    offset = 0
+
+    def lines(f):
+        nonlocal offset
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                raise ValueError('incomplete line')
+            offset += len(raw)
+            yield decoder.decode(raw)
+
+    with open(path, 'rb') as f:
+        if fmt == 'csv':
+            for n, record in enumerate(csv.reader(lines(f))):
+                yield None if n == 0 else int(record[0]), offset
+        else:
+            for line in lines(f):
+                yield next(iter(json.loads(line).values())), offset
+
+
+def _truncate_after(path, fmt, after):
+    """
+    Cut an export file back to the end of the last record with an id of
+    at most `after`, dropping a partly written order or line.
+    """
+    keep = 0
+    try:
+        for record_id, end in _records(path, fmt):
+            if record_id is not None and record_id > after:
+                break
+            keep = end
+    except FileNotFoundError:
+        raise CommandError(f'{path} does not exist; nothing to resume')
+    except (ValueError, IndexError, StopIteration, csv.Error):
+        pass  # the half-written line an interrupted export left behind
+    with open(path, 'rb+') as f:
+        f.truncate(keep)
+
+
+class Command(BaseCommand):
+    help = 'Export orders or commissions as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument(
+            '--format', choices=sorted(FORMATS), default='csv',
+            help='Output format (default csv).',
+        )
+        parser.add_argument(
+            '--start', type=date.fromisoformat,
+            help='First day to include, YYYY-MM-DD.',
+        )
+        parser.add_argument(
+            '--end', type=date.fromisoformat,
+            help='Last day to include, YYYY-MM-DD.',
+        )
+        parser.add_argument(
+            '--after', type=int, default=0,
+            help='Only export ids greater than this (to resume).',
+        )
+        parser.add_argument(
+            '--output', help='File to write to (default: standard output).',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='Rows fetched per database round trip (default %(default)s).',
+        )
+
+    def handle(self, *args, **options):
+        columns, make_rows = EXPORTS[options['kind']]
+        fmt = options['format']
+        after = options['after']
+        rows = make_rows(
+            options['start'], options['end'], after,
+            chunk_size=options['chunk_size'],
+        )
+        progress = {'rows': 0, 'last_id': after}
+
+        if options['output']:
+            if after:
+                _truncate_after(options['output'], fmt, after)
+            out = open(
+                options['output'], 'a' if after else 'w',
+                newline='', encoding='utf-8',
+            )
+
+            def write(text):
+                out.write(text)
+                out.flush()
+        else:
+            out = None
+
+            def write(text):
+                self.stdout.write(text, ending='')
+                self.stdout.flush()
+
+        finished = False
+        try:
+            # A resumed export continues an existing file, so no second header
+            if not after:
+                write(''.join(encode(columns, [], fmt)))
+            for row_id, group in groupby(rows, key=lambda row: row[0]):
+                group = list(group)
+                write(''.join(encode(columns, group, fmt, header=False)))
+                progress['rows'] += len(group)
+                progress['last_id'] = row_id
+            finished = True
+        finally:
+            if out is not None:
+                out.close()
+            summary = (
+                f'{progress["rows"]} row(s); '
+                f'last complete id {progress["last_id"]}'
+            )
+            if finished:
+                self.stderr.write(self.style.SUCCESS(f'Exported {summary}'))
+            else:
+                self.stderr.write(self.style.WARNING(
+                    f'Interrupted after {summary}; rerun with '
+                    f'--after {progress["last_id"]} to resume'
+                ))
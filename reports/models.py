@@ -0,0 +1,53 @@
+from django.db import models
+from gallery.models import ArtPrint, Category
+
+
+class DailySales(models.Model):
+    """
+    Paid units and revenue for one print on one day, keyed by the day the
+    order was placed.  Maintained by shop fulfilment and rebuilt by the
+    backfill_daily_sales command; see reports/rollups.py.
+    """
+    date = models.DateField()
+    art_print = models.ForeignKey(
+        ArtPrint, on_delete=models.SET_NULL, null=True,
+        related_name='daily_sales'
+    )
+    # Copied from the print so category totals need no join
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='daily_sales'
+    )
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "daily sales"
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'art_print'], name='daily_sales_unique_print',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.units} × print #{self.art_print_id}"
+
+
+class DailyOrderStats(models.Model):
+    """
+    Orders placed on one day and how many of them have been paid, for
+    conversion reporting.
+    """
+    date = models.DateField(unique=True)
+    orders_created = models.PositiveIntegerField(default=0)
+    orders_paid = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "daily order stats"
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.orders_paid}/{self.orders_created} paid"
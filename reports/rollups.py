@@ -0,0 +1,188 @@
+"""
+Daily sales rollups.
+
+Orders are counted against the local day they were placed on.  Shop views
+keep today's rows current as orders come in:
+
+    record_order_created()   when checkout creates a pending order
+    record_order_paid()      when fulfilment marks it paid
+
+rebuild_rollups() recomputes a range of days from the orders themselves;
+the backfill_daily_sales command runs it over history in chunks.  Days
+old enough for purge_stale_data to have deleted their abandoned orders
+keep the orders_created they already had, as those orders can no longer
+be counted.  Reports
+read only the rollup tables, so their cost depends on the date range and
+not on how many orders there are.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from shop.models import Order, OrderItem
+
+from .models import DailyOrderStats, DailySales
+
+BATCH_SIZE = 1000
+
+
+def _day(moment):
+    return timezone.localdate(moment)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def purge_horizon():
+    """
+    The last day that may have lost orders to shop.retention's
+    abandoned_orders policy.
+    """
+    return _day(timezone.now() - timedelta(days=settings.RETENTION_ORDER_DAYS))
+
+
+def _bump(model, lookup, increments, defaults=None):
+    """
+    Add `increments` to the counters of the row matching `lookup`,
+    creating the row if this is the first count for it.
+    """
+    updates = {field: F(field) + value for field, value in increments.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **(defaults or {}), **increments)
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**lookup).update(**updates)
+
+
+def record_order_created(order):
+    _bump(DailyOrderStats, {'date': _day(order.created_at)}, {'orders_created': 1})
+
+
+def record_order_paid(order, items):
+    """Count a newly paid order; `items` are its OrderItems with art_print."""
+    day = _day(order.created_at)
+    _bump(
+        DailyOrderStats, {'date': day},
+        {'orders_paid': 1, 'revenue': order.total_amount},
+    )
+    for item in items:
+        if not item.art_print:
+            continue
+        _bump(
+            DailySales, {'date': day, 'art_print_id': item.art_print_id},
+            {
+                'units': item.quantity,
+                'revenue': item.price * item.quantity,
+                'orders': 1,
+            },
+            defaults={'category_id': item.art_print.category_id},
+        )
+
+
+@transaction.atomic
+def rebuild_rollups(start, end):
+    """
+    Replace the rollups for the days start..end (inclusive) with totals
+    computed from the orders placed on them.  Returns the number of
+    DailySales rows written.
+    """
+    low, high = _day_start(start), _day_start(end + timedelta(days=1))
+    # Purged orders are gone, but the existing rows still count them
+    purged_created = dict(
+        DailyOrderStats.objects.filter(
+            date__range=(start, min(end, purge_horizon()))
+        ).values_list('date', 'orders_created')
+    )
+    DailySales.objects.filter(date__range=(start, end)).delete()
+    DailyOrderStats.objects.filter(date__range=(start, end)).delete()
+
+    placed = Order.objects.filter(created_at__gte=low, created_at__lt=high)
+    stats = [
+        DailyOrderStats(**row)
+        for row in placed.annotate(date=TruncDate('created_at'))
+        .values('date').order_by()
+        .annotate(
+            orders_created=Count('id'),
+            orders_paid=Count('id', filter=Q(is_completed=True)),
+            revenue=Sum(
+                'total_amount', filter=Q(is_completed=True), default=Decimal('0')
+            ),
+        )
+    ]
+    for day in stats:
+        day.orders_created = max(
+            day.orders_created, purged_created.pop(day.date, 0)
+        )
+    # Days whose orders were all purged
+    stats += [
+        DailyOrderStats(date=date, orders_created=created)
+        for date, created in purged_created.items() if created
+    ]
+    DailyOrderStats.objects.bulk_create(stats, batch_size=BATCH_SIZE)
+
+    sold = (
+        OrderItem.objects.filter(
+            order__created_at__gte=low, order__created_at__lt=high,
+            order__is_completed=True, art_print__isnull=False,
+        )
+        .annotate(date=TruncDate('order__created_at'))
+        .values('date', 'art_print_id', 'art_print__category_id').order_by()
+        .annotate(
+            units=Sum('quantity'),
+            revenue=Sum(
+                F('price') * F('quantity'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            orders=Count('order_id', distinct=True),
+        )
+    )
+    rows = [
+        DailySales(
+            date=row['date'], art_print_id=row['art_print_id'],
+            category_id=row['art_print__category_id'], units=row['units'],
+            revenue=row['revenue'], orders=row['orders'],
+        )
+        for row in sold.iterator(chunk_size=BATCH_SIZE)
+    ]
+    DailySales.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def sales_report(start, end, top=10):
+    """Top prints, revenue by category and conversion for start..end."""
+    sales = DailySales.objects.filter(date__range=(start, end)).order_by()
+    top_prints = list(
+        sales.values('art_print_id', 'art_print__title', 'art_print__slug')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue')[:top]
+    )
+    categories = list(
+        sales.values('category__name')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue')
+    )
+    days = list(
+        DailyOrderStats.objects.filter(date__range=(start, end)).order_by('date')
+    )
+
+    created = sum(day.orders_created for day in days)
+    paid = sum(day.orders_paid for day in days)
+    return {
+        'top_prints': top_prints,
+        'categories': categories,
+        'days': days,
+        'orders_created': created,
+        'orders_paid': paid,
+        'orders_pending': created - paid,
+        'conversion': round(100 * paid / created, 1) if created else None,
+        'revenue': sum((day.revenue for day in days), Decimal('0')),
+    }
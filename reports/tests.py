@@ -0,0 +1,178 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from gallery.models import ArtPrint
+from shop.models import Order, OrderItem
+from shop.retention import purge
+
+from . import exports
+from .models import DailyOrderStats
+from .rollups import rebuild_rollups
+
+
+@override_settings(RETENTION_ORDER_DAYS=30, RETENTION_BATCH_PAUSE_MS=0)
+class RollupRetentionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='password')
+
+    def order(self, days_old, paid=False):
+        order = Order.objects.create(
+            user=self.user, total_amount=30, is_completed=paid,
+            status='paid' if paid else 'expired',
+        )
+        Order.objects.filter(pk=order.pk).update(
+            created_at=timezone.now() - timedelta(days=days_old)
+        )
+        return order
+
+    def stats(self, days_old):
+        day = timezone.localdate() - timedelta(days=days_old)
+        return DailyOrderStats.objects.filter(date=day).values_list(
+            'orders_created', 'orders_paid',
+        ).first()
+
+    def rebuild(self):
+        today = timezone.localdate()
+        rebuild_rollups(today - timedelta(days=60), today)
+
+    def test_rebuild_after_purge_keeps_old_orders_created(self):
+        self.order(40, paid=True)
+        self.order(40)
+        self.order(40)
+        self.order(50)
+        self.order(2)
+        self.rebuild()
+        self.assertEqual(self.stats(40), (3, 1))
+        self.assertEqual(self.stats(50), (1, 0))
+
+        deleted = sum(
+            counts['shop.Order'] for counts, _ in purge('abandoned_orders')
+        )
+        self.assertEqual(deleted, 3)
+
+        self.rebuild()
+        self.assertEqual(self.stats(40), (3, 1))
+        # Every order that day was purged; the row stays
+        self.assertEqual(self.stats(50), (1, 0))
+        self.assertEqual(self.stats(2), (1, 0))
+
+    def test_recent_days_are_recounted(self):
+        self.order(2)
+        self.rebuild()
+        DailyOrderStats.objects.update(orders_created=9)
+        self.rebuild()
+        self.assertEqual(self.stats(2), (1, 0))
+
+
+class ExportResumeTests(TestCase):
+    """export_accounting only ever resumes at the end of a whole order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('buyer', 'buyer@example.com')
+        # A newline in a title makes its CSV record span two lines
+        art = [
+            ArtPrint.objects.create(
+                title=title, description='A print.', price=30,
+                image=f'prints/{n}.jpg',
+            )
+            for n, title in enumerate(['Glow', 'Dusk\nand dawn'])
+        ]
+        cls.orders = []
+        for lines in (2, 3, 1):
+            order = Order.objects.create(user=user, total_amount=30 * lines)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, art_print=art[n % 2], price=30)
+                for n in range(lines)
+            ])
+            cls.orders.append(order)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'orders')
+
+    def export(self, *args, fmt='csv', fail_at=None):
+        """
+        Run the command; returns its stderr.  With fail_at, the rows stop
+        with a KeyboardInterrupt once that many have been produced.
+        """
+        make_rows = exports.order_rows
+
+        def rows(*args, **kwargs):
+            for n, row in enumerate(make_rows(*args, **kwargs)):
+                if n == fail_at:
+                    raise KeyboardInterrupt
+                yield row
+
+        stderr = StringIO()
+        with mock.patch.dict(
+            exports.EXPORTS, orders=(exports.ORDER_COLUMNS, rows),
+        ):
+            try:
+                call_command(
+                    'export_accounting', 'orders', '--format', fmt,
+                    '--output', self.path, *args, stderr=stderr,
+                )
+            except KeyboardInterrupt:
+                pass
+        return stderr.getvalue()
+
+    def read(self):
+        with open(self.path, encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def complete_export(self, fmt):
+        self.export(fmt=fmt)
+        full = self.read()
+        os.remove(self.path)
+        return full
+
+    def test_interrupted_export_stops_after_a_whole_order(self):
+        first, second, _ = self.orders
+        # Interrupted in the middle of the second order's three lines
+        stderr = self.export(fail_at=3)
+        self.assertIn(f'--after {first.id} to resume', stderr)
+        self.assertNotIn(f'\r\n{second.id},', self.read())
+
+    def test_resume_completes_the_export(self):
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                full = self.complete_export(fmt)
+                self.export(fmt=fmt, fail_at=3)
+                self.export('--after', str(self.orders[0].id), fmt=fmt)
+                self.assertEqual(self.read(), full)
+
+    def test_resume_drops_a_partly_written_order(self):
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                full = self.complete_export(fmt)
+                # The process died partway through the second order's
+                # last line
+                second = self.orders[1].id
+                last_line = full.rindex(
+                    f'\n{second},' if fmt == 'csv'
+                    else f'{{"order_id": {second},'
+                )
+                with open(self.path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(full[:last_line + 10])
+
+                self.export('--after', str(self.orders[0].id), fmt=fmt)
+                self.assertEqual(self.read(), full)
+
+    def test_resume_without_the_file(self):
+        with self.assertRaisesMessage(CommandError, 'nothing to resume'):
+            call_command(
+                'export_accounting', 'orders', '--output', self.path,
+                '--after', '1', stderr=StringIO(),
+            )
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('sales/', views.sales_dashboard, name='sales_dashboard'),
+    path('export/orders/', views.export, {'kind': 'orders'}, name='export_orders'),
+    path('export/commissions/', views.export, {'kind': 'commissions'}, name='export_commissions'),
+]
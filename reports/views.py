@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from joe_django.streaming import aiterate
+
+from .exports import EXPORT_CHUNK_SIZE, EXPORTS, FORMATS, encode
+from .rollups import sales_report
+
+PERIODS = (7, 30, 90, 365)
+
+
+def _date_param(request, name):
+    """Parse an optional YYYY-MM-DD query parameter; raises ValueError."""
+    value = request.GET.get(name)
+    return date.fromisoformat(value) if value else None
+
+
+@staff_member_required
+def sales_dashboard(request):
+    """Staff sales overview for the last N days, read from the rollups."""
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in PERIODS:
+        days = 30
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    return render(request, 'reports/sales_dashboard.html', {
+        'report': sales_report(start, end),
+        'start': start,
+        'end': end,
+        'days': days,
+        'periods': PERIODS,
+    })
+
+
+@staff_member_required
+@require_GET
+def export(request, kind):
+    """
+    Stream orders or commissions as CSV or JSON Lines.
+    Query parameters: start, end (YYYY-MM-DD), after (id), format.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest('Unknown format.')
+    try:
+        start = _date_param(request, 'start')
+        end = _date_param(request, 'end')
+        after = int(request.GET.get('after') or 0)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid date or id.')
+
+    columns, rows = EXPORTS[kind]
+    lines = encode(columns, rows(start, end, after), fmt)
+    if isinstance(request, ASGIRequest):
+        lines = aiterate(lines, batch=EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(lines, content_type=FORMATS[fmt])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}-{start or "all"}-{end or "now"}.{fmt}"'
+    )
+    return response
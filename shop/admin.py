@@ -1,4 +1,7 @@
 from django.contrib import admin
+
+from joe_django.admin import ScalableModelAdmin
+
 from .models import Order, OrderItem
 
 
@@ -7,10 +10,15 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ('art_print', 'quantity', 'price')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('art_print')
+
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ScalableModelAdmin):
     list_display = ('id', 'user', 'total_amount', 'status', 'is_completed', 'created_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
     list_filter = ('status', 'is_completed')
     search_fields = ('user__username', 'stripe_session_id')
     inlines = [OrderItemInline]
@@ -1,17 +1,15 @@
-from decimal import Decimal
 from django.conf import settings
 
+from .utils import get_cart, get_cart_total
+
 
 def cart_contents(request):
     """
     Context processor to make cart data available in every template.
     """
-    cart = request.session.get('cart', {})
-    cart_count = sum(item.get('quantity', 0) for item in cart.values())
-    cart_total = sum(
-        Decimal(item.get('price', '0')) * item.get('quantity', 0)
-        for item in cart.values()
-    )
+    cart = get_cart(request)
+    cart_count = sum(item['quantity'] for item in cart.values())
+    cart_total = get_cart_total(cart)
 
     return {
         'cart_item_count': cart_count,
@@ -0,0 +1,76 @@
+"""
+Order fulfilment, shared by the payment success redirect, the Stripe
+webhook and the reconcile_orders command.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from joe_django import metrics
+from notifications.outbox import enqueue
+from reports.rollups import record_order_paid
+
+from .models import Order
+
+
+def fulfil_order(order, session, source):
+    """
+    Mark an order paid, count it in the sales rollups, grant download
+    access and queue the confirmation email, all in one transaction, so
+    an order is never left paid without its downloads or email.  The
+    conditional UPDATE makes this safe to call from the success redirect,
+    the webhook and the reconcile job at once; only the first caller
+    fulfils the order and True is returned to it.  `source` labels the
+    fulfilment in the metrics.
+    """
+    with transaction.atomic():
+        updated = Order.objects.filter(
+            pk=order.pk, is_completed=False
+        ).update(is_completed=True, status='paid')
+        if not updated:
+            return False
+        items = list(order.items.select_related('art_print'))
+        record_order_paid(order, items)
+
+        # Grant download access for logged-in users
+        if order.user and hasattr(order.user, 'profile'):
+            prints = [item.art_print for item in items if item.art_print]
+            order.user.profile.purchased_prints.add(*prints)
+
+        confirmation = _queue_order_confirmation(order, session, items)
+    order.is_completed = True
+    order.status = 'paid'
+    metrics.ORDERS_FULFILLED.labels(source).inc()
+    metrics.FULFILMENT_LAG.observe(
+        (timezone.now() - order.created_at).total_seconds()
+    )
+    metrics.ORDER_CONFIRMATIONS.labels(confirmation).inc()
+    return True
+
+
+@metrics.ORDER_CONFIRMATION_LATENCY.time()
+def _queue_order_confirmation(order, session, items):
+    """
+    Queue the order confirmation email in the notification outbox;
+    returns the outcome for the metrics.
+    """
+    recipient = None
+    if order.user and order.user.email:
+        recipient = order.user.email
+    elif hasattr(session, 'customer_details') and session.customer_details:
+        recipient = getattr(session.customer_details, 'email', None)
+    if not recipient:
+        return 'no_recipient'
+
+    enqueue(
+        'order_confirmation', recipient,
+        order_id=order.id, total=f'{order.total_amount:.2f}',
+        items=[
+            {
+                'quantity': item.quantity,
+                'title': item.art_print.title if item.art_print else 'Unknown',
+                'price': str(item.price),
+            }
+            for item in items
+        ],
+    )
+    return 'queued'
@@ -0,0 +1,153 @@
+"""
+Management command to compare cart-mutation throughput across session
+backends.
+
+Usage:
+    python manage.py bench_cart_sessions --iterations 3000 --lines 20
+
+Each iteration simulates one request: the session is loaded from its key
+(or cookie value), a cart mutation from shop.utils is applied, and the
+session is saved exactly as SessionMiddleware would.  Existing available
+prints are used as cart lines, so import or create some prints first.
+"""
+
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from gallery.models import ArtPrint
+from shop.utils import (
+    add_to_cart, encode_cart, remove_from_cart, update_cart_quantity,
+)
+
+COOKIE_LIMIT = 4096
+
+
+def _signed_size(cart):
+    """Size of the signed, compressed cookie holding just this cart."""
+    return len(SessionBase().encode({'cart': cart}))
+
+
+def _legacy_cart(cart):
+    """The same cart in the original verbose session format."""
+    return {
+        key: {'quantity': item['quantity'], 'price': item['price'],
+              'title': f'Print Title Number {key}',
+              'slug': f'print-title-number-{key}'}
+        for key, item in cart.items()
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark cart mutations against each session backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Number of simulated cart requests per backend (default: 2000)',
+        )
+        parser.add_argument(
+            '--lines',
+            type=int,
+            default=10,
+            help='Number of distinct prints cycled through the cart (default: 10)',
+        )
+        parser.add_argument(
+            '--backend',
+            action='append',
+            choices=list(settings.SESSION_ENGINES),
+            help='Only benchmark the given strategy (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        backends = options['backend'] or list(settings.SESSION_ENGINES)
+        print_ids = list(
+            ArtPrint.objects.filter(is_available=True)
+            .values_list('id', flat=True)[:options['lines']]
+        )
+
+        if not print_ids:
+            self.stderr.write(self.style.ERROR(
+                'No available prints found. Run import_prints first.'
+            ))
+            return
+
+        self.stdout.write(
+            f'{iterations} cart mutations over {len(print_ids)} prints\n'
+        )
+        self.stdout.write(
+            f'{"backend":<16}{"ops/sec":>10}{"mean ms":>10}'
+            f'{"max ms":>10}{"payload B":>12}'
+        )
+
+        for name in backends:
+            ops, mean_ms, max_ms, payload = self._run(
+                settings.SESSION_ENGINES[name], print_ids, iterations
+            )
+            self.stdout.write(
+                f'{name:<16}{ops:>10.0f}{mean_ms:>10.3f}'
+                f'{max_ms:>10.3f}{payload:>12}'
+            )
+
+        full_cart = {
+            str(10 ** 5 + i * 7919): {
+                'quantity': i % 99 + 1,
+                'price': f'{(i * 7919) % 9000 + 10}.{i * 37 % 100:02d}',
+            }
+            for i in range(settings.CART_MAX_LINES)
+        }
+        compact = _signed_size(encode_cart(full_cart))
+        legacy = _signed_size(_legacy_cart(full_cart))
+        style = self.style.SUCCESS if compact < COOKIE_LIMIT else self.style.ERROR
+        self.stdout.write('')
+        self.stdout.write(style(
+            f'Full cart ({settings.CART_MAX_LINES} lines): signed cookie '
+            f'{compact} B (limit {COOKIE_LIMIT} B), legacy format {legacy} B'
+        ))
+
+    def _run(self, engine, print_ids, iterations):
+        """Apply add/update/remove cycles and time each simulated request."""
+        store_class = import_module(engine).SessionStore
+        factory = RequestFactory()
+        session_key = None
+        timings = []
+        payload = 0
+
+        for i in range(iterations):
+            art_id = print_ids[i % len(print_ids)]
+            step = (i // len(print_ids)) % 3
+
+            start = time.perf_counter()
+            request = factory.post('/')
+            request.session = store_class(session_key)
+            if step == 0:
+                add_to_cart(request, art_id)
+            elif step == 1:
+                update_cart_quantity(request, art_id, 2)
+            else:
+                remove_from_cart(request, art_id)
+            if request.session.modified:
+                request.session.save()
+            session_key = request.session.session_key
+            timings.append(time.perf_counter() - start)
+
+            payload = max(
+                payload,
+                len(request.session.encode(dict(request.session.items()))),
+            )
+
+        store_class(session_key).delete()
+        total = sum(timings)
+        return (
+            iterations / total,
+            total / iterations * 1000,
+            max(timings) * 1000,
+            payload,
+        )
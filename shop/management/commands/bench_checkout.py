@@ -0,0 +1,222 @@
+"""
+Management command to benchmark concurrent checkout throughput in WSGI
+and ASGI modes against a local mock Stripe server.
+
+Usage:
+    python manage.py bench_checkout --requests 200 --stripe-latency 150
+
+A threaded HTTP server standing in for api.stripe.com is started with a
+fixed response delay.  create_checkout_session is then driven:
+    wsgi - through the sync test client from --workers threads, like
+           gunicorn sync workers each blocked for the whole Stripe call
+    asgi - through the async test client with --concurrency requests in
+           flight on one event loop, like a uvicorn worker
+Orders created by the benchmark are deleted afterwards.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+
+import stripe
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from gallery.models import ArtPrint
+from shop.models import Order
+from shop.utils import encode_cart
+
+SESSION_PREFIX = 'cs_bench_'
+
+
+class MockStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops bursts of concurrent connections
+    request_queue_size = 1024
+
+
+def _mock_stripe_handler(latency):
+    """Build a request handler answering checkout session calls."""
+
+    class MockStripeHandler(BaseHTTPRequestHandler):
+        def _respond(self, payload):
+            time.sleep(latency)
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self._respond({
+                'id': f'{SESSION_PREFIX}{uuid.uuid4().hex}',
+                'object': 'checkout.session',
+                'payment_status': 'unpaid',
+            })
+
+        def do_GET(self):
+            self._respond({
+                'id': self.path.rsplit('/', 1)[-1],
+                'object': 'checkout.session',
+                'payment_status': 'paid',
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockStripeHandler
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent checkout throughput against a mock Stripe'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Checkout requests per mode (default: 100)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Sync worker threads for the wsgi run (default: 4)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='In-flight requests for the asgi run (default: 50)',
+        )
+        parser.add_argument(
+            '--stripe-latency',
+            type=int,
+            default=150,
+            help='Mock Stripe response delay in ms (default: 150)',
+        )
+
+    def handle(self, *args, **options):
+        print_ids = list(
+            ArtPrint.objects.filter(is_available=True)
+            .values_list('id', flat=True)[:3]
+        )
+        if not print_ids:
+            self.stderr.write(self.style.ERROR(
+                'No available prints found. Run import_prints first.'
+            ))
+            return
+
+        server = MockStripeServer(
+            ('127.0.0.1', 0),
+            _mock_stripe_handler(options['stripe_latency'] / 1000),
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        original = (stripe.api_base, stripe.api_key)
+        stripe.api_base = f'http://127.0.0.1:{server.server_port}'
+        stripe.api_key = 'sk_test_bench'
+
+        session_key = self._cart_session(print_ids)
+        path = reverse('create_checkout_session')
+        total = options['requests']
+
+        self.stdout.write(
+            f'{total} checkouts, mock Stripe latency '
+            f'{options["stripe_latency"]} ms\n'
+        )
+        self.stdout.write(
+            f'{"mode":<26}{"req/s":>8}{"p50 ms":>9}{"p95 ms":>9}{"errors":>8}'
+        )
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                runs = [
+                    (f'wsgi ({options["workers"]} workers)',
+                     self._run_wsgi(path, session_key, total, options['workers'])),
+                    (f'asgi ({options["concurrency"]} in flight)',
+                     asyncio.run(self._run_asgi(
+                         path, session_key, total, options['concurrency']
+                     ))),
+                ]
+            for name, (elapsed, timings, errors) in runs:
+                timings.sort()
+                self.stdout.write(
+                    f'{name:<26}{len(timings) / elapsed:>8.1f}'
+                    f'{_percentile(timings, 50) * 1000:>9.1f}'
+                    f'{_percentile(timings, 95) * 1000:>9.1f}{errors:>8}'
+                )
+        finally:
+            server.shutdown()
+            stripe.api_base, stripe.api_key = original
+            Order.objects.filter(
+                stripe_session_id__startswith=SESSION_PREFIX
+            ).delete()
+
+    def _cart_session(self, print_ids):
+        """Create a session holding a small cart and return its key."""
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store['cart'] = encode_cart({
+            str(pid): {'quantity': 1, 'price': '50.00'} for pid in print_ids
+        })
+        store.save()
+        return store.session_key
+
+    def _run_wsgi(self, path, session_key, total, workers):
+        lock = threading.Lock()
+        timings = []
+        errors = [0]
+
+        def worker(count):
+            client = Client()
+            client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+            for _ in range(count):
+                start = time.perf_counter()
+                response = client.post(path)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    timings.append(elapsed)
+                    errors[0] += response.status_code != 200
+
+        threads = [
+            threading.Thread(
+                target=worker, args=(total // workers + (i < total % workers),)
+            )
+            for i in range(workers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, timings, errors[0]
+
+    async def _run_asgi(self, path, session_key, total, concurrency):
+        client = AsyncClient()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        semaphore = asyncio.Semaphore(concurrency)
+        timings = []
+        errors = 0
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path)
+                timings.append(time.perf_counter() - start)
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - start, timings, errors
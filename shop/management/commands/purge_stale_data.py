@@ -0,0 +1,88 @@
+"""
+Management command that applies the data retention policies.
+
+Usage:
+    python manage.py purge_stale_data                  # every policy, e.g. nightly
+    python manage.py purge_stale_data --policy expired_sessions
+    python manage.py purge_stale_data --batch-size 500 --pause-ms 250
+    python manage.py purge_stale_data --dry-run -v 2   # count, per batch
+
+Rows are deleted in small primary-key batches with a pause in between, so
+the command can run next to live traffic and be stopped at any time.  It
+reports rows per second both while deleting and overall (pauses
+included).  Policies and their defaults are in shop/retention.py and
+the RETENTION_* settings.
+"""
+
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.retention import POLICIES, purge
+
+
+def _rate(rows, seconds):
+    return f'{rows / seconds:,.0f}' if seconds else '-'
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned orders and expired sessions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--policy', action='append', choices=list(POLICIES),
+            help='Policy to apply; repeat for several (default: all).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.RETENTION_BATCH_SIZE,
+            help='Rows deleted per transaction (default %(default)s).',
+        )
+        parser.add_argument(
+            '--pause-ms', type=int, default=settings.RETENTION_BATCH_PAUSE_MS,
+            help='Pause between batches in ms (default %(default)s).',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Count the rows that would be deleted instead.',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if options['pause_ms'] < 0:
+            raise CommandError('--pause-ms cannot be negative.')
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        for policy in options['policy'] or POLICIES:
+            rows, batches, busy = Counter(), 0, 0.0
+            started = time.perf_counter()
+            batch_results = purge(
+                policy, options['batch_size'], options['pause_ms'],
+                options['dry_run'],
+            )
+            for deleted, seconds in batch_results:
+                rows.update(deleted)
+                batches += 1
+                busy += seconds
+                if options['verbosity'] >= 2:
+                    count = sum(deleted.values())
+                    self.stdout.write(
+                        f'{policy} batch {batches}: {count} row(s), '
+                        f'{_rate(count, seconds)} rows/s'
+                    )
+
+            total = sum(rows.values())
+            detail = ', '.join(
+                f'{count} {label}' for label, count in sorted(rows.items())
+                if count
+            )
+            summary = f'{policy}: {verb} {total} row(s)'
+            if total:
+                summary += f' ({detail}) in {batches} batch(es), '
+                if not options['dry_run']:
+                    summary += f'{_rate(total, busy)} rows/s deleting, '
+                elapsed = time.perf_counter() - started
+                summary += f'{_rate(total, elapsed)} rows/s overall'
+            self.stdout.write(self.style.SUCCESS(summary))
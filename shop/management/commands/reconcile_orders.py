@@ -0,0 +1,82 @@
+"""
+Management command that settles pending orders against Stripe.
+
+Usage:
+    python manage.py reconcile_orders                      # e.g. from cron
+    python manage.py reconcile_orders --older-than 30 --abandon-after 48
+    python manage.py reconcile_orders --dry-run
+
+Pending orders older than --older-than minutes are checked in chunks of
+--chunk-size against the Checkout Sessions Stripe lists for the same time
+window: paid ones are fulfilled (sales rollups, downloads, confirmation
+email) and those abandoned for --abandon-after hours are expired.  Each
+order is settled on its own, so the command can be stopped and rerun.
+See shop/reconcile.py.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+import stripe
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.reconcile import reconcile_pending
+
+
+class Command(BaseCommand):
+    help = 'Fulfil paid and expire abandoned pending orders using Stripe'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=60,
+            help='Only orders pending for this many minutes (default 60).',
+        )
+        parser.add_argument(
+            '--abandon-after', type=int, default=24,
+            help='Hours after which unpaid orders are expired (default 24).',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Orders checked per chunk (default 200).',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would be done without changing anything.',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        if options['abandon_after'] * 60 < options['older_than']:
+            raise CommandError('--abandon-after is shorter than --older-than.')
+
+        total, outcomes = 0, Counter()
+        chunks = reconcile_pending(
+            older_than=timedelta(minutes=options['older_than']),
+            abandon_after=timedelta(hours=options['abandon_after']),
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        try:
+            for count, chunk_outcomes in chunks:
+                total += count
+                outcomes.update(chunk_outcomes)
+                self.stdout.write(
+                    f'{count} order(s): {self._summary(chunk_outcomes)}'
+                )
+        except stripe.error.StripeError as e:
+            raise CommandError(
+                f'Stripe error after {total} order(s): {e}'
+            ) from e
+
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Reconciled {total} pending order(s) '
+            f'({self._summary(outcomes) or "nothing to do"})'
+        ))
+
+    @staticmethod
+    def _summary(outcomes):
+        return ', '.join(
+            f'{count} {outcome}' for outcome, count in sorted(outcomes.items())
+        )
@@ -20,6 +20,13 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='order_created_idx'),
+            models.Index(
+                fields=['status', '-created_at'],
+                name='order_status_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} – {self.status}"
@@ -0,0 +1,176 @@
+"""
+Reconciliation of pending orders against Stripe.
+
+An order is fulfilled by the success redirect or the webhook; when the
+customer never comes back and the webhook is lost it would stay 'pending'
+for ever.  reconcile_pending() walks the pending orders older than a grace
+period in chunks, oldest first, and lists the Checkout Sessions Stripe
+created in each chunk's time window with the paginated list endpoint, so
+a chunk of orders usually costs a page or two of API calls instead of one
+call per order.  The window also holds the sessions of paid orders, so
+listing stops once it has cost as many calls as sessions are still
+missing, and those are retrieved one by one; a chunk never costs more than
+twice the calls of retrieving every session.
+
+    paid session                 fulfilled, as the webhook would have
+    expired session              order marked 'expired'
+    open, older than abandon     session expired at Stripe, order 'expired'
+    unknown to Stripe, ditto     order marked 'expired'
+
+Everything else is left pending for a later run.  Both the fulfilment and
+the expiry are conditional updates, so a webhook arriving mid-run is safe.
+
+`sessions` is the Stripe API used, stripe.checkout.Session by default; any
+object with the same list/retrieve/expire methods can stand in for it.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from joe_django.instrumentation import external_call
+
+from .fulfilment import fulfil_order
+from .models import Order
+
+stripe.api_key = settings.STRIPE_SECRET_KEY
+if settings.STRIPE_API_BASE:
+    stripe.api_base = settings.STRIPE_API_BASE
+logger = logging.getLogger(__name__)
+
+# Stripe's maximum page size for list endpoints
+STRIPE_PAGE_SIZE = 100
+# The order row is saved after Stripe answers, so a session is created up
+# to a Stripe timeout before its order
+SESSION_CREATED_SLACK = timedelta(minutes=5)
+
+
+def _list_pages(sessions, start, end):
+    """Yield pages of the Checkout Sessions created between start and end."""
+    params = {
+        'created': {
+            'gte': int(start.timestamp()), 'lte': int(end.timestamp()) + 1,
+        },
+        'limit': STRIPE_PAGE_SIZE,
+    }
+    while True:
+        with external_call('stripe'):
+            page = sessions.list(**params)
+        yield page.data
+        if not page.has_more or not page.data:
+            return
+        params['starting_after'] = page.data[-1].id
+
+
+def _retrieve_session(sessions, session_id):
+    """The session, or None when Stripe has no such session."""
+    try:
+        with external_call('stripe'):
+            return sessions.retrieve(session_id)
+    except stripe.error.InvalidRequestError as e:
+        if e.code == 'resource_missing':
+            return None
+        raise
+
+
+def _match_sessions(chunk, sessions):
+    """The Stripe session of each order in the chunk (None if not found)."""
+    wanted = {
+        order.stripe_session_id for order in chunk if order.stripe_session_id
+    }
+    found = {}
+    if wanted:
+        start = chunk[0].created_at - SESSION_CREATED_SLACK
+        pages = _list_pages(sessions, start, chunk[-1].created_at)
+        for calls, page in enumerate(pages, 1):
+            for session in page:
+                if session.id in wanted:
+                    found[session.id] = session
+            # A page costs one call, as does retrieving one session
+            if calls >= len(wanted) - len(found):
+                break
+        for session_id in wanted - found.keys():
+            found[session_id] = _retrieve_session(sessions, session_id)
+    return [(order, found.get(order.stripe_session_id)) for order in chunk]
+
+
+def _expire_order(order):
+    return Order.objects.filter(
+        pk=order.pk, status='pending', is_completed=False
+    ).update(status='expired')
+
+
+def _reconcile_order(order, session, abandon_before, sessions, dry_run):
+    """Act on one order and return the outcome to count."""
+    abandoned = order.created_at < abandon_before
+    if session is None:
+        if not abandoned:
+            return 'unresolved'
+        if not dry_run and not _expire_order(order):
+            return 'already_handled'
+        return 'missing'
+
+    if session.payment_status in ('paid', 'no_payment_required'):
+        if not dry_run and not fulfil_order(order, session, 'reconcile'):
+            return 'already_handled'
+        return 'fulfilled'
+
+    if session.status == 'open':
+        if not abandoned:
+            return 'unresolved'
+        if not dry_run:
+            # Raises if the customer has just paid; the next run fulfils it
+            with external_call('stripe'):
+                sessions.expire(session.id)
+    elif session.status != 'expired':
+        # 'complete' but not yet paid, e.g. a delayed payment method
+        return 'unresolved'
+
+    if not dry_run and not _expire_order(order):
+        return 'already_handled'
+    return 'expired'
+
+
+def reconcile_pending(older_than, abandon_after, chunk_size=200,
+                      dry_run=False, sessions=None):
+    """
+    Reconcile pending orders created more than `older_than` ago, treating
+    those older than `abandon_after` as abandoned.  Yields the number of
+    orders and a Counter of outcomes for each chunk.
+    """
+    sessions = sessions or stripe.checkout.Session
+    now = timezone.now()
+    abandon_before = now - abandon_after
+    pending = Order.objects.filter(
+        status='pending', is_completed=False, created_at__lt=now - older_than,
+    ).select_related('user').order_by('created_at', 'id')
+
+    last = None
+    while True:
+        chunk = pending
+        if last is not None:
+            # Keyset pagination: orders left pending are not seen twice
+            chunk = chunk.filter(
+                Q(created_at__gt=last.created_at)
+                | Q(created_at=last.created_at, id__gt=last.id)
+            )
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        last = chunk[-1]
+
+        outcomes = Counter()
+        for order, session in _match_sessions(chunk, sessions):
+            try:
+                outcome = _reconcile_order(
+                    order, session, abandon_before, sessions, dry_run
+                )
+            except stripe.error.StripeError as e:
+                logger.error(f'Reconcile: order {order.id} failed: {e}')
+                outcome = 'error'
+            outcomes[outcome] += 1
+        yield len(chunk), outcomes
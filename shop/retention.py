@@ -0,0 +1,86 @@
+"""
+Data retention: batched deletion of rows the shop no longer needs.
+
+Every checkout attempt creates an Order and every visitor with a cart gets
+a django_session row, so without pruning both tables (and the indexes the
+hot paths use) grow for ever.  Each entry in POLICIES returns the rows it
+would delete; purge() removes them in primary-key order:
+
+    1. read the next RETENTION_BATCH_SIZE keys past the last batch
+    2. delete the policy's rows between the first and last of them,
+       cascading to related rows (an order's items)
+    3. pause RETENTION_BATCH_PAUSE_MS, so other writers get the locks
+
+Each batch is its own short transaction, and the policy filter is applied
+again in step 2, so a row that stopped matching in between (an order paid
+meanwhile) is kept.  Stopping and rerunning is always safe.
+
+The sales rollups keep counting purged orders: rebuilding days older
+than RETENTION_ORDER_DAYS (reports.rollups.rebuild_rollups) keeps their
+existing orders_created rather than recounting what is left.
+"""
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .models import Order
+
+
+def abandoned_orders(now):
+    """Unpaid orders older than RETENTION_ORDER_DAYS."""
+    return Order.objects.filter(
+        is_completed=False,
+        status__in=('pending', 'expired'),
+        created_at__lt=now - timedelta(days=settings.RETENTION_ORDER_DAYS),
+    )
+
+
+def expired_sessions(now):
+    """Sessions more than RETENTION_SESSION_DAYS past their expiry."""
+    return Session.objects.filter(
+        expire_date__lt=now - timedelta(days=settings.RETENTION_SESSION_DAYS)
+    )
+
+
+POLICIES = {
+    'abandoned_orders': abandoned_orders,
+    'expired_sessions': expired_sessions,
+}
+
+
+def purge(policy, batch_size=None, pause_ms=None, dry_run=False):
+    """
+    Delete the rows matched by POLICIES[policy] in batches.  Yields a
+    Counter of rows deleted per model and the seconds spent deleting, for
+    each batch; with dry_run, the rows that would be deleted.
+    """
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    if pause_ms is None:
+        pause_ms = settings.RETENTION_BATCH_PAUSE_MS
+    queryset = POLICIES[policy](timezone.now())
+    label = queryset.model._meta.label
+
+    last = None
+    while True:
+        keys = queryset.order_by('pk')
+        if last is not None:
+            keys = keys.filter(pk__gt=last)
+            time.sleep(pause_ms / 1000)
+        keys = list(keys.values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return
+        last = keys[-1]
+
+        started = time.perf_counter()
+        if dry_run:
+            deleted = {label: len(keys)}
+        else:
+            # delete() runs the cascade in one transaction per batch
+            _, deleted = queryset.filter(
+                pk__gte=keys[0], pk__lte=keys[-1]
+            ).delete()
+        yield Counter(deleted), time.perf_counter() - started
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import tempfile
+import zipfile
+from collections import Counter
+from datetime import timedelta
+from io import BytesIO
+from types import SimpleNamespace
 
-# Create your tests here.
+import stripe
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from gallery.models import ArtPrint, Category
+from notifications.models import Notification
+
+from .models import Order, OrderItem
+from .reconcile import STRIPE_PAGE_SIZE, reconcile_pending
+from .utils import CART_SESSION_ID, decode_cart, encode_cart, get_cart
+
+
+def _session(session_id, payment_status='unpaid', status='open'):
+    return SimpleNamespace(
+        id=session_id, object='checkout.session',
+        payment_status=payment_status, status=status, customer_details=None,
+    )
+
+
+class FakeSessions:
+    """
+    Stands in for stripe.checkout.Session.  list() returns `others`
+    (sessions of unrelated orders) before the known sessions, a page of
+    `limit` at a time.
+    """
+
+    def __init__(self, sessions=(), others=0, listed=True, on_list=None):
+        self.sessions = {session.id: session for session in sessions}
+        self.listing = [_session(f'cs_other_{i}') for i in range(others)]
+        if listed:
+            self.listing += list(self.sessions.values())
+        self.on_list = on_list
+        self.list_calls = 0
+        self.retrieved = []
+        self.expired = []
+
+    def list(self, created, limit, starting_after=None):
+        self.list_calls += 1
+        if self.on_list:
+            self.on_list()
+        start = 0
+        if starting_after:
+            ids = [session.id for session in self.listing]
+            start = ids.index(starting_after) + 1
+        page = self.listing[start:start + limit]
+        return SimpleNamespace(
+            data=page, has_more=start + limit < len(self.listing)
+        )
+
+    def retrieve(self, session_id):
+        self.retrieved.append(session_id)
+        if session_id not in self.sessions:
+            raise stripe.error.InvalidRequestError(
+                'No such checkout.session', 'id', code='resource_missing',
+            )
+        return self.sessions[session_id]
+
+    def expire(self, session_id):
+        self.expired.append(session_id)
+        self.sessions[session_id].status = 'expired'
+
+
+class ReconcileTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'buyer', 'buyer@example.com', 'password'
+        )
+        category = Category.objects.create(name='Neon')
+        cls.art = ArtPrint.objects.create(
+            title='Glow', description='A print.', image='prints/glow.jpg',
+            category=category, price=30,
+        )
+
+    def order(self, session_id, hours_old=2):
+        order = Order.objects.create(
+            user=self.user, stripe_session_id=session_id, total_amount=30,
+        )
+        OrderItem.objects.create(order=order, art_print=self.art, price=30)
+        Order.objects.filter(pk=order.pk).update(
+            created_at=timezone.now() - timedelta(hours=hours_old)
+        )
+        return order
+
+    def reconcile(self, sessions, **kwargs):
+        outcomes = Counter()
+        for _, chunk_outcomes in reconcile_pending(
+            timedelta(hours=1), timedelta(hours=24), sessions=sessions,
+            **kwargs,
+        ):
+            outcomes.update(chunk_outcomes)
+        return outcomes
+
+    def test_paid_order_is_fulfilled(self):
+        order = self.order('cs_paid')
+        sessions = FakeSessions([_session('cs_paid', 'paid', 'complete')])
+
+        self.assertEqual(self.reconcile(sessions), {'fulfilled': 1})
+        order.refresh_from_db()
+        self.assertTrue(order.is_completed)
+        self.assertEqual(order.status, 'paid')
+        self.assertTrue(
+            self.user.profile.purchased_prints.filter(pk=self.art.pk).exists()
+        )
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(sessions.retrieved, [])
+
+    def test_expired_session_expires_order(self):
+        order = self.order('cs_expired')
+        sessions = FakeSessions([_session('cs_expired', status='expired')])
+
+        self.assertEqual(self.reconcile(sessions), {'expired': 1})
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'expired')
+        self.assertFalse(order.is_completed)
+
+    def test_open_session_is_expired_once_abandoned(self):
+        recent = self.order('cs_open_recent', hours_old=2)
+        abandoned = self.order('cs_open_old', hours_old=30)
+        sessions = FakeSessions([
+            _session('cs_open_recent'), _session('cs_open_old'),
+        ])
+
+        self.assertEqual(
+            self.reconcile(sessions), {'unresolved': 1, 'expired': 1}
+        )
+        self.assertEqual(sessions.expired, ['cs_open_old'])
+        recent.refresh_from_db()
+        abandoned.refresh_from_db()
+        self.assertEqual(recent.status, 'pending')
+        self.assertEqual(abandoned.status, 'expired')
+
+    def test_missing_session(self):
+        recent = self.order('cs_gone_recent', hours_old=2)
+        abandoned = self.order('cs_gone_old', hours_old=30)
+        sessions = FakeSessions()
+
+        self.assertEqual(
+            self.reconcile(sessions), {'unresolved': 1, 'missing': 1}
+        )
+        self.assertCountEqual(
+            sessions.retrieved, ['cs_gone_recent', 'cs_gone_old']
+        )
+        recent.refresh_from_db()
+        abandoned.refresh_from_db()
+        self.assertEqual(recent.status, 'pending')
+        self.assertEqual(abandoned.status, 'expired')
+
+    def test_order_fulfilled_by_webhook_mid_run(self):
+        order = self.order('cs_raced')
+
+        def webhook_arrives():
+            Order.objects.filter(pk=order.pk).update(
+                is_completed=True, status='paid'
+            )
+
+        sessions = FakeSessions(
+            [_session('cs_raced', 'paid', 'complete')], on_list=webhook_arrives,
+        )
+        self.assertEqual(self.reconcile(sessions), {'already_handled': 1})
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_dry_run_changes_nothing(self):
+        paid = self.order('cs_paid')
+        abandoned = self.order('cs_open_old', hours_old=30)
+        sessions = FakeSessions([
+            _session('cs_paid', 'paid', 'complete'), _session('cs_open_old'),
+        ])
+
+        self.assertEqual(
+            self.reconcile(sessions, dry_run=True),
+            {'fulfilled': 1, 'expired': 1},
+        )
+        self.assertEqual(sessions.expired, [])
+        self.assertEqual(
+            set(Order.objects.filter(pk__in=[paid.pk, abandoned.pk])
+                .values_list('status', flat=True)),
+            {'pending'},
+        )
+
+    def test_listing_stops_at_the_missing_sessions_count(self):
+        self.order('cs_a')
+        self.order('cs_b')
+        sessions = FakeSessions(
+            [_session('cs_a', status='expired'),
+             _session('cs_b', status='expired')],
+            others=STRIPE_PAGE_SIZE * 10,
+        )
+
+        self.assertEqual(self.reconcile(sessions), {'expired': 2})
+        # Two pages cost as much as retrieving both sessions, so listing
+        # gives up there rather than walking all eleven pages
+        self.assertEqual(sessions.list_calls, 2)
+        self.assertCountEqual(sessions.retrieved, ['cs_a', 'cs_b'])
+
+    def test_listing_stops_when_everything_is_found(self):
+        for n in range(3):
+            self.order(f'cs_{n}')
+        sessions = FakeSessions(
+            [_session(f'cs_{n}', status='expired') for n in range(3)],
+            others=STRIPE_PAGE_SIZE - 3,
+        )
+        sessions.listing += [
+            _session(f'cs_later_{i}') for i in range(STRIPE_PAGE_SIZE * 5)
+        ]
+
+        self.assertEqual(self.reconcile(sessions), {'expired': 3})
+        self.assertEqual(sessions.list_calls, 1)
+        self.assertEqual(sessions.retrieved, [])
+
+
+class CartEncodingTests(TestCase):
+
+    def test_encode_decode_round_trip(self):
+        cart = {
+            '3': {'quantity': 2, 'price': '30.00'},
+            '7': {'quantity': 1, 'price': '125.50'},
+        }
+        encoded = encode_cart(cart)
+        self.assertEqual(encoded, {'3': [2, '30.00'], '7': [1, '125.50']})
+        self.assertEqual(decode_cart(encoded), cart)
+
+    def test_decodes_carts_stored_before_the_compact_form(self):
+        self.assertEqual(
+            decode_cart({'3': {'quantity': '2', 'price': '30.00'}}),
+            {'3': {'quantity': 2, 'price': '30.00'}},
+        )
+
+
+@override_settings(CART_MAX_LINES=3)
+class CartTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Neon')
+        cls.prints = [
+            ArtPrint.objects.create(
+                title=f'Glow {n}', description='A print.', category=category,
+                price=30 + n, image=f'prints/glow-{n}.jpg',
+            )
+            for n in range(5)
+        ]
+
+    def add(self, art, quantity=1):
+        return self.client.post(
+            reverse('add_to_cart', args=[art.pk]), {'quantity': quantity},
+        )
+
+    def cart(self):
+        return decode_cart(self.client.session.get(CART_SESSION_ID, {}))
+
+    def test_session_holds_the_compact_form(self):
+        self.add(self.prints[0], 2)
+        self.assertEqual(
+            self.client.session[CART_SESSION_ID],
+            {str(self.prints[0].pk): [2, '30.00']},
+        )
+
+    def test_cart_is_capped_at_max_lines(self):
+        for art in self.prints[:3]:
+            self.add(art)
+        response = self.add(self.prints[3])
+        self.assertEqual(len(self.cart()), 3)
+        self.assertNotIn(str(self.prints[3].pk), self.cart())
+        message = list(response.wsgi_request._messages)[-1]
+        self.assertTrue(str(message).startswith('Your cart is full'))
+
+        # Lines already in a full cart can still be topped up
+        self.add(self.prints[0], 2)
+        self.assertEqual(self.cart()[str(self.prints[0].pk)]['quantity'], 3)
+
+    def test_unavailable_print_is_not_added(self):
+        ArtPrint.objects.filter(pk=self.prints[0].pk).update(
+            is_available=False
+        )
+        self.add(self.prints[0])
+        self.assertEqual(self.cart(), {})
+
+    def test_viewing_the_cart_does_not_write_the_session(self):
+        self.add(self.prints[0])
+        request = self.client.get(reverse('cart_detail')).wsgi_request
+        self.assertFalse(request.session.modified)
+        self.assertEqual(len(get_cart(request)), 1)
+
+
+class BundleTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(MEDIA_ROOT=directory))
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='password')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Neon')
+        self.files = {}
+        self.prints = []
+        for n, color in enumerate(('red', 'green', 'blue')):
+            buffer = BytesIO()
+            Image.new('RGB', (8, 8), color).save(buffer, 'JPEG')
+            name = default_storage.save(
+                f'prints/glow-{n}.jpg', ContentFile(buffer.getvalue()),
+            )
+            art = ArtPrint.objects.create(
+                title=f'Glow {n}', description='A print.', category=category,
+                price=30, image=name,
+            )
+            self.files[f'{art.slug}-highres.jpg'] = buffer.getvalue()
+            self.prints.append(art)
+
+    def buy(self, prints, user=None, paid=True):
+        user = user or self.user
+        order = Order.objects.create(
+            user=user, total_amount=30 * len(prints), is_completed=paid,
+            status='paid' if paid else 'pending',
+        )
+        for art in prints:
+            OrderItem.objects.create(order=order, art_print=art, price=30)
+        if paid:
+            user.profile.purchased_prints.add(*prints)
+        return order
+
+    def download(self, url):
+        response = self.client.get(url)
+        if response.status_code != 200:
+            return response, None
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        return response, {
+            name: archive.read(name) for name in archive.namelist()
+        }
+
+    def test_bundle_holds_every_purchased_print(self):
+        self.buy(self.prints[:2])
+        self.buy(self.prints[2:])
+        response, files = self.download(reverse('download_bundle'))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('joe-django-prints.zip', response['Content-Disposition'])
+        self.assertEqual(files, self.files)
+
+    def test_order_bundle_holds_only_that_order(self):
+        order = self.buy(self.prints[:1])
+        self.buy(self.prints[1:])
+        response, files = self.download(
+            reverse('download_order_bundle', args=[order.pk])
+        )
+        self.assertIn(f'order-{order.pk}-prints.zip',
+                      response['Content-Disposition'])
+        self.assertEqual(list(files), [f'{self.prints[0].slug}-highres.jpg'])
+
+    def test_missing_file_is_left_out(self):
+        self.buy(self.prints)
+        default_storage.delete(self.prints[1].image.name)
+        with self.assertLogs('shop.bundles', 'WARNING'):
+            _, files = self.download(reverse('download_bundle'))
+        self.assertEqual(len(files), 2)
+        self.assertNotIn(f'{self.prints[1].slug}-highres.jpg', files)
+
+    def test_nothing_purchased(self):
+        response, _ = self.download(reverse('download_bundle'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_unpaid_order(self):
+        order = self.buy(self.prints[:1], paid=False)
+        response, _ = self.download(
+            reverse('download_order_bundle', args=[order.pk])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_someone_elses_order(self):
+        other = User.objects.create_user('other', password='password')
+        order = self.buy(self.prints[:1], user=other)
+        # Owning the same print doesn't open another customer's order
+        self.buy(self.prints[:1])
+        response, _ = self.download(
+            reverse('download_order_bundle', args=[order.pk])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_login_required(self):
+        self.buy(self.prints)
+        self.client.logout()
+        response, _ = self.download(reverse('download_bundle'))
+        self.assertEqual(response.status_code, 302)
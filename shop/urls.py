@@ -11,4 +11,6 @@ urlpatterns = [
     path('cancel/', views.payment_cancel, name='payment_cancel'),
     path('webhook/', views.stripe_webhook, name='stripe_webhook'),
     path('download/<int:art_id>/', views.download_print, name='download_print'),
+    path('download/all/', views.download_bundle, name='download_bundle'),
+    path('orders/<int:order_id>/download/', views.download_bundle, name='download_order_bundle'),
 ]
@@ -1,25 +1,71 @@
 """
 Session-based cart utilities for the shop app.
-Cart format in session: { artprint_id_str: {'quantity': int, 'price': str, 'title': str} }
+
+The cart is stored in the session in a compact form so that it stays well
+under the 4 KB cookie limit when SESSION_STRATEGY is 'signed_cookies':
+    { artprint_id_str: [quantity, price_str] }
+
+get_cart() always returns the expanded form used by views and templates:
+    { artprint_id_str: {'quantity': int, 'price': str} }
 """
 from decimal import Decimal
+
+from django.conf import settings
+
 from gallery.models import ArtPrint
 
 CART_SESSION_ID = 'cart'
 
 
-def get_cart(request):
-    """Returns the cart from session or creates an empty one."""
-    cart = request.session.get(CART_SESSION_ID)
-    if not cart:
-        cart = {}
-        request.session[CART_SESSION_ID] = cart
+def decode_cart(raw):
+    """Expand a stored cart into {id: {'quantity', 'price'}} dicts."""
+    cart = {}
+    for key, value in raw.items():
+        if isinstance(value, dict):
+            # Carts written before the compact encoding was introduced
+            cart[key] = {
+                'quantity': int(value['quantity']),
+                'price': value['price'],
+            }
+        else:
+            quantity, price = value
+            cart[key] = {'quantity': quantity, 'price': price}
     return cart
 
 
+def encode_cart(cart):
+    """Pack an expanded cart into the compact session representation."""
+    return {
+        key: [item['quantity'], item['price']]
+        for key, item in cart.items()
+    }
+
+
+def get_cart(request):
+    """
+    Returns the cart from session, or an empty dict.
+    Reading never marks the session as modified, so browsing pages
+    does not cause a session write.
+    """
+    return decode_cart(request.session.get(CART_SESSION_ID, {}))
+
+
+async def aget_cart(request):
+    """Async version of get_cart() for async views."""
+    return decode_cart(await request.session.aget(CART_SESSION_ID, {}))
+
+
+def save_cart(request, cart):
+    """Write the cart back to session, dropping the key when it is empty."""
+    if cart:
+        request.session[CART_SESSION_ID] = encode_cart(cart)
+    elif CART_SESSION_ID in request.session:
+        del request.session[CART_SESSION_ID]
+
+
 def add_to_cart(request, artprint_id, quantity=1):
     """Add an ArtPrint to the cart or increment its quantity."""
-    art = ArtPrint.objects.get(id=artprint_id)
+    art = ArtPrint.objects.only('price', 'is_available').get(id=artprint_id)
     if not art.is_available:
         raise ValueError("This print is no longer available.")
 
@@ -29,13 +75,12 @@ def add_to_cart(request, artprint_id, quantity=1):
     if key in cart:
         cart[key]['quantity'] += quantity
     else:
-        cart[key] = {
-            'quantity': quantity,
-            'price': str(art.price),
-            'title': art.title,
-            'slug': art.slug,
-        }
-    request.session.modified = True
+        if len(cart) >= settings.CART_MAX_LINES:
+            raise ValueError(
+                "Your cart is full. Please check out or remove an item first."
+            )
+        cart[key] = {'quantity': quantity, 'price': str(art.price)}
+    save_cart(request, cart)
 
 
 def remove_from_cart(request, artprint_id):
@@ -44,7 +89,7 @@ def remove_from_cart(request, artprint_id):
     key = str(artprint_id)
     if key in cart:
         del cart[key]
-        request.session.modified = True
+        save_cart(request, cart)
 
 
 def update_cart_quantity(request, artprint_id, quantity):
@@ -54,9 +99,9 @@ def update_cart_quantity(request, artprint_id, quantity):
         return
     cart = get_cart(request)
     key = str(artprint_id)
-    if key in cart:
+    if key in cart and cart[key]['quantity'] != int(quantity):
         cart[key]['quantity'] = int(quantity)
-        request.session.modified = True
+        save_cart(request, cart)
 
 
 def get_cart_total(cart):
@@ -71,4 +116,9 @@ def clear_cart(request):
     """Remove the entire cart from session."""
     if CART_SESSION_ID in request.session:
         del request.session[CART_SESSION_ID]
-        request.session.modified = True
+
+
+async def aclear_cart(request):
+    """Async version of clear_cart() for async views."""
+    if await request.session.ahas_key(CART_SESSION_ID):
+        await request.session.apop(CART_SESSION_ID)
@@ -2,11 +2,15 @@ import logging
 from decimal import Decimal
 
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -14,41 +18,61 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
 from gallery.models import ArtPrint
+from joe_django import metrics
+from joe_django.instrumentation import external_call
+from joe_django.storage import serve_file
+from joe_django.streaming import aiterate
+from reports.rollups import record_order_created
+from .bundles import bundle_prints, print_filename
+from .fulfilment import fulfil_order
 from .models import Order, OrderItem
 from .utils import (
-    add_to_cart, clear_cart, get_cart, get_cart_total,
-    remove_from_cart, update_cart_quantity,
+    aclear_cart, add_to_cart, aget_cart, get_cart, remove_from_cart,
+    save_cart, update_cart_quantity,
 )
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+if settings.STRIPE_API_BASE:
+    stripe.api_base = settings.STRIPE_API_BASE
 logger = logging.getLogger(__name__)
 
 
-def cart_detail(request):
-    """Display the shopping cart with all items and totals."""
+def _cart_items(request):
+    """
+    Build the cart rows and total, loading every print in one query.
+    Lines for prints that no longer exist are dropped from the session.
+    """
     cart = get_cart(request)
+    prints = ArtPrint.objects.in_bulk([int(pid) for pid in cart])
     cart_items = []
     total = Decimal('0.00')
 
     stale_keys = []
     for pid, data in cart.items():
-        try:
-            art = ArtPrint.objects.get(id=pid)
-            item_total = Decimal(data['price']) * data['quantity']
-            total += item_total
-            cart_items.append({
-                'art': art,
-                'quantity': data['quantity'],
-                'item_total': item_total,
-            })
-        except ArtPrint.DoesNotExist:
+        art = prints.get(int(pid))
+        if art is None:
             stale_keys.append(pid)
+            continue
+        item_total = Decimal(data['price']) * data['quantity']
+        total += item_total
+        cart_items.append({
+            'art': art,
+            'quantity': data['quantity'],
+            'item_total': item_total,
+        })
 
     # Clean stale items
-    for key in stale_keys:
-        del cart[key]
-        request.session.modified = True
+    if stale_keys:
+        for key in stale_keys:
+            del cart[key]
+        save_cart(request, cart)
+
+    return cart_items, total
+
 
+def cart_detail(request):
+    """Display the shopping cart with all items and totals."""
+    cart_items, total = _cart_items(request)
     context = {
         'cart_items': cart_items,
         'total': total,
@@ -62,6 +86,7 @@ def add_to_cart_view(request, pk):
     quantity = int(request.POST.get('quantity', 1))
     try:
         add_to_cart(request, pk, quantity)
+        metrics.CART_CHANGES.labels('add').inc()
         messages.success(request, 'Item added to cart!')
     except Exception as e:
         messages.error(request, str(e))
@@ -72,6 +97,7 @@ def add_to_cart_view(request, pk):
 def remove_from_cart_view(request, pk):
     """Remove an art print from the cart."""
     remove_from_cart(request, pk)
+    metrics.CART_CHANGES.labels('remove').inc()
     messages.info(request, 'Item removed from cart.')
 
     # Support HTMX partial update
@@ -85,6 +111,7 @@ def update_cart_item(request, pk):
     """Update quantity of a cart item (supports HTMX)."""
     quantity = int(request.POST.get('quantity', 1))
     update_cart_quantity(request, pk, quantity)
+    metrics.CART_CHANGES.labels('update').inc()
 
     if request.headers.get('HX-Request'):
         return _render_cart_partial(request)
@@ -93,23 +120,7 @@ def update_cart_item(request, pk):
 
 def _render_cart_partial(request):
     """Re-render just the cart table body for HTMX swap."""
-    cart = get_cart(request)
-    cart_items = []
-    total = Decimal('0.00')
-
-    for pid, data in cart.items():
-        try:
-            art = ArtPrint.objects.get(id=pid)
-            item_total = Decimal(data['price']) * data['quantity']
-            total += item_total
-            cart_items.append({
-                'art': art,
-                'quantity': data['quantity'],
-                'item_total': item_total,
-            })
-        except ArtPrint.DoesNotExist:
-            pass
-
+    cart_items, total = _cart_items(request)
     html = render_to_string(
         'shop/includes/cart_table.html',
         {'cart_items': cart_items, 'total': total},
@@ -119,17 +130,28 @@ def _render_cart_partial(request):
 
 
 @require_POST
-def create_checkout_session(request):
-    """Create a Stripe Checkout Session and return session ID as JSON."""
-    cart = get_cart(request)
+async def create_checkout_session(request):
+    """
+    Create a Stripe Checkout Session and return session ID as JSON.
+    Async so that, under ASGI, waiting on Stripe does not hold a worker.
+    """
+    cart = await aget_cart(request)
     if not cart:
+        metrics.CHECKOUT_SESSIONS.labels('empty_cart').inc()
         return JsonResponse({'error': 'Your cart is empty.'}, status=400)
 
+    prints = await ArtPrint.objects.only(
+        'title', 'description'
+    ).ain_bulk([int(pid) for pid in cart])
+    if len(prints) != len(cart):
+        metrics.CHECKOUT_SESSIONS.labels('stale_cart').inc()
+        raise Http404('A print in your cart no longer exists.')
+
     line_items = []
     total = Decimal('0.00')
 
     for pid, data in cart.items():
-        art = get_object_or_404(ArtPrint, id=pid)
+        art = prints[int(pid)]
         price_cents = int(Decimal(data['price']) * 100)
         line_items.append({
             'price_data': {
@@ -146,70 +168,62 @@ def create_checkout_session(request):
         total += Decimal(data['price']) * data['quantity']
 
     try:
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=line_items,
-            mode='payment',
-            success_url=request.build_absolute_uri(
-                reverse('payment_success')
-            ) + '?session_id={CHECKOUT_SESSION_ID}',
-            cancel_url=request.build_absolute_uri(reverse('cart_detail')),
-            metadata={'cart_total': str(total)},
-        )
+        with external_call('stripe'):
+            checkout_session = await stripe.checkout.Session.create_async(
+                payment_method_types=['card'],
+                line_items=line_items,
+                mode='payment',
+                success_url=request.build_absolute_uri(
+                    reverse('payment_success')
+                ) + '?session_id={CHECKOUT_SESSION_ID}',
+                cancel_url=request.build_absolute_uri(reverse('cart_detail')),
+                metadata={'cart_total': str(total)},
+            )
 
         # Create pending order
-        order = Order.objects.create(
-            user=request.user if request.user.is_authenticated else None,
+        user = await request.auser()
+        order = await Order.objects.acreate(
+            user=user if user.is_authenticated else None,
             stripe_session_id=checkout_session.id,
             total_amount=total,
         )
-
-        for pid, data in cart.items():
-            try:
-                art = ArtPrint.objects.get(id=pid)
-                OrderItem.objects.create(
-                    order=order,
-                    art_print=art,
-                    quantity=data['quantity'],
-                    price=Decimal(data['price']),
-                )
-            except ArtPrint.DoesNotExist:
-                pass
+        await OrderItem.objects.abulk_create([
+            OrderItem(
+                order=order,
+                art_print=prints[int(pid)],
+                quantity=data['quantity'],
+                price=Decimal(data['price']),
+            )
+            for pid, data in cart.items()
+        ])
+        await sync_to_async(record_order_created)(order)
+        metrics.CHECKOUT_SESSIONS.labels('created').inc()
 
         return JsonResponse({'id': checkout_session.id})
 
     except Exception as e:
+        metrics.CHECKOUT_SESSIONS.labels('error').inc()
         logger.error(f'Stripe checkout error: {e}')
         return JsonResponse({'error': str(e)}, status=400)
 
 
-def payment_success(request):
+async def payment_success(request):
     """Handle successful Stripe payment redirect."""
     session_id = request.GET.get('session_id')
     if session_id:
         try:
-            session = stripe.checkout.Session.retrieve(session_id)
+            with external_call('stripe'):
+                session = await stripe.checkout.Session.retrieve_async(
+                    session_id
+                )
             if session.payment_status == 'paid':
-                order = Order.objects.filter(
+                order = await Order.objects.filter(
                     stripe_session_id=session_id
-                ).first()
-                if order and not order.is_completed:
-                    order.is_completed = True
-                    order.status = 'paid'
-                    order.save()
-                    clear_cart(request)
-
-                    # Grant download access for logged-in users
-                    if order.user and hasattr(order.user, 'profile'):
-                        for item in order.items.select_related('art_print').all():
-                            if item.art_print:
-                                order.user.profile.purchased_prints.add(
-                                    item.art_print
-                                )
-
-                    # Send confirmation email
-                    _send_order_confirmation(order, session)
-
+                ).afirst()
+                if order and await sync_to_async(fulfil_order)(
+                    order, session, 'redirect'
+                ):
+                    await aclear_cart(request)
                     messages.success(
                         request,
                         'Payment successful! Your order is confirmed.'
@@ -221,7 +235,8 @@ def payment_success(request):
                 'There was an issue verifying your payment.'
             )
 
-    return render(request, 'shop/payment_success.html')
+    # Template rendering touches the lazy request.user, which is sync-only
+    return await sync_to_async(render)(request, 'shop/payment_success.html')
 
 
 def payment_cancel(request):
@@ -230,42 +245,6 @@ def payment_cancel(request):
     return redirect('cart_detail')
 
 
-def _send_order_confirmation(order, session):
-    """Send order confirmation email after successful payment."""
-    subject = 'Joe Django Art Emporium - Order Confirmation'
-    message = (
-        f'Thank you for your purchase!\n\n'
-        f'Order #{order.id}\n'
-        f'Total: \u20ac{order.total_amount:.2f}\n\n'
-        f'Items:\n'
-    )
-    for item in order.items.select_related('art_print').all():
-        title = item.art_print.title if item.art_print else 'Unknown'
-        message += f'- {item.quantity} \u00d7 {title} (\u20ac{item.price})\n'
-    message += (
-        '\nYour digital prints are available for download '
-        'in your account dashboard.'
-    )
-
-    recipient = None
-    if order.user and order.user.email:
-        recipient = order.user.email
-    elif hasattr(session, 'customer_details') and session.customer_details:
-        recipient = getattr(session.customer_details, 'email', None)
-
-    if recipient:
-        try:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient],
-                fail_silently=True,
-            )
-        except Exception as e:
-            logger.error(f'Email send error: {e}')
-
-
 @csrf_exempt
 def stripe_webhook(request):
     """Handle Stripe webhook events for reliable payment processing."""
@@ -275,6 +254,7 @@ def stripe_webhook(request):
 
     if not endpoint_secret:
         logger.warning('Stripe webhook secret not configured')
+        metrics.WEBHOOK_EVENTS.labels('unknown', 'not_configured').inc()
         return HttpResponse(status=200)
 
     try:
@@ -283,51 +263,75 @@ def stripe_webhook(request):
         )
     except ValueError:
         logger.error('Invalid webhook payload')
+        metrics.WEBHOOK_EVENTS.labels('unknown', 'invalid_payload').inc()
         return HttpResponseBadRequest()
     except stripe.error.SignatureVerificationError:
         logger.error('Invalid webhook signature')
+        metrics.WEBHOOK_EVENTS.labels('unknown', 'invalid_signature').inc()
         return HttpResponseBadRequest()
 
+    outcome = 'ignored'
     if event['type'] == 'checkout.session.completed':
         session = event['data']['object']
         order = Order.objects.filter(
             stripe_session_id=session['id']
         ).first()
-        if order and not order.is_completed:
-            order.is_completed = True
-            order.status = 'paid'
-            order.save()
-
-            # Grant download access
-            if order.user and hasattr(order.user, 'profile'):
-                for item in order.items.select_related('art_print').all():
-                    if item.art_print:
-                        order.user.profile.purchased_prints.add(
-                            item.art_print
-                        )
-
+        if order is None:
+            outcome = 'unknown_order'
+        elif fulfil_order(order, session, 'webhook'):
+            outcome = 'fulfilled'
             logger.info(f'Webhook: Payment confirmed for order {order.id}')
+        else:
+            outcome = 'already_fulfilled'
+    metrics.WEBHOOK_EVENTS.labels(event['type'], outcome).inc()
 
     return HttpResponse(status=200)
 
 
 @login_required
 def download_print(request, art_id):
-    """Serve a purchased print file for download (protected URL)."""
-    from django.http import FileResponse
-
+    """
+    Serve a purchased print file for download (protected URL).  With
+    object storage this redirects to a short-lived presigned URL.
+    """
     art = get_object_or_404(ArtPrint, id=art_id)
     if not request.user.profile.purchased_prints.filter(id=art.id).exists():
         messages.error(request, 'You have not purchased this print.')
         return redirect('gallery')
 
     if art.image:
-        response = FileResponse(
-            art.image.open('rb'),
-            as_attachment=True,
-            filename=f'{art.slug}-highres.jpg'
+        return serve_file(
+            art.image, filename=print_filename(art), attachment=True
         )
-        return response
 
     messages.error(request, 'Download file not available.')
     return redirect('dashboard')
+
+
+@login_required
+def download_bundle(request, order_id=None):
+    """
+    Stream a ZIP of the user's purchased prints: all of them, or the ones
+    from a single paid order.  Entitlements are checked in one query.
+    """
+    prints = ArtPrint.objects.filter(
+        purchased_by__user=request.user
+    ).only('id', 'slug', 'image').order_by('slug')
+    if order_id is not None:
+        prints = prints.filter(
+            orderitem__order_id=order_id,
+            orderitem__order__user=request.user,
+            orderitem__order__is_completed=True,
+        ).distinct()
+    prints = list(prints)
+    if not prints:
+        raise Http404('No purchased prints to download')
+
+    chunks = bundle_prints(prints)
+    if isinstance(request, ASGIRequest):
+        # One chunk per hop to the sync thread keeps memory flat
+        chunks = aiterate(chunks, batch=1)
+    response = StreamingHttpResponse(chunks, content_type='application/zip')
+    name = f'order-{order_id}-prints' if order_id else 'joe-django-prints'
+    response['Content-Disposition'] = f'attachment; filename="{name}.zip"'
+    return response
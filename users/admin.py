@@ -5,4 +5,6 @@ from .models import Profile
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'created_at')
-    filter_horizontal = ('wishlist', 'purchased_prints')
+    list_select_related = ('user',)
+    # Select widgets listing every user and print do not scale
+    raw_id_fields = ('user', 'wishlist', 'purchased_prints')